@@ -1,3 +1,4 @@
+import json
 import traceback
 import boto3 # Added for AWS Textract
 from botocore.exceptions import NoRegionError
@@ -6,21 +7,28 @@ import logging
 from logging.handlers import RotatingFileHandler
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, text
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 import os
-import csv # DBS CSV reader
+from collections import defaultdict
 from datetime import datetime
-import openpyxl
-import pdfplumber  # DBS PDF Reader
-import pandas as pd  # Standard chart XLSV Readers
 import re
 
-from decimal import Decimal, InvalidOperation
-from dateutil import parser as dateparser
-
 from gevent.pool import pass_value
 
+from ingestion import (bulk_insert_transactions, chunked, detach_file_transactions, fingerprint_rows, spool_rows,
+                       DEFAULT_BATCH_SIZE, DEFAULT_CURRENCY)
+from categorization import (Categorizer, DEFAULT_CATEGORY_RULES, DEFAULT_CACHE_SIZE, load_category_cache,
+                            save_category_cache, clear_category_cache)
+from db_engine import DATABASE_URL, engine_options, ensure_database_dir, install_sqlite_pragmas
+from migrations import migrate
+from rollups import add_file_to_rollup, remove_file_from_rollup
+from storage import spool_upload, store_upload, UploadRejected
+from receipts import ReceiptAnalyzer, summarize_expense_document, DEFAULT_CACHE_TTL as RECEIPT_CACHE_TTL
+from jobs import JobRunner, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, UNFINISHED_JOB_STATES
+from parsers import ParseReport, ErrorBudgetExceeded, BANK_FORMATS, detect_bank_format, DEFAULT_MAX_ERRORS
+
 app = Flask(__name__)
 
 # Logging Configuration
@@ -36,13 +44,39 @@ if not app.debug:
     app.logger.info('Expense Tracker startup')
 
 app.config['JWT_SECRET_KEY'] = 'your_secret_key'  # Change this to a secure key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///expense_tracker.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL  # Shared with fast_app.py
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Largest statement accepted, in bytes
+app.config['MAX_UPLOAD_BYTES'] = int(os.getenv('MAX_UPLOAD_BYTES', 100 * 1024 * 1024))
+# Largest receipt accepted; Textract's synchronous API takes documents of up to 10 MB
+app.config['MAX_RECEIPT_BYTES'] = int(os.getenv('MAX_RECEIPT_BYTES', 10 * 1024 * 1024))
+# Receipts analysed at once by /parse-receipts, and the Textract calls run concurrently
+app.config['MAX_RECEIPTS_PER_BATCH'] = int(os.getenv('MAX_RECEIPTS_PER_BATCH', 20))
+app.config['RECEIPT_WORKERS'] = int(os.getenv('RECEIPT_WORKERS', 4))
+# Seconds a Textract analysis is reused for byte-identical receipts
+app.config['RECEIPT_CACHE_TTL'] = int(os.getenv('RECEIPT_CACHE_TTL', RECEIPT_CACHE_TTL))
+# Request bodies of routes without files; upload routes raise it to their own limit (see limit_request_body)
+app.config['MAX_CONTENT_LENGTH'] = FORM_OVERHEAD_BYTES = 1024 * 1024
+# Rows per executemany batch when writing parsed transactions
+app.config['INGEST_BATCH_SIZE'] = int(os.getenv('INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+# Invalid rows tolerated per statement before the upload is rejected
+app.config['PARSE_MAX_ERRORS'] = int(os.getenv('PARSE_MAX_ERRORS', DEFAULT_MAX_ERRORS))
+# Worker processes used to extract text from the pages of one PDF statement
+app.config['PDF_PARSE_WORKERS'] = int(os.getenv('PDF_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+# Background threads that parse uploaded statements
+app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', 1))
+# Distinct remarks whose category is remembered per rule set
+app.config['CATEGORY_CACHE_SIZE'] = int(os.getenv('CATEGORY_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+# Default and maximum page sizes of the paginated listings
+app.config['PAGE_SIZE'] = 50
+app.config['MAX_PAGE_SIZE'] = 500
 
 # Ensure upload folder exists
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
+ensure_database_dir()
 
 CORS(app)
 db = SQLAlchemy(app)
@@ -74,6 +108,30 @@ except NoRegionError:
 except Exception as e:
     raise RuntimeError(f"Failed to init Textract client: {e}")
 
+receipt_analyzer = ReceiptAnalyzer(textract_client, cache_ttl=app.config['RECEIPT_CACHE_TTL'],
+                                   max_workers=app.config['RECEIPT_WORKERS'])
+
+# Sniffed file types (see storage.sniff_format) accepted by the upload endpoints
+STATEMENT_KINDS = {'text', 'pdf', 'xlsx', 'parquet'}
+RECEIPT_KINDS = {'jpeg', 'png', 'pdf', 'tiff'}
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"message": "File is too large"}), 413
+
+
+def limit_request_body(max_file_bytes):
+    """
+    Cap this request's body at ``max_file_bytes`` plus room for the rest of the form.
+
+    Call it before touching ``request.files``: Werkzeug then answers 413 from
+    the Content-Length header alone, before any of the body is read or
+    buffered, and stops reading a chunked body once it passes the cap.
+    """
+    request.max_content_length = max_file_bytes + FORM_OVERHEAD_BYTES
+
+
 # Models
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -91,29 +149,117 @@ class UserFile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     bank_file_format_id = db.Column(db.Integer, db.ForeignKey('bank_file_format.id'), nullable=False)
     file_url = db.Column(db.String(200), nullable=False)
+    content_sha256 = db.Column(db.String(64))
     created_on = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_user_file_user_id_created_on', 'user_id', 'created_on'),
+        db.Index('ix_user_file_user_id_content_sha256', 'user_id', 'content_sha256'),
+    )
+
 
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     transaction_date = db.Column(db.DateTime, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
     remarks_1 = db.Column(db.String(200))
     remarks_2 = db.Column(db.String(200))
-    user_file_id = db.Column(db.Integer, db.ForeignKey('user_file.user_id'), nullable=False)
+    category = db.Column(db.String(50))
+    fingerprint = db.Column(db.String(64))  # See ingestion.fingerprint_rows
+    user_file_id = db.Column(db.Integer, db.ForeignKey('user_file.id'), nullable=False)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_transaction_user_file_id_transaction_date', 'user_file_id', 'transaction_date'),
+        db.Index('ix_transaction_transaction_date', 'transaction_date'),
+        db.Index('ix_transaction_amount_cents', 'amount_cents'),
+        db.Index('ix_transaction_transaction_date_amount_cents', 'transaction_date', 'amount_cents'),
+        db.Index('ix_transaction_category_amount_cents', 'category', 'amount_cents'),
+        db.Index('ix_transaction_fingerprint', 'fingerprint', unique=True),
+        db.Index('ix_transaction_created_on', 'created_on'),
+    )
+
+
+class TransactionSource(db.Model):
+    # Every file a transaction was found in; the row itself belongs to one of them (see ingestion)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), primary_key=True)
+    user_file_id = db.Column(db.Integer, db.ForeignKey('user_file.id'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_transaction_source_user_file_id', 'user_file_id'),
+    )
+
+
+class MonthlyRollup(db.Model):
+    user_id = db.Column(db.Integer, primary_key=True)
+    year_month = db.Column(db.String(7), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    transaction_count = db.Column(db.Integer, nullable=False)
+    debited_cents = db.Column(db.BigInteger, nullable=False)
+    credited_cents = db.Column(db.BigInteger, nullable=False)
+    net_cents = db.Column(db.BigInteger, nullable=False)
+
+
+class CategoryRule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # NULL for the default rules shared by everyone
+    keyword = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
     created_on = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class CategoryCacheEntry(db.Model):
+    __tablename__ = 'category_cache'
+    rule_set_hash = db.Column(db.String(64), primary_key=True)
+    remark = db.Column(db.String(400), primary_key=True)  # Normalized remarks of a transaction
+    category = db.Column(db.String(50))
+
+
+class SheetExportState(db.Model):
+    # High-water mark of sheet_export.DeltaExporter for one user's export to one worksheet
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    target = db.Column(db.String(200), nullable=False)  # "<spreadsheet>/<worksheet>"
+    last_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    last_created_on = db.Column(db.DateTime)
+    rows_exported = db.Column(db.Integer, nullable=False, default=0)
+    updated_on = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'target', name='uq_sheet_export_state_user_id_target'),
+    )
+
+
+class UploadJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_file_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=JOB_QUEUED)
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON list of row errors
+    message = db.Column(db.String(500))
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    started_on = db.Column(db.DateTime)
+    finished_on = db.Column(db.DateTime)
+
+
 # Create tables and initialize file formats
 with app.app_context():
+    install_sqlite_pragmas(db.engine)
     # db.drop_all()  # Deletes all tables
     db.create_all()  # Recreates tables with the new schema
+    migrate(db.engine)  # Brings tables created by older versions up to date
 
     
-    if BankFileFormat.query.count() == 0:
-        db.session.add(BankFileFormat(name='DBS Savings Account (CSV)'))
-        db.session.add(BankFileFormat(name='DBS Credit Card (PDF)'))
-        db.session.add(BankFileFormat(name='Standard Chartered Credit Card (XSLX)'))
+    # One BankFileFormat per registered parser, added in registration order
+    known_formats = {bff.name for bff in BankFileFormat.query.all()}
+    db.session.add_all(BankFileFormat(name=name) for name in BANK_FORMATS if name not in known_formats)
+    db.session.commit()
+
+    if CategoryRule.query.count() == 0:
+        db.session.add_all(CategoryRule(keyword=rule.keyword, category=rule.category)
+                           for rule in DEFAULT_CATEGORY_RULES)
         db.session.commit()
 
 
@@ -159,19 +305,56 @@ def get_bank_file_formats():
     return jsonify([{"id": bff.id, "name": bff.name} for bff in bank_file_formats])
 
 
-def _get_user_file(f):
-    transactions = Transaction.query.filter_by(user_file_id=f.id).all()
-    transactions_data = [{
+# BankFileFormat rows are seeded at startup and never edited, so names are cached in-process
+_bank_file_format_names = {}
+
+def get_bank_file_format_name(bank_file_format_id):
+    if bank_file_format_id not in _bank_file_format_names:
+        _bank_file_format_names.update((bff.id, bff.name) for bff in BankFileFormat.query.all())
+    return _bank_file_format_names.get(bank_file_format_id)
+
+
+def get_bank_file_format_id(name):
+    if name not in _bank_file_format_names.values():
+        _bank_file_format_names.update((bff.id, bff.name) for bff in BankFileFormat.query.all())
+    return next((format_id for format_id, format_name in _bank_file_format_names.items() if format_name == name),
+                None)
+
+
+def _transaction_columns():
+    return db.session.query(Transaction.id, Transaction.user_file_id, Transaction.transaction_date,
+                            Transaction.amount_cents, Transaction.currency,
+                            Transaction.remarks_1, Transaction.remarks_2, Transaction.category)
+
+
+def _transaction_to_dict(t):
+    return {
         "id": t.id,
         "transaction_date": t.transaction_date.strftime('%Y-%m-%d'),
-        "amount": t.amount,
+        "amount": t.amount_cents / 100,
+        "amount_cents": t.amount_cents,
+        "currency": t.currency,
         "remarks_1": t.remarks_1,
-        "remarks_2": t.remarks_2
-    } for t in transactions]
+        "remarks_2": t.remarks_2,
+        "category": t.category
+    }
+
+
+def _page_args():
+    """Read the ``cursor`` and ``limit`` query parameters of a keyset-paginated listing."""
+    cursor = request.args.get('cursor', default=0, type=int)
+    limit = request.args.get('limit', default=app.config['PAGE_SIZE'], type=int)
+    return cursor, max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+
+
+def _get_user_file(f, transactions=None):
+    if transactions is None:
+        transactions = _transaction_columns().filter(Transaction.user_file_id == f.id).all()
+    transactions_data = [_transaction_to_dict(t) for t in transactions]
 
     return {
             "id": f.id,
-            "file_format": BankFileFormat.query.get(f.bank_file_format_id).name,
+            "file_format": get_bank_file_format_name(f.bank_file_format_id),
             "file_url": f.file_url,
             "created_on": f.created_on.strftime('%Y-%m-%d'),
             "transactions": transactions_data,
@@ -190,73 +373,388 @@ def get_user_files(user_file_id=None):
     if user_file_id:
         if request.method == 'GET':
             f = UserFile.query.filter_by(id=user_file_id, user_id=user.id).first()
+            if not f:
+                return jsonify({"message": "File not found"}), 404
             return jsonify(_get_user_file(f))
         elif request.method == 'DELETE':
-            Transaction.query.filter_by(user_file_id=user_file_id).delete()
             user_file = UserFile.query.filter_by(id=user_file_id, user_id=user.id)
-            os.remove(user_file.first().file_url)
+            f = user_file.first()
+            if not f:
+                return jsonify({"message": "File not found"}), 404
+            # A job still parsing the file would insert its rows after the delete
+            unfinished_job = (UploadJob.query
+                              .filter(UploadJob.user_file_id == user_file_id,
+                                      UploadJob.status.in_(UNFINISHED_JOB_STATES))
+                              .first())
+            if unfinished_job:
+                return jsonify({"message": "File is still being processed", "job_id": unfinished_job.id}), 409
+            # Rows another statement also contains move to it and stay in the rollup
+            detach_file_transactions(db.session, user_file_id)
+            remove_file_from_rollup(db.session, user.id, user_file_id)
+            Transaction.query.filter_by(user_file_id=user_file_id).delete()
+            _remove_stored_file(f)
             user_file.delete()
             db.session.commit()
             return jsonify({"message": "File deletion success"}), 200
         else:
             return f"invalid request", 400
 
+    elif request.args.get('summary', type=int):
+        return jsonify(_get_user_files_summary(user))
+
     else:
+        # Two queries regardless of the number of files: the files, then all of their transactions
         file_uploads = UserFile.query.filter_by(user_id=user.id).all()
-        result = []
-        for f in file_uploads:
-            result.append(_get_user_file(f))
-
+        transactions_by_file = defaultdict(list)
+        user_transactions = (_transaction_columns()
+                             .join(UserFile, Transaction.user_file_id == UserFile.id)
+                             .filter(UserFile.user_id == user.id)
+                             .order_by(Transaction.id))
+        for t in user_transactions:
+            transactions_by_file[t.user_file_id].append(t)
+
+        result = [_get_user_file(f, transactions_by_file[f.id]) for f in file_uploads]
         return jsonify(result)
 
+def _get_user_files_summary(user):
+    """One page of the user's files with transaction counts, without the transactions themselves."""
+    cursor, limit = _page_args()
+    rows = (db.session.query(UserFile, func.count(Transaction.id))
+            .outerjoin(Transaction, Transaction.user_file_id == UserFile.id)
+            .filter(UserFile.user_id == user.id, UserFile.id > cursor)
+            .group_by(UserFile.id)
+            .order_by(UserFile.id)
+            .limit(limit + 1)
+            .all())
+    page = rows[:limit]
+    return {
+        "files": [{
+            "id": f.id,
+            "file_format": get_bank_file_format_name(f.bank_file_format_id),
+            "created_on": f.created_on.strftime('%Y-%m-%d'),
+            "no_of_transactions": count,
+        } for f, count in page],
+        "next_cursor": page[-1][0].id if len(rows) > limit else None,
+    }
+
+
+@app.route("/user-files/<int:user_file_id>/transactions", methods=["GET"])
+@jwt_required()
+def get_user_file_transactions(user_file_id):
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    if not UserFile.query.filter_by(id=user_file_id, user_id=user.id).first():
+        return jsonify({"message": "File not found"}), 404
+
+    cursor, limit = _page_args()
+    transactions = (_transaction_columns()
+                    .filter(Transaction.user_file_id == user_file_id, Transaction.id > cursor)
+                    .order_by(Transaction.id)
+                    .limit(limit + 1)
+                    .all())
+    page = transactions[:limit]
+    return jsonify({
+        "transactions": [_transaction_to_dict(t) for t in page],
+        "next_cursor": page[-1].id if len(transactions) > limit else None,
+    })
+
 @app.route("/upload-user-file", methods=["POST"])
 @jwt_required()
 def upload_user_file():
     user = get_current_user()
+    limit_request_body(app.config['MAX_UPLOAD_BYTES'])
     if 'file' not in request.files:
         return jsonify({"message": "No file uploaded"}), 400
 
     file = request.files['file']
-    bank_file_format_id = request.form.get('bank_file_format_id')
+    # Optional: the format is detected from the file, this only double-checks the user's choice
+    selected_format_id = request.form.get('bank_file_format_id')
 
-    if not bank_file_format_id or not bank_file_format_id.isdigit():
+    if selected_format_id and not selected_format_id.isdigit():
         return jsonify({"message": "Invalid file format"}), 400
 
-    bank_file_format_id = int(bank_file_format_id)
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    filename = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{file.filename}")
-    file.save(filename)
+    try:
+        stored = store_upload(file.stream, app.config['UPLOAD_FOLDER'], file.filename,
+                              max_size=app.config['MAX_UPLOAD_BYTES'], allowed_kinds=STATEMENT_KINDS)
+    except UploadRejected as e:
+        return jsonify({"message": str(e)}), 400
+
+    bank_format = detect_bank_format(stored.path)
+    if bank_format is None:
+        _discard_stored_file(stored.path)
+        return jsonify({"message": "Unrecognised bank statement format"}), 400
+    selected_format = get_bank_file_format_name(int(selected_format_id)) if selected_format_id else None
+    if selected_format and selected_format != bank_format.name:
+        _discard_stored_file(stored.path)
+        return jsonify({"message": f"File looks like a {bank_format.name} statement, not {selected_format}"}), 400
+    bank_file_format_id = get_bank_file_format_id(bank_format.name)
+
+    # The same statement uploaded again: point at the earlier upload instead of parsing it twice
+    existing = (UserFile.query
+                .filter_by(user_id=user.id, content_sha256=stored.sha256, bank_file_format_id=bank_file_format_id)
+                .order_by(UserFile.id)
+                .first())
+    if existing:
+        job = UploadJob.query.filter_by(user_file_id=existing.id).order_by(UploadJob.id.desc()).first()
+        return jsonify({"message": "File already uploaded", "file_id": existing.id,
+                        "job_id": job.id if job else None, "duplicate": True}), 200
+
+    user_file = UserFile(user_id=user.id, bank_file_format_id=bank_file_format_id, file_url=stored.path,
+                         content_sha256=stored.sha256)
+    db.session.add(user_file)
+    db.session.flush()
+    job = UploadJob(user_id=user.id, user_file_id=user_file.id)
+    db.session.add(job)
+    db.session.commit()
 
-    # After saving, you might want to check if the file was actually saved
-    if not os.path.exists(filename):
-        return jsonify({"message": "Failed to save the file"}), 500
+    upload_jobs.submit(job.id)
+    return jsonify({"message": "File uploaded, processing started", "file_id": user_file.id, "job_id": job.id}), 202
 
 
-    try:
-        user_file = UserFile(user_id=user.id, bank_file_format_id=bank_file_format_id, file_url=filename)
-        db.session.add(user_file)
+@app.route("/jobs/<int:job_id>", methods=["GET"])
+@jwt_required()
+def get_job(job_id):
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    job = UploadJob.query.filter_by(id=job_id, user_id=user.id).first()
+    if not job:
+        return jsonify({"message": "Job not found"}), 404
+
+    rows_parsed = job.rows_parsed
+    if job.status == JOB_RUNNING:
+        rows_parsed = upload_jobs.progress_of(job.id) or rows_parsed
+    end = job.finished_on or datetime.utcnow()
+    return jsonify({
+        "id": job.id,
+        "file_id": job.user_file_id,
+        "status": job.status,
+        "rows_parsed": rows_parsed,
+        "errors": json.loads(job.errors) if job.errors else [],
+        "message": job.message,
+        "created_on": job.created_on.isoformat(),
+        "started_on": job.started_on.isoformat() if job.started_on else None,
+        "finished_on": job.finished_on.isoformat() if job.finished_on else None,
+        "elapsed_seconds": round((end - job.started_on).total_seconds(), 3) if job.started_on else None,
+    })
+
+
+def parse_user_file(bank_file_format_id, file_path, report):
+    """Return the TransactionRow iterator for a stored statement."""
+    bank_format = BANK_FORMATS.get(get_bank_file_format_name(bank_file_format_id))
+    if bank_format is None:
+        raise ValueError(f"No parser for bank file format {bank_file_format_id}")
+    return bank_format.parse(file_path, report, workers=app.config['PDF_PARSE_WORKERS'])
+
+
+def _remove_stored_file(user_file):
+    """Delete a UserFile's stored file unless another upload shares the same content."""
+    shared = (UserFile.query
+              .filter(UserFile.file_url == user_file.file_url, UserFile.id != user_file.id)
+              .first())
+    if not shared and os.path.exists(user_file.file_url):
+        os.remove(user_file.file_url)
+
+
+def _discard_stored_file(path):
+    """Delete a just stored upload that was rejected, unless an earlier upload has the same content."""
+    if not UserFile.query.filter_by(file_url=path).first() and os.path.exists(path):
+        os.remove(path)
+
+
+def _fail_upload_job(job, user_file, message, errors=None):
+    """Mark a job failed and drop the UserFile and stored file it was parsing."""
+    db.session.rollback()
+    job.status = JOB_FAILED
+    job.message = message
+    job.errors = json.dumps(errors or [])
+    job.finished_on = datetime.utcnow()
+    if user_file:
+        _remove_stored_file(user_file)
+        db.session.delete(user_file)
+    db.session.commit()
+
+
+def process_upload_job(job_id, progress):
+    """Parse the statement of an UploadJob and store its transactions (runs on a worker thread)."""
+    with app.app_context():
+        job = db.session.get(UploadJob, job_id)
+        user_file = db.session.get(UserFile, job.user_file_id)
+        if user_file is None:
+            _fail_upload_job(job, None, "Uploaded file no longer exists")
+            return
+
+        job.status = JOB_RUNNING
+        job.started_on = datetime.utcnow()
         db.session.commit()
 
-        if bank_file_format_id == 1:
-            parse_dbs_csv_transactions(user_file.id, filename)
-        elif bank_file_format_id == 2:
-            parse_sc_transactions(user_file.id, filename)
-        elif bank_file_format_id == 3:
-            parse_dbs_pdf_transactions(user_file.id, filename)
-    except Exception as e:
-        app.logger.error(f"Error processing file {filename}: {e}")
-        app.logger.error(traceback.format_exc())
-        if os.path.exists(filename):
-            os.remove(filename) # Corrected to remove the saved file
-        return f"An error occurred: {str(e)}", 500
-        # pass
-        # todo: to remove the file in case any error happens
-
-    app.logger.info("File processed successfully, committing to database.")
+        filename = user_file.file_url
+        report = ParseReport(max_errors=app.config['PARSE_MAX_ERRORS'])
+        try:
+            rows = parse_user_file(user_file.bank_file_format_id, filename, report)
+            # Categorize before inserting so the rollup below sees the categories
+            categorizer = get_categorizer(user_file.user_id)
+            rows = fingerprint_rows(categorizer.categorize_rows(rows), user_file.user_id)
+            # Parse everything before writing, so the write transaction (and SQLite's
+            # write lock, which every other writer waits on) lasts only for the inserts
+            rows = spool_rows(rows, batch_size=app.config['INGEST_BATCH_SIZE'], progress=progress)
+            stats = bulk_insert_transactions(db.session, Transaction.__table__, user_file.id, rows,
+                                             batch_size=app.config['INGEST_BATCH_SIZE'])
+            add_file_to_rollup(db.session, user_file.user_id, user_file.id)
+            save_category_cache(db.session, categorizer)
+            app.logger.info(f"Ingested {filename}: {stats}, category cache {categorizer.cache.stats()}")
+        except ErrorBudgetExceeded as e:
+            app.logger.warning(f"Rejected {filename}: {e}")
+            _fail_upload_job(job, user_file, str(e), e.report.as_dict()["errors"])
+            return
+        except Exception as e:
+            app.logger.error(f"Error processing file {filename}: {e}")
+            app.logger.error(traceback.format_exc())
+            _fail_upload_job(job, user_file, f"An error occurred: {str(e)}")
+            return
+
+        job.status = JOB_DONE
+        job.rows_parsed = stats.rows
+        job.errors = json.dumps(report.as_dict()["errors"])
+        job.message = "File uploaded and processed"
+        if stats.duplicates:
+            job.message += f", {stats.duplicates} already imported transactions skipped"
+        job.finished_on = datetime.utcnow()
+        app.logger.info("File processed successfully, committing to database.")
+        db.session.commit()
+
+
+def resume_upload_jobs():
+    """Re-queue jobs that were queued or running when the process last stopped."""
+    with app.app_context():
+        jobs = UploadJob.query.filter(UploadJob.status.in_(UNFINISHED_JOB_STATES)).all()
+        for job in jobs:
+            # A running job never committed its rows, so it can simply start over
+            job.status = JOB_QUEUED
+            job.started_on = None
+        db.session.commit()
+        for job in jobs:
+            app.logger.info(f"Resuming upload job {job.id}")
+            upload_jobs.submit(job.id)
+
+
+# Compiled rule sets (with their remark caches) by user id; cleared whenever a rule is added or removed
+_categorizers = {}
+
+
+def _invalidate_categorizers():
+    _categorizers.clear()
+    clear_category_cache(db.session)
+    db.session.commit()
+
+
+def get_categorizer(user_id):
+    """Return the Categorizer for a user's own rules followed by the default rules."""
+    categorizer = _categorizers.get(user_id)
+    if categorizer is None:
+        # Plain rows rather than ORM objects, so the cached rules outlive this session
+        rules = (db.session.query(CategoryRule.id, CategoryRule.user_id, CategoryRule.keyword, CategoryRule.category)
+                 .filter((CategoryRule.user_id == user_id) | CategoryRule.user_id.is_(None))
+                 .order_by(CategoryRule.user_id.is_(None), CategoryRule.id)
+                 .all())
+        categorizer = Categorizer(rules, cache_size=app.config['CATEGORY_CACHE_SIZE'])
+        load_category_cache(db.session, categorizer)
+        _categorizers[user_id] = categorizer
+    return categorizer
+
+
+def recategorize_user_transactions(user_id):
+    """Re-run the user's rules over all of their transactions, keeping the rollup in step."""
+    categorizer = get_categorizer(user_id)
+    update = text('UPDATE "transaction" SET category = :category WHERE id = :id')
+    changed = 0
+    for user_file in UserFile.query.filter_by(user_id=user_id).all():
+        transactions = (db.session.query(Transaction.id, Transaction.remarks_1, Transaction.remarks_2,
+                                         Transaction.category)
+                        .filter(Transaction.user_file_id == user_file.id))
+        updates = [{"id": t.id, "category": category} for t in transactions
+                   if (category := categorizer.classify(t.remarks_1, t.remarks_2)) != t.category]
+        if not updates:
+            continue
+        remove_file_from_rollup(db.session, user_id, user_file.id)
+        for batch in chunked(updates, app.config['INGEST_BATCH_SIZE']):
+            db.session.execute(update, batch)
+        add_file_to_rollup(db.session, user_id, user_file.id)
+        changed += len(updates)
+    save_category_cache(db.session, categorizer)
     db.session.commit()
+    return changed
+
+
+def _category_rule_to_dict(rule):
+    return {
+        "id": rule.id,
+        "keyword": rule.keyword,
+        "category": rule.category,
+        "is_default": rule.user_id is None,
+    }
 
-    # return jsonify({"message": "File uploaded and processed", "file_id": new_upload.id})
-    return jsonify({"message": "File uploaded and processed", "file_id": user_file.id})
+
+@app.route("/category-rules", methods=["GET", "POST"])
+@jwt_required()
+def category_rules():
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        keyword = (data.get('keyword') or '').strip()
+        category = (data.get('category') or '').strip()
+        if not keyword or not category:
+            return jsonify({"message": "keyword and category are required"}), 400
+        rule = CategoryRule(user_id=user.id, keyword=keyword, category=category)
+        db.session.add(rule)
+        db.session.commit()
+        _invalidate_categorizers()
+        return jsonify(_category_rule_to_dict(rule)), 201
+
+    return jsonify([_category_rule_to_dict(rule) for rule in get_categorizer(user.id).rules])
+
+
+@app.route("/category-rules/<int:rule_id>", methods=["DELETE"])
+@jwt_required()
+def delete_category_rule(rule_id):
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    rule = CategoryRule.query.filter_by(id=rule_id, user_id=user.id).first()
+    if not rule:
+        return jsonify({"message": "Rule not found"}), 404
+    db.session.delete(rule)
+    db.session.commit()
+    _invalidate_categorizers()
+    return jsonify({"message": "Rule deleted"}), 200
+
+
+@app.route("/category-cache/stats", methods=["GET"])
+@jwt_required()
+def get_category_cache_stats():
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    categorizer = get_categorizer(user.id)
+    return jsonify({"rule_set_version": categorizer.version, **categorizer.cache.stats()})
+
+
+@app.route("/recategorize-transactions", methods=["POST"])
+@jwt_required()
+def recategorize_transactions():
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    changed = recategorize_user_transactions(user.id)
+    return jsonify({"message": "Transactions recategorized", "updated": changed}), 200
+
+
+upload_jobs = JobRunner(process_upload_job, max_workers=app.config['UPLOAD_WORKERS'])
 
 # --- New Endpoint for Receipt Parsing ---
 @app.route("/parse-receipt", methods=["POST"])
@@ -270,312 +768,85 @@ def parse_receipt():
     if not user:
         return jsonify({"message": "User not found"}), 404
 
+    limit_request_body(app.config['MAX_RECEIPT_BYTES'])
     f = request.files.get("receipt")
     if not f:
         return jsonify({"message": "No receipt file uploaded"}), 400
 
-    file_bytes = f.read()
+    # Spool to disk first, so an oversized or non-image upload is rejected before it is read into memory
     try:
-        # Call Amazon Textract API
-        resp = textract_client.analyze_expense(Document={"Bytes": file_bytes})
+        spooled = spool_upload(f.stream, app.config['UPLOAD_FOLDER'],
+                               max_size=app.config['MAX_RECEIPT_BYTES'], allowed_kinds=RECEIPT_KINDS)
+    except UploadRejected as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        # Call Amazon Textract API (or reuse the analysis of an identical receipt)
+        docs = receipt_analyzer.analyze(spooled.sha256, spooled.path)
     except Exception as e:
         app.logger.error(f"Error calling Textract: {e}")
         return jsonify({"message": f"Error calling Textract: {e}"}), 500
+    finally:
+        os.remove(spooled.path)
 
-    # --- Start of the updated parsing logic ---
+    if not docs:
+        return jsonify({"message": "No expense documents found in the response."}), 400
     try:
-        docs = resp.get("ExpenseDocuments", [])
-        if not docs:
-            return jsonify({"message": "No expense documents found in the response."}), 400
-
-        summary = docs[0].get("SummaryFields", [])
-
-        # Helper function to find a field's value by its type
-        def _get(type_name: str):
-            for sf in summary:
-                if (sf.get("Type") or {}).get("Text") == type_name:
-                    return (sf.get("ValueDetection") or {}).get("Text")
-            return None
-
-        # 1. Define more comprehensive key lists (ordered by priority)
-        TOTAL_KEYS = ["TOTAL", "GRAND_TOTAL", "AMOUNT_DUE", "TOTAL_DUE", "AMOUNT"]
-        DATE_KEYS = ["INVOICE_RECEIPT_DATE", "PURCHASE_DATE", "TRANSACTION_DATE", "DATE", "DUE_DATE"]
-        RECEIPT_ID_KEYS = ["INVOICE_RECEIPT_ID", "RECEIPT_NO", "INVOICE_ID", "REFERENCE_NUMBER"]
-        VENDOR_KEYS = ["VENDOR_NAME", "MERCHANT_NAME", "STORE_NAME", "VENDOR"]
-        CURRENCY_KEYS = ["CURRENCY", "CURRENCY_CODE"]
-
-        # Helper to find the first value from a list of possible keys
-        def find_first_value(keys_list):
-            for key in keys_list:
-                value = _get(key)
-                if value:
-                    return value
-            return None
-
-        # 2. Find the raw text for each field
-        total_text = find_first_value(TOTAL_KEYS)
-        date_text = find_first_value(DATE_KEYS)
-        receipt_id_text = find_first_value(RECEIPT_ID_KEYS)
-        vendor_text = find_first_value(VENDOR_KEYS)
-        currency_text = find_first_value(CURRENCY_KEYS)
-
-        # 3. Parse and clean the extracted text
-        total_amount = None
-        if total_text:
-            # Find the first decimal number in the string to handle cases like "CASH $15.50"
-            match = re.search(r'(\d{1,3}(?:,\d{3})*(\.\d{2})?|\d+(\.\d{2})?)', total_text)
-            if match:
-                try:
-                    amount_str = match.group(1).replace(",", "")
-                    total_amount = float(Decimal(amount_str))
-                except (InvalidOperation, ValueError):
-                    total_amount = None
-
-        receipt_date = None
-        if date_text:
-            try:
-                # 'PREFER_DATES_FROM': 'past' helps resolve dates like "Aug 20" correctly
-                parsed_dt = dateparser.parse(date_text, settings={'PREFER_DATES_FROM': 'past'})
-                if parsed_dt:
-                    receipt_date = parsed_dt.date().isoformat()
-            except Exception:
-                receipt_date = date_text  # Fallback to raw text
-
-        currency = currency_text.strip() if currency_text else None
-        if not currency and total_text:
-            if '$' in total_text: currency = 'USD'
-            elif '€' in total_text: currency = 'EUR'
-            elif '£' in total_text: currency = 'GBP'
-            else:
-                match = re.search(r'\b([A-Z]{3})\b', total_text)
-                if match:
-                    currency = match.group(1)
-
-        receipt_id = receipt_id_text.strip() if receipt_id_text else None
-        vendor_name = vendor_text.strip() if vendor_text else None
-
+        return jsonify(summarize_expense_document(docs[0]))
     except Exception as e:
         return jsonify({"message": f"Error processing receipt response: {e}"}), 500
 
-    # 4. Return the final structured data
-    return jsonify({
-        "vendor_name": vendor_name,
-        "receipt_id": receipt_id,
-        "date": receipt_date,
-        "amount": total_amount,
-        "currency": currency
-    })
-
-def parse_date(date_str):
-    """Convert a date string to a datetime object."""
-    return datetime.strptime(date_str, '%d %b %Y')
-
-def parse_dbs_pdf_date(date_str):
-    """Convert a date string to a datetime object."""
-    dt = datetime.strptime(date_str, "%d %b")
-    return dt.replace(year=datetime.now().year)
-    # return datetime.strptime(date_str, '%d %b')
 
-def parse_sc_date(date_str):
-    try:
-        # Use pandas to parse dates as it's more robust and can handle multiple formats
-        return datetime.strptime(date_str, '%d %b')
-    except Exception as e:
-        app.logger.error(f"Error parsing date: {e}")
-        return None
-
-def parse_dbs_csv_transactions(user_file_id, file_path):
-    # Check if the file exists
-    if not os.path.exists(file_path):
-        app.logger.error(f"File not found: {file_path}")
-        return "File not found", 400
-
-    transactions = []
-    with open(file_path, 'r', newline='' , encoding='utf-8') as csvfile:
-        reader = csv.reader((line for line in csvfile if line.strip()), delimiter=',')
-        next(reader)
-        for row_number, row in enumerate(reader, start=2):  # Start from row 2 for Google Sheets
-            if len(row) >= 8:
-                try:
-                    date = row[0].strip()
-                    debit = float(row[2].strip()) if row[2].strip() else 0.0
-                    credit = float(row[3].strip()) if row[3].strip() else 0.0
-                    amount = credit - debit
-                    remarks = row[4].strip()
-                    transaction = Transaction(
-                        transaction_date=parse_date(date),
-                        amount=amount,
-                        remarks_1=remarks,
-                        user_file_id=user_file_id
-                    )
-
-                    db.session.add(transaction)
-                except Exception as e:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    return f"An error occurred: {str(e)}", 500
-
-
-def parse_dbs_pdf_transactions(user_file_id, file_path):
-    # Check if the file exists
-    if not os.path.exists(file_path):
-        app.logger.error(f"File not found: {file_path}")
-        return "File not found", 400
-    
-    transactions = []
-    with pdfplumber.open(file_path) as pdf_file:
-        # Loop through each page of the PDF
-        for page in pdf_file.pages:
-            text = page.extract_text()
-
-            # Split the text into individual lines
-            lines = text.split('\n')
-
-            # Define a regex pattern to find transaction lines
-            # A transaction line starts with a date (e.g., "DD MMM") and ends with a dollar amount
-            # The pattern is: Date (DD MMM) + Description + Amount ($) + optional 'CR'
-            pattern = re.compile(r'(\d{2} [A-Z]{3})\s+([A-Z\s\d.-/]+?)\s+([\d,]+\.\d{2})\s*(CR)?')
-
-            for line in lines:
-                match = pattern.search(line.strip())
-                if match:
-                    # Extract date, description, amount, and type (Credit/Debit)
-                    date = match.group(1)
-                    app.logger.info(date)
-                    description = match.group(2).strip()
-                    amount = float(match.group(3).replace(',', ''))
-
-                    # Check if it's a credit or debit based on the 'CR' at the end of the line
-                    is_credit = bool(match.group(4))
-                    if is_credit:
-                        amount = amount * -1
-
-                    transaction = Transaction(
-                        transaction_date=parse_dbs_pdf_date(date),
-                        amount=amount,
-                        remarks_1=description,
-                        user_file_id=user_file_id
-                    )
-                    app.logger.info("inserting")
-                    app.logger.info(transaction)
-
-                    db.session.add(transaction)
-
-    
+@app.route("/parse-receipts", methods=["POST"])
+@jwt_required()
+def parse_receipts():
+    """
+    Batch version of /parse-receipt: analyses every file in ``receipts``
+    concurrently and returns one result (or error message) per file, in order.
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({"message": "User not found"}), 404
 
-#  parse standard charted bank xlxs file
+    limit_request_body(app.config['MAX_RECEIPT_BYTES'] * app.config['MAX_RECEIPTS_PER_BATCH'])
+    files = request.files.getlist("receipts")
+    if not files:
+        return jsonify({"message": "No receipt files uploaded"}), 400
+    if len(files) > app.config['MAX_RECEIPTS_PER_BATCH']:
+        return jsonify({"message": f"At most {app.config['MAX_RECEIPTS_PER_BATCH']} receipts per batch"}), 400
 
-# Function to process amount and handle 'CR'
-def process_amount(value):
-    """Convert 'CR' to positive (credited) and others to negative (debited)."""
-    if isinstance(value, str) and "CR" in value:
-        value = value.replace(',', '').replace('CR', '').strip()
-        return abs(float(value.strip()))
+    results = [{"filename": f.filename} for f in files]
+    spooled = {}
     try:
-        return -abs(float(value))  # Debit amounts are negative
-    except ValueError:
-        return 0.0  # Handle errors gracefully
-
-# Read all sheets from the XLSX file
-
-
-required_columns = {'Posting Date', 'Description'}  # Set for quick comparison
-
-# Column indexes for Table 1 and Table 2
-column_indexs = {
-    "Table 1": {
-        "transaction_date": 0,
-        "description_1": 3,
-        "description_2": 10,
-        "amount": 14,
-    },
-    "Table 2": {
-        "transaction_date": 0,
-        "description_1": 2,
-        "description_2": 3,
-        "amount": 4,
-    }
-}
-
-
-
-def parse_sc_transactions(user_file_id, file_path):
-    xls = pd.ExcelFile(file_path, engine='openpyxl')
-    # Process each sheet
-    for sheet_name in xls.sheet_names:
-        app.logger.info(f"Processing sheet: {sheet_name}")
-        if False and not sheet_name == 'Table 2':
-            app.logger.info("skipping {}".format(sheet_name))
-            continue
+        for index, f in enumerate(files):
+            try:
+                spooled[index] = spool_upload(f.stream, app.config['UPLOAD_FOLDER'],
+                                              max_size=app.config['MAX_RECEIPT_BYTES'], allowed_kinds=RECEIPT_KINDS)
+            except UploadRejected as e:
+                results[index]["message"] = str(e)
+        analyses = receipt_analyzer.analyze_many([(s.sha256, s.path) for s in spooled.values()])
+    finally:
+        for s in spooled.values():
+            os.remove(s.path)
+
+    for index, docs in zip(spooled, analyses):
+        if isinstance(docs, Exception):
+            app.logger.error(f"Error calling Textract: {docs}")
+            results[index]["message"] = f"Error calling Textract: {docs}"
+        elif not docs:
+            results[index]["message"] = "No expense documents found in the response."
+        else:
+            try:
+                results[index].update(summarize_expense_document(docs[0]))
+            except Exception as e:
+                results[index]["message"] = f"Error processing receipt response: {e}"
+    return jsonify({"receipts": results, "cache": receipt_analyzer.cache.stats()})
 
-        df = pd.read_excel(xls, sheet_name=sheet_name, engine='openpyxl')
-        column_indexs = {
-            "Table 1": {
-                "transaction_date": 0,
-                "description_1": 3,
-                "description_2": 10,
-                "amount": 14,
-            },
-            "Table 2": {
-                "transaction_date": 0,
-                "description_1": 2,
-                "description_2": 3,
-                "amount": 4,
-            }
-        }
-        transactions = []
-        if sheet_name in column_indexs:
-            for idx, row in df.iterrows():
-                try:
-                    raw_date= row.iloc[column_indexs[sheet_name]['transaction_date']]
-                    transaction_date = parse_sc_date(str(raw_date))  # Expects format like "16 Nov"
-                    if not transaction_date:
-                        app.logger.warning(f"Failed to parse date {raw_date} in row {idx + 1} of {sheet_name}")
-                        continue
-                except ValueError:
-                    transaction_date = None
-                except TypeError:
-                    transaction_date = None
-                if transaction_date:
-                    values = []
-                    # Convert date properly
-                    if isinstance(transaction_date, str):
-                        try:
-                            transaction_date = datetime.strptime(transaction_date, "%d %b")
-                        except ValueError:
-                            app.logger.warning(f"Invalid date format in row {idx + 2} of {sheet_name}: {transaction_date}")
-                            transaction_date = ""
-                    elif pd.notna(transaction_date):
-                        transaction_date = pd.to_datetime(transaction_date, errors='coerce')
-                    else:
-                        transaction_date = ""
-
-                    description = row.iloc[column_indexs[sheet_name]['description_1']]
-                    values.append(description)
-                    money = row.iloc[column_indexs[sheet_name]['amount']]
-                    # Process amount correctly
-                    if money != "nan" or money != " ":
-                        amount = process_amount(money)
-                    # transactions.append([date, amount, description])
-
-                    transaction = Transaction(
-                        transaction_date=transaction_date,
-                        amount=amount,
-                        remarks_1=description,
-                        user_file_id=user_file_id
-                    )
-
-                    db.session.add(transaction)
-
-    # df = pd.read_excel(file_path, engine='openpyxl')
-    # for _, row in df.iterrows():
-    #     date = datetime.strptime(row.iloc[0], '%d %b')
-    #     description = row.iloc[2]
-    #     amount = float(row.iloc[4]) if pd.notna(row.iloc[4]) else 0.0
-    #     transaction = Transaction(transaction_date=date, amount=amount, remarks_1=description,
-    #                               user_file_id=user_file_id)
-    #     db.session.add(transaction)
 
+# Under the debug reloader only the serving child (WERKZEUG_RUN_MAIN) resumes jobs. PDF
+# worker processes import the main script as __mp_main__ (see parsers.PDF_POOL_CONTEXT)
+# and must not run jobs of their own.
+if __name__ != "__mp_main__" and (__name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+    resume_upload_jobs()
 
 if __name__ == "__main__":
     app.run(debug=True)
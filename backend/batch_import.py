@@ -0,0 +1,243 @@
+"""Headless batch import of bank statements.
+
+Takes files, directories or glob patterns, detects each statement's format
+with the parser registry, parses the files in parallel on a process pool and
+writes every parsed row, in one pass, to any of:
+
+* the app database (``--user``), exactly as an upload through the API would;
+* a CSV or JSON Lines file (``--output``);
+* a Google Sheets worksheet (``--sheet``).
+
+For example::
+
+    python batch_import.py ~/statements/*.csv --user me@example.com --output all.csv
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, select
+
+from categorization import Categorizer, DEFAULT_CATEGORY_RULES
+from db_engine import create_sqlite_engine
+from ingestion import bulk_insert_transactions, fingerprint_rows
+from migrations import MIGRATIONS, schema_version
+from parsers import ParseReport, ErrorBudgetExceeded, detect_bank_format
+from rollups import add_file_to_rollup
+from sheets import SheetSync, open_worksheet, CREDENTIALS_FILE
+from storage import file_sha256, store_upload
+
+# One parsed statement, as returned by the worker processes
+ParsedStatement = namedtuple('ParsedStatement', ['path', 'format_name', 'rows', 'errors', 'elapsed', 'message'])
+
+OUTPUT_COLUMNS = ['file', 'transaction_date', 'amount', 'currency', 'remarks_1', 'remarks_2', 'category']
+
+
+def expand_inputs(inputs):
+    """Statement paths named by ``inputs`` (files, directories and glob patterns), sorted and de-duplicated."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.update(os.path.join(root, name) for name in files if not name.startswith('.'))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            paths.update(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def parse_statement(path):
+    """Detect and fully parse one statement (runs in a worker process)."""
+    started = time.perf_counter()
+    bank_format = detect_bank_format(path)
+    if bank_format is None:
+        return ParsedStatement(path, None, [], [], time.perf_counter() - started, "unrecognised format")
+    report = ParseReport()
+    try:
+        rows = list(bank_format.parse(path, report))
+    except ErrorBudgetExceeded as e:
+        return ParsedStatement(path, bank_format.name, [], report.as_dict()["errors"],
+                               time.perf_counter() - started, str(e))
+    return ParsedStatement(path, bank_format.name, rows, report.as_dict()["errors"],
+                           time.perf_counter() - started, None)
+
+
+def _row_record(statement, row):
+    return {
+        "file": os.path.basename(statement.path),
+        "transaction_date": row.transaction_date.strftime('%Y-%m-%d'),
+        "amount": row.amount_cents / 100,
+        "currency": row.currency,
+        "remarks_1": row.remarks_1,
+        "remarks_2": row.remarks_2,
+        "category": row.category,
+    }
+
+
+class DatabaseTarget:
+    """Stores statements for one user of the app database, like /upload-user-file does."""
+
+    def __init__(self, engine, user_email, upload_folder):
+        self.engine = engine
+        self.upload_folder = upload_folder
+        metadata = MetaData()
+        with engine.connect() as connection:
+            if schema_version(connection) < MIGRATIONS[-1][0]:
+                raise SystemExit("The database is not up to date; start the app once to create and migrate it")
+            self.tables = {name: Table(name, metadata, autoload_with=connection)
+                           for name in ('user', 'user_file', 'bank_file_format', 'transaction', 'category_rule')}
+            user = self.tables['user']
+            self.user_id = connection.execute(select(user.c.id).where(user.c.email == user_email)).scalar()
+            if self.user_id is None:
+                raise SystemExit(f"No user with email {user_email}")
+            # Same rule order as app.get_categorizer: the user's rules first, then the defaults
+            rules = self.tables['category_rule']
+            self.categorizer = Categorizer(connection.execute(
+                select(rules.c.keyword, rules.c.category)
+                .where((rules.c.user_id == self.user_id) | rules.c.user_id.is_(None))
+                .order_by(rules.c.user_id.is_(None), rules.c.id)).all())
+            formats = self.tables['bank_file_format']
+            self.format_ids = dict(connection.execute(select(formats.c.name, formats.c.id)).all())
+
+    def _format_id(self, connection, name):
+        # Formats registered since the app last seeded bank_file_format are added here
+        if name not in self.format_ids:
+            self.format_ids[name] = connection.execute(
+                self.tables['bank_file_format'].insert().values(name=name)).inserted_primary_key[0]
+        return self.format_ids[name]
+
+    def write(self, statement):
+        user_file = self.tables['user_file']
+        sha256 = file_sha256(statement.path)
+        with self.engine.begin() as connection:
+            existing = connection.execute(
+                select(user_file.c.id)
+                .where(user_file.c.user_id == self.user_id, user_file.c.content_sha256 == sha256)).scalar()
+            if existing is not None:
+                return f"already imported as file {existing}"
+            with open(statement.path, 'rb') as source:
+                stored = store_upload(source, self.upload_folder, statement.path)
+            user_file_id = connection.execute(user_file.insert().values(
+                user_id=self.user_id, bank_file_format_id=self._format_id(connection, statement.format_name),
+                file_url=stored.path, content_sha256=sha256, created_on=datetime.utcnow(),
+            )).inserted_primary_key[0]
+            rows = fingerprint_rows(self.categorizer.categorize_rows(statement.rows), self.user_id)
+            stats = bulk_insert_transactions(connection, self.tables['transaction'], user_file_id, rows)
+            add_file_to_rollup(connection, self.user_id, user_file_id)
+        return f"stored as file {user_file_id}, {stats.duplicates} already imported rows skipped"
+
+    def close(self):
+        pass
+
+
+class FileTarget:
+    """Writes rows to a CSV file, or JSON Lines when the name ends in .jsonl."""
+
+    def __init__(self, path, categorizer):
+        self.categorizer = categorizer
+        self.json_lines = path.endswith('.jsonl')
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        if not self.json_lines:
+            self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_COLUMNS)
+            self.writer.writeheader()
+
+    def write(self, statement):
+        for row in self.categorizer.categorize_rows(statement.rows):
+            record = _row_record(statement, row)
+            if self.json_lines:
+                self.file.write(json.dumps(record) + '\n')
+            else:
+                self.writer.writerow(record)
+        return None
+
+    def close(self):
+        self.file.close()
+
+
+class SheetTarget:
+    """Collects rows and syncs them to a worksheet when closed, writing only the rows that changed."""
+
+    HEADER = ['Date', 'Amount', 'Remarks', 'Category', 'File']
+
+    def __init__(self, worksheet, categorizer):
+        self.worksheet = worksheet
+        self.categorizer = categorizer
+        self.values = []
+
+    def write(self, statement):
+        for row in self.categorizer.categorize_rows(statement.rows):
+            record = _row_record(statement, row)
+            self.values.append([record['transaction_date'], record['amount'], record['remarks_1'] or '',
+                                record['category'] or '', record['file']])
+        return None
+
+    def close(self):
+        SheetSync(self.worksheet).sync([self.HEADER] + self.values)
+
+
+def run_import(paths, targets, workers=None, out=sys.stdout):
+    """
+    Parse ``paths`` on ``workers`` processes and write each statement to every target.
+
+    Results are consumed in input order, so targets are written by this
+    process alone. Returns the number of statements that parsed.
+    """
+    imported = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for statement in executor.map(parse_statement, paths):
+            if statement.message:
+                print(f"{statement.path}: skipped, {statement.message}", file=out)
+                continue
+            notes = [note for note in (target.write(statement) for target in targets) if note]
+            rate = len(statement.rows) / statement.elapsed if statement.elapsed else 0.0
+            print(f"{statement.path}: {statement.format_name}, {len(statement.rows)} rows, "
+                  f"{len(statement.errors)} errors in {statement.elapsed:.2f}s ({rate:.0f} rows/s)"
+                  + (f"; {'; '.join(notes)}" if notes else ''), file=out)
+            imported += 1
+    for target in targets:
+        target.close()
+    print(f"{imported} of {len(paths)} statements imported in {time.perf_counter() - started:.2f}s", file=out)
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse bank statements and store the transactions.")
+    parser.add_argument('inputs', nargs='+', help="statement files, directories or glob patterns")
+    parser.add_argument('--user', help="store the transactions in the app database for this user's email")
+    parser.add_argument('--upload-folder', default='uploads', help="where --user stores the statement files")
+    parser.add_argument('--output', help="also write the rows to this .csv or .jsonl file")
+    parser.add_argument('--sheet', help="also write the rows to this Google spreadsheet")
+    parser.add_argument('--worksheet', help="worksheet of --sheet to write to (default: the first one)")
+    parser.add_argument('--credentials', help="service account JSON for --sheet")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="parser processes")
+    args = parser.parse_args()
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("no statement files found")
+    categorizer = Categorizer(DEFAULT_CATEGORY_RULES)
+    targets = []
+    if args.user:
+        os.makedirs(args.upload_folder, exist_ok=True)
+        targets.append(DatabaseTarget(create_sqlite_engine(), args.user, args.upload_folder))
+    if args.output:
+        targets.append(FileTarget(args.output, categorizer))
+    if args.sheet:
+        worksheet = open_worksheet(args.sheet, args.worksheet, args.credentials or CREDENTIALS_FILE)
+        targets.append(SheetTarget(worksheet, categorizer))
+    if not targets:
+        parser.error("nothing to write to; pass --user, --output or --sheet")
+    run_import(paths, targets, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
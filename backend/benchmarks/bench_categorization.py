@@ -0,0 +1,85 @@
+"""The compiled Categorizer against the per-category substring loop it replaced.
+
+    python benchmarks/bench_categorization.py --rules 1000 --transactions 1000000
+
+The old loop is timed on ``--loop-sample`` transactions only (it is
+rules x transactions substring scans) and extrapolated to the full count.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categorization import Categorizer, CategoryRule  # noqa: E402
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'pu', 'ra', 'si', 'to', 'vu', 'ze', 'ba', 'do']
+
+
+def word(generator, syllables):
+    return ''.join(generator.choice(SYLLABLES) for _ in range(syllables))
+
+
+def make_rules(generator, count):
+    return [CategoryRule(word(generator, 3), f"Category {number % 40}") for number in range(count)]
+
+
+def make_remarks(generator, rules, count, merchants):
+    """``count`` (remarks_1, remarks_2) pairs drawn from ``merchants`` distinct ones, half naming a keyword."""
+    pool = []
+    for number in range(merchants):
+        name = f"{word(generator, 2)} {generator.choice(rules).keyword if number % 2 else word(generator, 3)}"
+        pool.append((f"{name.upper()} {number}", 'SINGAPORE SG'))
+    return [generator.choice(pool) for _ in range(count)]
+
+
+def substring_loop(rules, remarks_1, remarks_2):
+    """What familyExpenses2025.categorize_expenses did per entry: every category, ``in`` the lowercased text."""
+    entry_lower = f"{remarks_1} {remarks_2}".lower()
+    for rule in rules:
+        if rule.keyword.lower() in entry_lower:
+            return rule.category
+    return None
+
+
+def timed(function, remarks):
+    started = time.perf_counter()
+    for remarks_1, remarks_2 in remarks:
+        function(remarks_1, remarks_2)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, default=1000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--merchants', type=int, default=5000, help="distinct remarks among the transactions")
+    parser.add_argument('--loop-sample', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    rules = make_rules(generator, args.rules)
+    remarks = make_remarks(generator, rules, args.transactions, args.merchants)
+
+    started = time.perf_counter()
+    categorizer = Categorizer(rules)
+    compile_time = time.perf_counter() - started
+    cached = timed(categorizer.classify, remarks)
+    uncached = timed(Categorizer(rules, cache_size=0).classify, remarks[:args.loop_sample])
+    loop = timed(lambda r1, r2: substring_loop(rules, r1, r2), remarks[:args.loop_sample])
+    scale = args.transactions / min(args.loop_sample, args.transactions)
+
+    print(f"{args.rules} rules x {args.transactions} transactions ({args.merchants} distinct remarks)")
+    print(f"compile:              {compile_time * 1000:.1f} ms")
+    print(f"Categorizer:          {cached:.2f}s ({args.transactions / cached:,.0f} rows/s), "
+          f"cache {categorizer.cache.stats()['hit_rate']:.0%} hits")
+    print(f"Categorizer no cache: {uncached * scale:.2f}s (extrapolated from {args.loop_sample})")
+    print(f"substring loop:       {loop * scale:.2f}s (extrapolated from {args.loop_sample})")
+    print(f"speedup:              {loop * scale / cached:.0f}x, {loop / uncached:.0f}x without the cache")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Read throughput while a statement is being ingested, with the shared WAL engine and with SQLite's defaults.
+
+    python benchmarks/bench_db_concurrency.py --readers 4 --rows 400000
+
+For each mode a scratch database is seeded, then one thread ingests
+``--rows`` rows with bulk_insert_transactions, one write transaction per
+``--file-rows`` (one statement upload each), while reader threads run the
+per-file date range query of the file listing. Reads that fail, such as
+"database is locked", are counted rather than retried.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_engine import create_sqlite_engine  # noqa: E402
+from ingestion import TransactionRow, bulk_insert_transactions, fingerprint_rows  # noqa: E402
+
+SCHEMA = [
+    'CREATE TABLE user_file (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL)',
+    '''CREATE TABLE "transaction" (
+        id INTEGER NOT NULL PRIMARY KEY,
+        transaction_date DATETIME NOT NULL,
+        amount_cents BIGINT NOT NULL,
+        currency VARCHAR(3) NOT NULL,
+        remarks_1 VARCHAR(200),
+        remarks_2 VARCHAR(200),
+        category VARCHAR(50),
+        fingerprint VARCHAR(64),
+        user_file_id INTEGER NOT NULL REFERENCES user_file (id),
+        created_on DATETIME
+    )''',
+    'CREATE UNIQUE INDEX ix_transaction_fingerprint ON "transaction" (fingerprint)',
+    'CREATE INDEX ix_transaction_user_file_id_transaction_date ON "transaction" (user_file_id, transaction_date)',
+    '''CREATE TABLE transaction_source (
+        transaction_id INTEGER NOT NULL, user_file_id INTEGER NOT NULL, PRIMARY KEY (transaction_id, user_file_id)
+    )''',
+]
+
+READ = text('SELECT COUNT(*), SUM(amount_cents) FROM "transaction" '
+            'WHERE user_file_id = :user_file_id AND transaction_date BETWEEN :start AND :end')
+
+START = datetime(2025, 1, 1)
+
+
+def make_engine(path, mode):
+    url = f"sqlite:///{path}"
+    if mode == 'wal':
+        return create_sqlite_engine(url)
+    # What both apps did before db_engine: rollback journal and sqlite3's 5s timeout
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def statement(file_number, rows):
+    return [TransactionRow(START + timedelta(days=i % 365), -(100 + i), f"MERCHANT {file_number} {i}")
+            for i in range(rows)]
+
+
+def ingest(engine, table, first_file, rows, file_rows):
+    """Ingest ``rows`` rows as files of ``file_rows``, one transaction each; returns the files written."""
+    files = []
+    for number in range(first_file, first_file + (rows + file_rows - 1) // file_rows):
+        with engine.begin() as connection:
+            connection.execute(text('INSERT INTO user_file (id, user_id) VALUES (:id, 1)'), {"id": number})
+            bulk_insert_transactions(connection, table, number,
+                                     fingerprint_rows(statement(number, min(file_rows, rows)), 1))
+        rows -= file_rows
+        files.append(number)
+    return files
+
+
+def run(mode, args, directory):
+    path = os.path.join(directory, f"{mode}.db")
+    engine = make_engine(path, mode)
+    with engine.begin() as connection:
+        for sql in SCHEMA:
+            connection.exec_driver_sql(sql)
+    metadata = MetaData()
+    metadata.reflect(engine, only=['transaction'])
+    table = metadata.tables['transaction']
+    seeded = ingest(engine, table, 1, args.seed_rows, args.file_rows)
+
+    stop = threading.Event()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def read(reader):
+        number = 0
+        while not stop.is_set():
+            number += 1
+            start = START + timedelta(days=number * 7 % 300)
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(READ, {"user_file_id": seeded[(reader + number) % len(seeded)],
+                                              "start": start, "end": start + timedelta(days=30)}).one()
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    readers = [threading.Thread(target=read, args=(reader,)) for reader in range(args.readers)]
+    for thread in readers:
+        thread.start()
+    started = time.perf_counter()
+    ingest(engine, table, len(seeded) + 1, args.rows, args.file_rows)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in readers:
+        thread.join()
+    engine.dispose()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    print(f"{mode:<8} ingest {args.rows} rows in {elapsed:.1f}s; {len(latencies)} reads "
+          f"({len(latencies) / elapsed:,.0f}/s), p99 {p99:.1f} ms, {len(errors)} failed reads"
+          + (f" ({errors[0]})" if errors else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4, help="reader threads")
+    parser.add_argument('--rows', type=int, default=400000, help="rows ingested while reading")
+    parser.add_argument('--file-rows', type=int, default=50000, help="rows per statement (write transaction)")
+    parser.add_argument('--seed-rows', type=int, default=100000, help="rows stored before the readers start")
+    parser.add_argument('--mode', choices=['wal', 'default', 'both'], default='both')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in (['wal', 'default'] if args.mode == 'both' else [args.mode]):
+            run(mode, args, directory)
+
+
+if __name__ == '__main__':
+    main()
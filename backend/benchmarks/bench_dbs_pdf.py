@@ -0,0 +1,84 @@
+"""DBS credit card PDF parsing with pages split across a process pool, against the serial parse.
+
+    python benchmarks/bench_dbs_pdf.py --pages 200 --workers 4
+
+The pooled timing includes starting its worker processes, as an upload does.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import iter_dbs_pdf_rows  # noqa: E402
+
+MONTHS = ['NOV', 'DEC']
+
+
+def page_content(page, lines):
+    """The text of one statement page: ``lines`` transaction lines, every ninth one a CR credit."""
+    shown = []
+    for line in range(lines):
+        i = page * lines + line
+        amount = f"{1 + i % 900}.{i % 100:02d}" + (' CR' if i % 9 == 0 else '')
+        shown.append(f"({1 + i % 28:02d} {MONTHS[i % 2]}   MERCHANT {i % 500} SINGAPORE   {amount}) Tj 0 -14 Td")
+    header = "(Statement Date 31 Dec 2025) Tj 0 -14 Td " if page == 0 else ''
+    return f"BT /F1 10 Tf 40 800 Td {header}{' '.join(shown)} ET".encode()
+
+
+def write_statement(path, pages, lines):
+    """A PDF of ``pages`` pages of Helvetica text."""
+    page_numbers = [4 + 2 * page for page in range(pages)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % n for n in page_numbers), pages),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page, number in enumerate(page_numbers):
+        content = page_content(page, lines)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (number + 1))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(pdf)
+
+
+def timed(path, workers):
+    started = time.perf_counter()
+    rows = list(iter_dbs_pdf_rows(path, workers=workers))
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=40, help="transaction lines per page")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dbs.pdf')
+        write_statement(path, args.pages, args.lines)
+        serial_rows, serial = timed(path, 1)
+        pooled_rows, pooled = timed(path, args.workers)
+
+    if pooled_rows != serial_rows:
+        raise SystemExit("The pooled parse returned different rows from the serial parse")
+    print(f"{'serial:':<13}{len(serial_rows)} rows from {args.pages} pages in {serial:.2f}s")
+    print(f"{f'{args.workers} workers:':<13}{len(pooled_rows)} rows in {pooled:.2f}s")
+    print(f"{'speedup:':<13}{serial / pooled:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Requests/sec and p99 latency of the FastAPI async read routes against sync versions of the same routes.
+
+    python benchmarks/bench_fast_app.py --concurrency 32 --requests 2000
+
+Starts uvicorn in a child process on a scratch database. The child also
+mounts /sync/... copies of /user-files, /user-files/{id} and /transactions
+that run the same SELECTs through the sync Session and get_db, the way the
+routes worked before they moved to AsyncSession. Each route is then hit
+with ``--concurrency`` concurrent clients.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+API_KEY = {"X-API-Key": "your_secret_api_key"}
+
+SERVER = """
+import sys
+from datetime import datetime, timedelta
+from typing import List
+sys.path.insert(0, {repo!r})
+
+import uvicorn
+from fastapi import Depends, HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, selectinload
+
+from backend import fast_app as api
+
+api.Base.metadata.create_all(api.engine)
+with api.engine.begin() as connection:
+    connection.execute(insert(api.BankFileFormat), [{{"id": 1, "name": "DBS Savings Account (CSV)"}}])
+    connection.execute(insert(api.UserFile), [
+        {{"id": f, "user_id": 1 + f % 10, "bank_file_format_id": 1, "file_url": f"uploads/{{f}}.csv"}}
+        for f in range(1, {files} + 1)])
+    connection.execute(insert(api.Transaction), [
+        {{"transaction_date": datetime(2025, 1, 1) + timedelta(hours=i), "amount_cents": -(100 + i % 5000),
+          "currency": "SGD", "remarks_1": f"MERCHANT {{i % 500}}", "user_file_id": 1 + i % {files}}}
+        for i in range({rows})])
+
+sync_routes = dict(dependencies=[Depends(api.get_api_key)])
+
+@api.app.get("/sync/user-files", response_model=List[api.UserFileSchema], **sync_routes)
+def sync_user_files(skip: int = 0, limit: int = 10, db: Session = Depends(api.get_db)):
+    return db.execute(select(api.UserFile).options(selectinload(api.UserFile.transactions))
+                      .order_by(api.UserFile.id).offset(skip).limit(limit)).scalars().all()
+
+@api.app.get("/sync/user-files/{{user_file_id}}", response_model=api.UserFileSchema, **sync_routes)
+def sync_user_file(user_file_id: int, db: Session = Depends(api.get_db)):
+    user_file = db.execute(select(api.UserFile).options(selectinload(api.UserFile.transactions))
+                           .where(api.UserFile.id == user_file_id)).scalars().first()
+    if user_file is None:
+        raise HTTPException(status_code=404, detail="User file not found")
+    return user_file
+
+@api.app.get("/sync/transactions", response_model=api.TransactionPageSchema, **sync_routes)
+def sync_transactions(limit: int = 10, sort_by: str = "date_desc", db: Session = Depends(api.get_db)):
+    column, descending = api.TRANSACTION_SORTS[sort_by]
+    order = [column.desc(), api.Transaction.id.desc()] if descending else [column, api.Transaction.id]
+    rows = db.execute(select(api.Transaction).order_by(*order).limit(limit + 1)).scalars().all()
+    page = rows[:limit]
+    return {{"transactions": page, "next_cursor": api.encode_cursor(sort_by, page[-1]) if len(rows) > limit else None}}
+
+uvicorn.run(api.app, host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+# (label, path) of each route, without the /sync prefix
+ROUTES = [
+    ("user-files", "/user-files?limit=10"),
+    ("user-files/{id}", "/user-files/{id}"),
+    ("transactions", "/transactions?limit=50&sort_by=date_desc"),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(base_url, process):
+    for _ in range(600):
+        if process.poll() is not None:
+            raise SystemExit("The app exited during startup")
+        try:
+            return httpx.get(f"{base_url}/bank-file-formats")
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise SystemExit("The app did not start")
+
+
+async def load(base_url, path, files, concurrency, requests):
+    """Send ``requests`` GETs from ``concurrency`` clients; returns (elapsed seconds, sorted latencies)."""
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client(http):
+        for number in remaining:
+            started = time.perf_counter()
+            response = await http.get(path.format(id=1 + number % files), headers=API_KEY)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32, help="concurrent clients")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per route")
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=20000, help="transactions spread over the files")
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as work_dir:
+        env = {**os.environ, 'EXPENSE_TRACKER_DB': os.path.join(work_dir, 'expense_tracker.db')}
+        code = SERVER.format(repo=REPO_DIR, port=port, files=args.files, rows=args.rows)
+        server = subprocess.Popen([sys.executable, '-c', code], cwd=work_dir, env=env)
+        try:
+            wait_for_server(base_url, server)
+            for label, path in ROUTES:
+                for prefix in ('/sync', ''):
+                    elapsed, latencies = asyncio.run(
+                        load(base_url, prefix + path, args.files, args.concurrency, args.requests))
+                    p50 = latencies[len(latencies) // 2] * 1000
+                    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+                    print(f"{'async' if not prefix else 'sync':<6}{label:<17}{args.requests / elapsed:8,.0f} req/s  "
+                          f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Column-wise Standard Chartered XLSX parsing against the row-by-row loop it replaced.
+
+    python benchmarks/bench_sc_xlsx.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import column_indexs, iter_sc_xlsx_rows  # noqa: E402
+
+WIDTH = 15
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def write_workbook(path, rows):
+    """A Table 1 sheet of ``rows`` card transactions, every tenth one a CR credit."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Table 1')
+    sheet.append(['Statement Date: 31 Dec 2025'])
+    for i in range(rows):
+        row = [None] * WIDTH
+        row[0] = f"{1 + i % 28:02d} {MONTHS[i % 12]}"
+        row[3] = f"MERCHANT {i % 500} SINGAPORE"
+        row[14] = f"{(i % 90000) / 100 + 1:,.2f}" + ('CR' if i % 10 == 0 else '')
+        sheet.append(row)
+    workbook.save(path)
+
+
+def iterrows_rows(file_path):
+    """The loop parse_sc_transactions used to run: iterrows, strptime and float() per row."""
+    def process_amount(value):
+        if isinstance(value, str) and "CR" in value:
+            return abs(float(value.replace(',', '').replace('CR', '').strip()))
+        try:
+            return -abs(float(value))
+        except ValueError:
+            return 0.0
+
+    xls = pd.ExcelFile(file_path, engine='openpyxl')
+    rows = []
+    for sheet_name in xls.sheet_names:
+        if sheet_name not in column_indexs:
+            continue
+        columns = column_indexs[sheet_name]
+        df = pd.read_excel(xls, sheet_name=sheet_name, engine='openpyxl')
+        for _, row in df.iterrows():
+            try:
+                transaction_date = datetime.strptime(str(row.iloc[columns['transaction_date']]), '%d %b')
+            except ValueError:
+                continue
+            rows.append((transaction_date, process_amount(row.iloc[columns['amount']]),
+                         row.iloc[columns['description_1']]))
+    return rows
+
+
+def timed(parse, path):
+    started = time.perf_counter()
+    count = len(parse(path))
+    return count, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000, help="transactions in the generated workbook")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sc.xlsx')
+        write_workbook(path, args.rows)
+        old_rows, old = timed(iterrows_rows, path)
+        new_rows, new = timed(lambda p: list(iter_sc_xlsx_rows(p)), path)
+
+    print(f"iterrows:    {old_rows} rows in {old:.2f}s ({old_rows / old:,.0f} rows/s)")
+    print(f"column-wise: {new_rows} rows in {new:.2f}s ({new_rows / new:,.0f} rows/s)")
+    print(f"speedup:     {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
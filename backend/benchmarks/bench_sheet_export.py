@@ -0,0 +1,110 @@
+"""Sheets API requests and cells sent by the incremental DeltaExporter against rewriting the whole worksheet.
+
+    python benchmarks/bench_sheet_export.py --rows 100000 --new-rows 200
+
+Runs against the in-memory FakeWorksheet on a scratch database, so no
+credentials or network are needed. ``--rows`` transactions are stored and
+exported once, then ``--new-rows`` more are stored and exported again. The
+second run is compared with what the export did before DeltaExporter:
+clear the worksheet and write the header and every transaction in one
+update.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sheets import FakeWorksheet  # noqa: E402
+
+
+class CountingWorksheet(FakeWorksheet):
+    """A FakeWorksheet that also counts the cells written to it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cells = 0
+
+    def append_rows(self, values, value_input_option='RAW'):
+        self.cells += sum(len(row) for row in values)
+        super().append_rows(values, value_input_option)
+
+    def update(self, range_name, values):
+        self.cells += sum(len(row) for row in values)
+        super().update(range_name, values)
+
+
+def store(app, user_id, first, count):
+    """Store ``count`` transactions in a new file of ``user_id``."""
+    from ingestion import TransactionRow, bulk_insert_transactions, fingerprint_rows
+
+    start = datetime(2025, 1, 1)
+    with app.app.app_context():
+        user_file = app.UserFile(user_id=user_id, bank_file_format_id=1, file_url=f"uploads/{first}.csv")
+        app.db.session.add(user_file)
+        app.db.session.flush()
+        rows = [TransactionRow(start + timedelta(minutes=i), -(100 + i % 5000), f"MERCHANT {i}", 'SINGAPORE SG')
+                for i in range(first, first + count)]
+        bulk_insert_transactions(app.db.session, app.Transaction.__table__, user_file.id,
+                                 fingerprint_rows(rows, user_id))
+        app.db.session.commit()
+
+
+def measure(label, worksheet, run):
+    calls, cells = worksheet.calls, worksheet.cells
+    started = time.perf_counter()
+    result = run()
+    print(f"{label:<14}{time.perf_counter() - started:7.2f}s  {worksheet.calls - calls:3} requests  "
+          f"{worksheet.cells - cells:9,} cells")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help="transactions stored before the first export")
+    parser.add_argument('--new-rows', type=int, default=200, help="transactions stored before the second export")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # app.py logs to backend/app.log relative to the working directory, and creates the database on import
+        os.makedirs(os.path.join(work_dir, 'backend'))
+        os.chdir(work_dir)
+        os.environ['EXPENSE_TRACKER_DB'] = os.path.join(work_dir, 'expense_tracker.db')
+        import app
+        from sheet_export import HEADER, DeltaExporter
+
+        with app.app.app_context():
+            user = app.User(email='bench@example.com', password='x')
+            app.db.session.add(user)
+            app.db.session.commit()
+            user_id = user.id
+            engine = app.db.engine
+        store(app, user_id, 0, args.rows)
+
+        worksheet = CountingWorksheet()
+        exporter = DeltaExporter(engine, user_id, worksheet, 'bench/Transactions')
+        measure("first export", worksheet, exporter.export)
+        store(app, user_id, args.rows, args.new_rows)
+        exported = measure("delta export", worksheet, exporter.export)
+        assert exported == args.new_rows and len(worksheet.rows) == args.rows + args.new_rows + 1
+
+        def full_rewrite():
+            with engine.connect() as connection:
+                rows = connection.exec_driver_sql(
+                    'SELECT id, transaction_date, amount_cents, currency, remarks_1, remarks_2, category '
+                    'FROM "transaction" ORDER BY id').all()
+            worksheet.clear()
+            worksheet.update('A1', [HEADER] + [
+                [row[0], row[1][:10], row[2] / 100, row[3], row[4] or '', row[5] or '', row[6] or '']
+                for row in rows])
+
+        measure("full rewrite", worksheet, full_rewrite)
+        app.upload_jobs.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Peak memory of the Flask app while it receives many large statement uploads at once.
+
+    python benchmarks/bench_uploads.py --uploads 20 --size-mb 50
+
+Starts the app on a threaded Werkzeug server in a child process, with a
+scratch database and upload folder, streams the uploads to it concurrently
+and samples the server's resident set size (from /proc, so Linux only).
+The uploads are plain text, so each is stored, then rejected as an
+unrecognised statement and discarded: the benchmark covers receiving and
+storing, not parsing.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOCK = 1024 * 1024
+BOUNDARY = 'benchmark-boundary'
+
+SERVER = """
+import sys
+sys.path.insert(0, {backend!r})
+import app
+from werkzeug.serving import make_server
+make_server('127.0.0.1', {port}, app.app, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def request(port, method, url, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    try:
+        connection.request(method, url, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    finally:
+        connection.close()
+
+
+def wait_for_server(port, process):
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit("The app exited during startup")
+        try:
+            return request(port, 'GET', '/bank-file-formats')
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("The app did not start")
+
+
+def login(port):
+    credentials = json.dumps({"email": "bench@example.com", "password": "password1"})
+    headers = {'Content-Type': 'application/json'}
+    request(port, 'POST', '/register', credentials, headers)
+    status, body = request(port, 'POST', '/login', credentials, headers)
+    return {'Authorization': f"Bearer {body['access_token']}"}
+
+
+def upload(port, headers, number, size):
+    """Stream one multipart upload of ``size`` bytes without holding it in memory."""
+    head = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="upload-{number}.csv"\r\n'
+            'Content-Type: text/csv\r\n\r\n').encode()
+    tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+    line = f"{number:08d},statement line\n".encode()
+    block = line * (BLOCK // len(line)) + b'#' * (BLOCK % len(line))
+
+    def body():
+        yield head
+        for _ in range(size // BLOCK):
+            yield block
+        yield tail
+
+    return request(port, 'POST', '/upload-user-file', body(), {
+        **headers,
+        'Content-Type': f'multipart/form-data; boundary={BOUNDARY}',
+        'Content-Length': str(len(head) + size // BLOCK * BLOCK + len(tail)),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=20, help="concurrent uploads")
+    parser.add_argument('--size-mb', type=int, default=50, help="size of each upload")
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.makedirs(os.path.join(work_dir, 'backend'))  # app.log
+        env = {**os.environ, 'EXPENSE_TRACKER_DB': os.path.join(work_dir, 'expense_tracker.db'),
+               'MAX_UPLOAD_BYTES': str((args.size_mb + 1) * BLOCK)}
+        server = subprocess.Popen([sys.executable, '-c', SERVER.format(backend=BACKEND_DIR, port=port)],
+                                  cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(port, server)
+            headers = login(port)
+            idle = rss_kb(server.pid)
+            peak = {"kb": idle}
+            done = threading.Event()
+
+            def sample():
+                while not done.is_set():
+                    peak["kb"] = max(peak["kb"], rss_kb(server.pid))
+                    time.sleep(0.02)
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.uploads) as pool:
+                results = list(pool.map(lambda n: upload(port, headers, n, args.size_mb * BLOCK),
+                                        range(args.uploads)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            sampler.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+    responses = Counter(f"{status} {body.get('message')}" for status, body in results)
+    total_mb = args.uploads * args.size_mb
+    print(f"{args.uploads} concurrent uploads of {args.size_mb} MB ({total_mb} MB) in {elapsed:.1f}s, "
+          f"responses {dict(responses)}")
+    print(f"server RSS idle {idle / 1024:.0f} MB, peak {peak['kb'] / 1024:.0f} MB "
+          f"(+{(peak['kb'] - idle) / 1024:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Keyword-based spending categorization.
+
+A rule set maps keywords (matched case-insensitively anywhere in a
+transaction's remarks) to a category. ``Categorizer`` compiles all the
+keywords into a single trie-shaped regular expression, so classifying a
+transaction is one regex search no matter how many rules there are.
+
+Statements repeat the same merchant strings over and over, so each
+Categorizer also keeps a bounded LRU cache of normalized remark ->
+category. The cache belongs to one rule set (identified by ``version``, a
+hash of its rules), so changing the rules starts from an empty cache;
+``load_category_cache`` and ``save_category_cache`` persist it in the
+``category_cache`` table between runs.
+"""
+import hashlib
+import re
+from collections import namedtuple
+
+from sqlalchemy import text
+
+from caching import LRUCache
+
+CategoryRule = namedtuple('CategoryRule', ['keyword', 'category'])
+
+# Define your spending categories
+CATEGORIES = ['Travel', 'Food', 'Outings', 'Entertainment', 'shopping', 'Medical', 'Grocery', 'PUB',
+              'Mobile & Internet', 'School fees', 'Misc']
+
+# Every category name is also a keyword for itself until users add their own rules
+DEFAULT_CATEGORY_RULES = [CategoryRule(category, category) for category in CATEGORIES]
+
+# Distinct remarks remembered per rule set
+DEFAULT_CACHE_SIZE = 10000
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_remark(value):
+    """Case-fold and collapse whitespace, so trivially different spellings share a cache entry."""
+    return _WHITESPACE.sub(' ', value).strip().casefold()
+
+
+def rule_set_version(rules):
+    """Hash of the (keyword, category) pairs of ``rules``, in order."""
+    digest = hashlib.sha256()
+    for rule in rules:
+        digest.update(f"{rule.keyword}\x1f{rule.category}\x1e".encode())
+    return digest.hexdigest()
+
+
+def _trie_pattern(keywords):
+    """Build a regex matching any of ``keywords``, factored as a trie so shared prefixes are tested once."""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    # A keyword ends here, so the longer continuations are optional (and greedy)
+    return f'(?:{body})?' if '' in node else body
+
+
+class Categorizer:
+    """
+    Classifies text with a compiled rule set.
+
+    When several keywords match, the leftmost one wins, and at the same
+    position the longest; if two rules share a keyword the first one wins.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, rules, cache_size=DEFAULT_CACHE_SIZE):
+        self.rules = list(rules)
+        self.version = rule_set_version(self.rules)
+        self.cache = LRUCache(cache_size)
+        self._categories = {}
+        for rule in self.rules:
+            keyword = normalize_remark(rule.keyword)
+            if keyword:
+                self._categories.setdefault(keyword, rule.category)
+        # Keywords and remarks are both case-folded, so the pattern can match case-sensitively
+        self._pattern = re.compile(_trie_pattern(self._categories)) if self._categories else None
+
+    def classify(self, *texts):
+        """Return the category of the first keyword found in ``texts``, or None."""
+        # A newline keeps a keyword from matching across two fields
+        remark = '\n'.join(normalize_remark(text) for text in texts if text)
+        category = self.cache.get(remark, self._MISSING)
+        if category is self._MISSING:
+            category = self._match(remark)
+            self.cache.put(remark, category)
+        return category
+
+    def _match(self, remark):
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(remark)
+        return self._categories[match.group()] if match else None
+
+    def categorize_rows(self, rows):
+        """Yield TransactionRows with ``category`` filled in from their remarks."""
+        for row in rows:
+            if row.category is None:
+                row = row._replace(category=self.classify(row.remarks_1, row.remarks_2))
+            yield row
+
+
+def load_category_cache(session, categorizer):
+    """Warm ``categorizer``'s cache with the entries persisted for its rule set."""
+    rows = session.execute(text("SELECT remark, category FROM category_cache WHERE rule_set_hash = :version"),
+                           {"version": categorizer.version})
+    for remark, category in rows:
+        categorizer.cache.put(remark, category)
+
+
+def save_category_cache(session, categorizer):
+    """Replace the persisted entries of ``categorizer``'s rule set with its current cache (not committed)."""
+    session.execute(text("DELETE FROM category_cache WHERE rule_set_hash = :version"),
+                    {"version": categorizer.version})
+    entries = [{"version": categorizer.version, "remark": remark, "category": category}
+               for remark, category in categorizer.cache.items()]
+    if entries:
+        session.execute(text("INSERT INTO category_cache (rule_set_hash, remark, category) "
+                             "VALUES (:version, :remark, :category)"), entries)
+
+
+def clear_category_cache(session):
+    """Drop every persisted entry, e.g. after the rules changed (not committed)."""
+    session.execute(text("DELETE FROM category_cache"))
@@ -0,0 +1,199 @@
+"""Apache Parquet export and import of the transaction table.
+
+Exports stream the table in record batches of ``EXPORT_BATCH_SIZE`` rows,
+so memory stays bounded however many transactions are exported. They are
+written either as a single Parquet file or as a dataset directory
+partitioned by month (``year_month=2025-01/part-0.parquet``, Hive style)
+that pandas, DuckDB, Spark and pyarrow can read directly.
+
+Exported files are imported back like any other statement: they are a
+registered bank format (see ``parsers.parse_parquet``), so uploads and
+``batch_import.py`` fingerprint, categorize and store them on the usual
+ingestion path.
+
+pyarrow is optional: it is imported only when Parquet is read or written.
+
+    python columnar.py exports/ --user me@example.com --start-date 2025-01-01
+    python batch_import.py exports/ --user someone@example.com
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# Rows per record batch, and per Parquet row group
+EXPORT_BATCH_SIZE = 50000
+PARTITION_COLUMN = 'year_month'
+# Columns an import needs; the rest of the export schema is optional on the way back in
+REQUIRED_COLUMNS = {'transaction_date', 'amount_cents', 'remarks_1'}
+
+_EXPORT_QUERY = (
+    'SELECT t.id, uf.user_id, t.user_file_id, t.transaction_date, t.amount_cents, t.currency, t.remarks_1, '
+    "t.remarks_2, t.category, t.fingerprint, t.created_on, strftime('%Y-%m', t.transaction_date) AS year_month "
+    'FROM "transaction" t JOIN user_file uf ON uf.id = t.user_file_id'
+)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet support needs pyarrow; install it with: pip install pyarrow")
+    return pyarrow
+
+
+def transaction_schema():
+    """Arrow schema of exported transactions; amounts stay integer cents."""
+    pa = _pyarrow()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('user_file_id', pa.int64()),
+        ('transaction_date', pa.timestamp('us')),
+        ('amount_cents', pa.int64()),
+        ('currency', pa.string()),
+        ('remarks_1', pa.string()),
+        ('remarks_2', pa.string()),
+        ('category', pa.string()),
+        ('fingerprint', pa.string()),
+        ('created_on', pa.timestamp('us')),
+        (PARTITION_COLUMN, pa.string()),
+    ])
+
+
+def iter_transaction_batches(connection, user_id=None, start_date=None, end_date=None,
+                             batch_size=EXPORT_BATCH_SIZE):
+    """Yield the transactions matching the filters as Arrow RecordBatches, in id order."""
+    pa = _pyarrow()
+    schema = transaction_schema()
+    conditions = []
+    dates = []
+    if user_id is not None:
+        conditions.append('uf.user_id = :user_id')
+    if start_date is not None:
+        conditions.append('t.transaction_date >= :start_date')
+        dates.append(bindparam('start_date', start_date, type_=DateTime))
+    if end_date is not None:
+        conditions.append('t.transaction_date <= :end_date')
+        dates.append(bindparam('end_date', end_date, type_=DateTime))
+    query = _EXPORT_QUERY + (f" WHERE {' AND '.join(conditions)}" if conditions else '') + ' ORDER BY t.id'
+    # Dates are bound as DateTime so they render like the stored values ('... 00:00:00.000000');
+    # a plain datetime parameter would sort before a stored midnight and drop the end day
+    statement = text(query).bindparams(*dates).columns(transaction_date=DateTime, created_on=DateTime)
+    result = connection.execute(statement, {"user_id": user_id} if user_id is not None else {}).yield_per(batch_size)
+    for rows in result.partitions():
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+
+
+def write_parquet_file(batches, path):
+    """Write RecordBatches to a single Parquet file, one row group per batch; returns the row count."""
+    pa = _pyarrow()
+    rows = 0
+    with pa.parquet.ParquetWriter(path, transaction_schema(), compression='zstd') as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def write_parquet_dataset(batches, directory, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Write RecordBatches to ``directory`` partitioned by transaction month; returns the row count.
+
+    Months being written replace what an earlier export left in their
+    partition; other months are kept.
+    """
+    pa = _pyarrow()
+    counted = {"rows": 0}
+
+    def counting(batches):
+        for batch in batches:
+            counted["rows"] += batch.num_rows
+            yield batch
+
+    pa.dataset.write_dataset(
+        counting(batches), directory, schema=transaction_schema(), format='parquet',
+        partitioning=[PARTITION_COLUMN], partitioning_flavor='hive',
+        basename_template='part-{i}.parquet', existing_data_behavior='delete_matching',
+        max_rows_per_group=batch_size, max_rows_per_file=0,
+        file_options=pa.dataset.ParquetFileFormat().make_write_options(compression='zstd'),
+    )
+    return counted["rows"]
+
+
+def export_transactions(connection, destination, user_id=None, start_date=None, end_date=None,
+                        batch_size=EXPORT_BATCH_SIZE):
+    """Export to a single file when ``destination`` ends in .parquet, otherwise to a partitioned directory."""
+    batches = iter_transaction_batches(connection, user_id, start_date, end_date, batch_size)
+    if destination.endswith('.parquet'):
+        return write_parquet_file(batches, destination)
+    return write_parquet_dataset(batches, destination, batch_size)
+
+
+def is_transaction_export(file_path):
+    """Whether a Parquet file has the columns of a transaction export (reads only its footer)."""
+    try:
+        pa = _pyarrow()
+        names = set(pa.parquet.read_schema(file_path).names)
+    except RuntimeError:
+        logger.warning(f"Not reading {file_path}: pyarrow is not installed")
+        return False
+    except (OSError, ValueError):
+        return False
+    return REQUIRED_COLUMNS <= names
+
+
+def iter_parquet_records(path, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of row dicts, one list per record batch, from a Parquet file or partitioned directory."""
+    pa = _pyarrow()
+    if os.path.isdir(path):
+        batches = pa.dataset.dataset(path, format='parquet', partitioning='hive').to_batches(batch_size=batch_size)
+    else:
+        batches = pa.parquet.ParquetFile(path).iter_batches(batch_size=batch_size)
+    for batch in batches:
+        yield batch.to_pylist()
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+def main():
+    # Imported here: fast_app imports this module as part of the backend package
+    from db_engine import create_sqlite_engine
+
+    parser = argparse.ArgumentParser(description="Stream the transaction table into Parquet.")
+    parser.add_argument('destination', help="a .parquet file, or a directory to partition by month")
+    parser.add_argument('--user', help="only this user's transactions (email)")
+    parser.add_argument('--start-date', type=_parse_date, help="first transaction date, YYYY-MM-DD")
+    parser.add_argument('--end-date', type=_parse_date, help="last transaction date, YYYY-MM-DD")
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE, help="rows per record batch")
+    args = parser.parse_args()
+
+    engine = create_sqlite_engine()
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        user_id = None
+        if args.user:
+            user_id = connection.execute(text('SELECT id FROM user WHERE email = :email'),
+                                         {"email": args.user}).scalar()
+            if user_id is None:
+                raise SystemExit(f"No user with email {args.user}")
+        rows = export_transactions(connection, args.destination, user_id, args.start_date, args.end_date,
+                                   args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {rows} transactions to {args.destination} in {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Shared SQLite engine configuration for the Flask and FastAPI apps.
+
+Both apps point at the same database file and open it with the same pool
+and pragmas: WAL journaling lets readers keep going while an upload is
+being ingested, and the busy timeout makes concurrent writers wait for the
+lock instead of failing with "database is locked".
+"""
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE_PATH = os.getenv('EXPENSE_TRACKER_DB', os.path.join(BACKEND_DIR, 'instance', 'expense_tracker.db'))
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+# Seconds a connection waits for a lock held by another writer
+BUSY_TIMEOUT = 30
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 20))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # Durable at checkpoints, safe with WAL
+    "cache_size": -64000,  # Negative means KiB, so 64 MB of page cache per connection
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": BUSY_TIMEOUT * 1000,
+}
+
+
+def engine_options(pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW):
+    """Keyword arguments for create_engine (or Flask-SQLAlchemy's SQLALCHEMY_ENGINE_OPTIONS)."""
+    return {
+        "connect_args": {"check_same_thread": False, "timeout": BUSY_TIMEOUT},
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_pre_ping": True,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def install_sqlite_pragmas(engine):
+    """Run SQLITE_PRAGMAS on every new DBAPI connection of ``engine``."""
+    if not event.contains(engine, "connect", _apply_sqlite_pragmas):
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def ensure_database_dir():
+    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+
+
+def create_sqlite_engine(url=DATABASE_URL, **options):
+    """Create a pooled SQLite engine with the shared pragmas installed."""
+    if url == DATABASE_URL:
+        ensure_database_dir()
+    return install_sqlite_pragmas(create_engine(url, **{**engine_options(), **options}))
+
+
+def create_async_sqlite_engine(url=ASYNC_DATABASE_URL, **options):
+    """Create a pooled aiosqlite engine with the shared pragmas installed."""
+    if url == ASYNC_DATABASE_URL:
+        ensure_database_dir()
+    engine = create_async_engine(url, **{**engine_options(), **options})
+    install_sqlite_pragmas(engine.sync_engine)
+    return engine
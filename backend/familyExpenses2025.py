@@ -1,24 +1,14 @@
+import re
 import pandas as pd #csv reader
 import pdfplumber  #pdf reader
-import gspread # google sheet
-from google.oauth2.service_account import Credentials
+
+from categorization import Categorizer, CategoryRule, CATEGORIES
+from sheets import SheetSync, open_worksheet # google sheet
 
 # Google Sheets setup
 SHEET_NAME = 'family_expense_2025_sheet'  #google sheet name
 CREDENTIALS_FILE = '/Users/arulvasukisrinivasan/PycharmProjects/expenses-tracker-450506-d060c70cd70b.json'
 
-# Define your spending categories
-CATEGORIES = ['Travel', 'Food', 'Outings', 'Entertainment', 'shopping', 'Medical', 'Grocery', 'PUB', 'Mobile & Internet', 'School fees', 'Misc']
-
-# Load Google Sheets
-credentials = Credentials.from_service_account_file(CREDENTIALS_FILE)
-scoped_credentials = credentials.with_scopes([
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-])
-client = gspread.authorize(scoped_credentials)
-sheet = client.open(SHEET_NAME).sheet1
-
 # Read CSV Data
 def read_csv_file(file_path):
     df = pd.read_csv(file_path)
@@ -40,30 +30,31 @@ def read_pdf_file(file_path):
 # Categorize and summarize expenses
 def categorize_expenses(data, categories):
     category_totals = {category: 0 for category in categories}
+    # Every category name is its own keyword; all of them are matched in one regex search per entry
+    categorizer = Categorizer(CategoryRule(category, category) for category in categories)
 
     for entry in data:
-        entry_lower = entry.lower()
-        for category in categories:
-            if category.lower() in entry_lower:
-                # Extract amount (assuming last element in entry is the amount)
-                amount = extract_amount(entry)
-                category_totals[category] += amount
+        category = categorizer.classify(entry)
+        if category is not None:
+            # Extract amount (assuming last element in entry is the amount)
+            category_totals[category] += extract_amount(entry)
 
+    print("Category cache:", categorizer.cache.stats())
     return category_totals
 
+AMOUNT_PATTERN = re.compile(r'\d+(\.\d{1,2})?')
+
 # Extract numeric amounts from text
 def extract_amount(text):
-    import re
-    match = re.search(r'\d+(\.\d{1,2})?', text)
+    match = AMOUNT_PATTERN.search(text)
     return float(match.group()) if match else 0.0
 
 # Write data to Google Sheets
 def update_google_sheet(sheet, data):
-    sheet.clear()
-    sheet.append_row(["Category", "Amount"])
-    for category, amount in data.items():
-        sheet.append_row([category, amount])
-    print("Data successfully written to Google Sheets!")
+    # One read and at most one batch write, instead of a clear plus a request per category
+    rows = [["Category", "Amount"]] + [[category, amount] for category, amount in data.items()]
+    changed = SheetSync(sheet).sync(rows)
+    print(f"Data successfully written to Google Sheets! ({changed} ranges updated)")
 
 # Main Function
 def main():
@@ -83,7 +74,8 @@ def main():
     categorized_expenses = categorize_expenses(all_data, CATEGORIES)
     print("Categorized Expenses:\n", categorized_expenses)
 
-    # Update Google Sheet
+    # Update Google Sheet (authenticates only now, not on import)
+    sheet = open_worksheet(SHEET_NAME, credentials_file=CREDENTIALS_FILE)
     update_google_sheet(sheet, categorized_expenses)
 
 if __name__ == '__main__':
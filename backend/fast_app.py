@@ -1,18 +1,29 @@
+import base64
+import json
 import os
+import tempfile
 from fastapi import FastAPI, Depends, HTTPException, Security
+from fastapi.responses import FileResponse
 from fastapi.security import APIKeyHeader
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from starlette.background import BackgroundTask
+from sqlalchemy import case, func, select, tuple_, Column, Integer, BigInteger, String, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker, Session, relationship, selectinload
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-# Database setup
-DATABASE_URL = "sqlite:///instance/expense_tracker.db"
+from .columnar import iter_transaction_batches, write_parquet_file
+from .db_engine import create_sqlite_engine, create_async_sqlite_engine
+from .rollups import UNCATEGORIZED
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Database setup (same file, pool and pragmas as the Flask app)
+engine = create_sqlite_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async engine for the read-heavy routes, so they don't hold a threadpool slot on SQLite I/O
+async_engine = create_async_sqlite_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # SQLAlchemy Models
@@ -27,20 +38,55 @@ class UserFile(Base):
     user_id = Column(Integer, nullable=False)
     bank_file_format_id = Column(Integer, ForeignKey('bank_file_format.id'), nullable=False)
     file_url = Column(String, nullable=False)
+    content_sha256 = Column(String(64))
     created_on = Column(DateTime, default=datetime.utcnow)
     transactions = relationship("Transaction", back_populates="user_file")
 
+    __table_args__ = (
+        Index('ix_user_file_user_id_created_on', 'user_id', 'created_on'),
+        Index('ix_user_file_user_id_content_sha256', 'user_id', 'content_sha256'),
+    )
+
 class Transaction(Base):
     __tablename__ = 'transaction'
     id = Column(Integer, primary_key=True, index=True)
     transaction_date = Column(DateTime, nullable=False)
-    amount = Column(Float, nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
+    currency = Column(String(3), nullable=False, default='SGD')
     remarks_1 = Column(String)
     remarks_2 = Column(String)
+    category = Column(String(50))
+    fingerprint = Column(String(64))
     user_file_id = Column(Integer, ForeignKey('user_file.id'), nullable=False)
     created_on = Column(DateTime, default=datetime.utcnow)
     user_file = relationship("UserFile", back_populates="transactions")
 
+    @property
+    def amount(self):
+        return self.amount_cents / 100
+
+    __table_args__ = (
+        Index('ix_transaction_user_file_id_transaction_date', 'user_file_id', 'transaction_date'),
+        # Both indexes end in the rowid (id), so they also serve the (value, id) keyset order
+        Index('ix_transaction_transaction_date', 'transaction_date'),
+        Index('ix_transaction_amount_cents', 'amount_cents'),
+        # Covering indexes for the /reports/summary GROUP BYs
+        Index('ix_transaction_transaction_date_amount_cents', 'transaction_date', 'amount_cents'),
+        Index('ix_transaction_category_amount_cents', 'category', 'amount_cents'),
+        Index('ix_transaction_fingerprint', 'fingerprint', unique=True),
+        Index('ix_transaction_created_on', 'created_on'),
+    )
+
+class MonthlyRollup(Base):
+    __tablename__ = 'monthly_rollup'
+    user_id = Column(Integer, primary_key=True)
+    year_month = Column(String(7), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    transaction_count = Column(Integer, nullable=False)
+    debited_cents = Column(BigInteger, nullable=False)
+    credited_cents = Column(BigInteger, nullable=False)
+    net_cents = Column(BigInteger, nullable=False)
+
 # Pydantic Schemas
 class BankFileFormatSchema(BaseModel):
     id: int
@@ -53,13 +99,41 @@ class TransactionSchema(BaseModel):
     id: int
     transaction_date: datetime
     amount: float
+    amount_cents: int
+    currency: str
     remarks_1: Optional[str] = None
     remarks_2: Optional[str] = None
+    category: Optional[str] = None
     created_on: datetime
 
     class Config:
         from_attributes = True
 
+class TransactionPageSchema(BaseModel):
+    transactions: List[TransactionSchema]
+    next_cursor: Optional[str] = None
+
+class SummaryGroupSchema(BaseModel):
+    key: str
+    count: int
+    debited_cents: int
+    credited_cents: int
+    net_cents: int
+    min_cents: int
+    max_cents: int
+    average_cents: float
+
+class MonthlyRollupSchema(BaseModel):
+    year_month: str
+    category: str
+    transaction_count: int
+    debited_cents: int
+    credited_cents: int
+    net_cents: int
+
+    class Config:
+        from_attributes = True
+
 class UserFileSchema(BaseModel):
     id: int
     user_id: int
@@ -94,6 +168,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 @app.get("/bank-file-formats", response_model=List[BankFileFormatSchema], tags=["Bank File Formats"])
 def get_bank_file_formats(db: Session = Depends(get_db)):
     """
@@ -103,51 +181,197 @@ def get_bank_file_formats(db: Session = Depends(get_db)):
     return bank_file_formats
 
 @app.get("/user-files", response_model=List[UserFileSchema], tags=["User Files"], dependencies=[Depends(get_api_key)])
-def get_user_files(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+async def get_user_files(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a list of user files with pagination.
     """
-    user_files = db.query(UserFile).offset(skip).limit(limit).all()
-    return user_files
+    result = await db.execute(
+        select(UserFile).options(selectinload(UserFile.transactions)).order_by(UserFile.id).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
 @app.get("/user-files/{user_file_id}", response_model=UserFileSchema, tags=["User Files"], dependencies=[Depends(get_api_key)])
-def get_user_file(user_file_id: int, db: Session = Depends(get_db)):
+async def get_user_file(user_file_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a specific user file by its ID.
     """
-    user_file = db.query(UserFile).filter(UserFile.id == user_file_id).first()
+    result = await db.execute(
+        select(UserFile).options(selectinload(UserFile.transactions)).where(UserFile.id == user_file_id)
+    )
+    user_file = result.scalars().first()
     if user_file is None:
         raise HTTPException(status_code=404, detail="User file not found")
     return user_file
 
-@app.get("/transactions", response_model=List[TransactionSchema], tags=["Transactions"], dependencies=[Depends(get_api_key)])
-def get_transactions(
-    skip: int = 0,
+# sort_by -> (sort column, descending); ties are broken on Transaction.id in the same direction
+TRANSACTION_SORTS = {
+    None: (None, False),
+    "date_asc": (Transaction.transaction_date, False),
+    "date_desc": (Transaction.transaction_date, True),
+    "amount_asc": (Transaction.amount_cents, False),
+    "amount_desc": (Transaction.amount_cents, True),
+}
+
+def encode_cursor(sort_by: Optional[str], transaction: Transaction) -> str:
+    column, _ = TRANSACTION_SORTS[sort_by]
+    value = getattr(transaction, column.key) if column is not None else None
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, value, transaction.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(sort_by: Optional[str], cursor: str):
+    """Return the (sort value, id) a cursor points after, or raise a 400 if it does not fit ``sort_by``."""
+    try:
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_by in ("date_asc", "date_desc"):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort_by:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort_by")
+    return value, last_id
+
+@app.get("/transactions", response_model=TransactionPageSchema, tags=["Transactions"], dependencies=[Depends(get_api_key)])
+async def get_transactions(
     limit: int = 10,
+    cursor: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     sort_by: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Retrieves a page of transactions with filtering and sorting.
+
+    Pages are keyset-paginated: pass the returned ``next_cursor`` back as
+    ``cursor`` (with the same ``sort_by``) to get the next page, which costs
+    the same however deep it is.
+    """
+    if sort_by not in TRANSACTION_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort_by: {sort_by}")
+    limit = max(1, min(limit, 500))
+    column, descending = TRANSACTION_SORTS[sort_by]
+    key = tuple_(column, Transaction.id) if column is not None else Transaction.id
+
+    query = select(Transaction)
+
+    if start_date:
+        query = query.where(Transaction.transaction_date >= start_date)
+    if end_date:
+        query = query.where(Transaction.transaction_date <= end_date)
+
+    if cursor:
+        value, last_id = decode_cursor(sort_by, cursor)
+        after = tuple_(value, last_id) if column is not None else last_id
+        query = query.where(key < after if descending else key > after)
+
+    order = [Transaction.id] if column is None else [column, Transaction.id]
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in order])
+
+    result = await db.execute(query.limit(limit + 1))
+    transactions = result.scalars().all()
+    page = transactions[:limit]
+    next_cursor = encode_cursor(sort_by, page[-1]) if len(transactions) > limit else None
+    return {"transactions": page, "next_cursor": next_cursor}
+
+@app.get("/transactions/export.parquet", tags=["Transactions"], dependencies=[Depends(get_api_key)])
+def export_transactions_parquet(
+    user_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Retrieves a list of transactions with pagination, filtering, and sorting.
+    Downloads the matching transactions as a single Parquet file.
+
+    Rows are streamed from the database in record batches into a temporary
+    file, so memory stays bounded however many rows match; use
+    ``columnar.py`` for a dataset partitioned by month.
     """
-    query = db.query(Transaction)
+    descriptor, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(descriptor)
+    try:
+        write_parquet_file(iter_transaction_batches(db.connection(), user_id, start_date, end_date), path)
+    except RuntimeError as e:  # pyarrow is not installed
+        os.remove(path)
+        raise HTTPException(status_code=501, detail=str(e))
+    except BaseException:
+        os.remove(path)
+        raise
+    return FileResponse(path, media_type='application/vnd.apache.parquet', filename='transactions.parquet',
+                        background=BackgroundTask(os.remove, path))
+
+# group_by -> SQL expression of the group key
+SUMMARY_GROUPS = {
+    "day": func.strftime('%Y-%m-%d', Transaction.transaction_date),
+    "week": func.strftime('%Y-W%W', Transaction.transaction_date),
+    "month": func.strftime('%Y-%m', Transaction.transaction_date),
+    "file": Transaction.user_file_id,
+    "category": func.coalesce(Transaction.category, UNCATEGORIZED),
+}
 
+@app.get("/reports/summary", response_model=List[SummaryGroupSchema], tags=["Reports"], dependencies=[Depends(get_api_key)])
+async def get_summary_report(
+    group_by: str = "month",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Aggregates transactions per day, week, month, file or category.
+
+    Sums, counts, min/max and averages are computed by SQLite in one
+    GROUP BY over integer cents, so only the groups leave the database.
+    """
+    if group_by not in SUMMARY_GROUPS:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {group_by}")
+    key = SUMMARY_GROUPS[group_by].label("key")
+
+    query = select(
+        key,
+        func.count(Transaction.id).label("count"),
+        func.coalesce(func.sum(case((Transaction.amount_cents < 0, -Transaction.amount_cents), else_=0)), 0)
+            .label("debited_cents"),
+        func.coalesce(func.sum(case((Transaction.amount_cents > 0, Transaction.amount_cents), else_=0)), 0)
+            .label("credited_cents"),
+        func.sum(Transaction.amount_cents).label("net_cents"),
+        func.min(Transaction.amount_cents).label("min_cents"),
+        func.max(Transaction.amount_cents).label("max_cents"),
+        func.avg(Transaction.amount_cents).label("average_cents"),
+    )
+    if user_id is not None:
+        query = query.join(UserFile, Transaction.user_file_id == UserFile.id).where(UserFile.user_id == user_id)
     if start_date:
-        query = query.filter(Transaction.transaction_date >= start_date)
+        query = query.where(Transaction.transaction_date >= start_date)
     if end_date:
-        query = query.filter(Transaction.transaction_date <= end_date)
-
-    if sort_by:
-        if sort_by == "date_asc":
-            query = query.order_by(Transaction.transaction_date.asc())
-        elif sort_by == "date_desc":
-            query = query.order_by(Transaction.transaction_date.desc())
-        elif sort_by == "amount_asc":
-            query = query.order_by(Transaction.amount.asc())
-        elif sort_by == "amount_desc":
-            query = query.order_by(Transaction.amount.desc())
-
-    transactions = query.offset(skip).limit(limit).all()
-    return transactions
+        query = query.where(Transaction.transaction_date <= end_date)
+
+    result = await db.execute(query.group_by(key).order_by(key))
+    return [{**row._asdict(), "key": str(row.key)} for row in result]
+
+@app.get("/reports/monthly", response_model=List[MonthlyRollupSchema], tags=["Reports"], dependencies=[Depends(get_api_key)])
+async def get_monthly_report(
+    user_id: int,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Monthly totals per category for a user, read from the monthly_rollup table.
+
+    Months are "YYYY-MM" strings; the cost depends on the number of months
+    and categories, not on the number of transactions.
+    """
+    query = select(MonthlyRollup).where(MonthlyRollup.user_id == user_id)
+    if start_month:
+        query = query.where(MonthlyRollup.year_month >= start_month)
+    if end_month:
+        query = query.where(MonthlyRollup.year_month <= end_month)
+    if category:
+        query = query.where(MonthlyRollup.category == category)
+
+    result = await db.execute(query.order_by(MonthlyRollup.year_month, MonthlyRollup.category))
+    return result.scalars().all()
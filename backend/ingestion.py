@@ -0,0 +1,232 @@
+"""Batched ingestion of parsed bank statement rows.
+
+Parsers yield plain ``TransactionRow`` tuples and this module writes them to
+the transaction table with chunked executemany inserts, instead of building
+one ORM object per row.
+
+Rows carry a fingerprint of their content; the transaction table has a
+unique index on it, so rows already imported from an overlapping statement
+are skipped by the insert itself. Every file a row was found in is recorded
+in ``transaction_source``, so deleting one statement keeps the rows another
+statement still contains (see detach_file_transactions).
+"""
+import hashlib
+import pickle
+import tempfile
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import islice
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert
+
+DEFAULT_BATCH_SIZE = 1000
+# Every statement format we parse is issued in Singapore dollars
+DEFAULT_CURRENCY = 'SGD'
+# Year of dates from statements that print only day and month ("16 Nov") when the
+# statement's own date could not be found; such rows are left out of cross-file dedup
+UNKNOWN_YEAR = 1900
+
+# Links each inserted or skipped row to the stored transaction with its fingerprint
+_LINK_SOURCE = text(
+    'INSERT OR IGNORE INTO transaction_source (transaction_id, user_file_id) '
+    'SELECT id, :user_file_id FROM "transaction" WHERE fingerprint = :fingerprint')
+
+# Hands the rows of a file that other files also contain to the earliest of those files
+_MOVE_SHARED = text("""
+    UPDATE "transaction" SET user_file_id = (
+        SELECT MIN(s.user_file_id) FROM transaction_source s
+        WHERE s.transaction_id = "transaction".id AND s.user_file_id != :user_file_id)
+    WHERE user_file_id = :user_file_id AND EXISTS (
+        SELECT 1 FROM transaction_source s
+        WHERE s.transaction_id = "transaction".id AND s.user_file_id != :user_file_id)
+""")
+
+# One parsed statement line, as emitted by the parsers; amounts are integer cents,
+# negative for debits (spending) and positive for credits, in every format.
+# ``category`` and ``fingerprint`` are left empty by the parsers and filled in
+# by a Categorizer and fingerprint_rows.
+TransactionRow = namedtuple(
+    'TransactionRow',
+    ['transaction_date', 'amount_cents', 'remarks_1', 'remarks_2', 'currency', 'category', 'fingerprint'],
+    defaults=(None, DEFAULT_CURRENCY, None, None),
+)
+
+
+def to_cents(value):
+    """Convert an amount string such as '1,234.50' to integer cents, without a float round-trip."""
+    value = value.replace(',', '').strip()
+    if not value:
+        return 0
+    try:
+        return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {value!r}")
+
+
+def transaction_fingerprint(user_id, transaction_date, amount_cents, currency, remarks_1, remarks_2, occurrence):
+    """SHA-256 identifying the ``occurrence``-th identical transaction of a user."""
+    # Dates may be datetimes or SQLite's stored strings; only the day matters
+    parts = (user_id, str(transaction_date)[:10], amount_cents, currency, remarks_1 or '', remarks_2 or '',
+             occurrence)
+    return hashlib.sha256('\x1f'.join(map(str, parts)).encode()).hexdigest()
+
+
+def fingerprint_rows(rows, user_id):
+    """
+    Yield TransactionRows with ``fingerprint`` set.
+
+    Identical rows within one statement are numbered, so two genuine coffees
+    on the same day stay two rows, while the same two rows in an overlapping
+    statement map to the same fingerprints and are dropped on insert. Rows
+    whose year is unknown get no fingerprint: the same charge a year apart
+    would look identical.
+    """
+    occurrences = Counter()
+    for row in rows:
+        if getattr(row.transaction_date, 'year', None) == UNKNOWN_YEAR:
+            yield row._replace(fingerprint=None)
+            continue
+        key = (str(row.transaction_date)[:10], row.amount_cents, row.currency, row.remarks_1, row.remarks_2)
+        occurrences[key] += 1
+        yield row._replace(fingerprint=transaction_fingerprint(user_id, *key, occurrences[key]))
+
+
+class IngestStats:
+    """Row count and timing of a single ingestion run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.duplicates = 0  # Rows skipped because their fingerprint was already stored
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return float(self.rows)
+        return self.rows / self.elapsed
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "duplicates": self.duplicates,
+            "batches": self.batches,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+    def __repr__(self):
+        return (f"IngestStats(rows={self.rows}, duplicates={self.duplicates}, batches={self.batches}, "
+                f"elapsed={self.elapsed:.3f}s, rows_per_second={self.rows_per_second:.1f})")
+
+
+def chunked(iterable, size):
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def spool_rows(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Run ``rows`` to the end, keeping them in a temporary file; returns an iterator over them.
+
+    Parsing a statement takes far longer than inserting it, so callers spool
+    the parsed rows first and open their write transaction only to insert
+    them: SQLite has a single writer, and every other request that writes
+    waits while one is open. ``progress``, if given, is called with the
+    running row count after every ``batch_size`` rows.
+    """
+    spool = tempfile.TemporaryFile()
+    count = 0
+    try:
+        for batch in chunked(rows, batch_size):
+            pickle.dump([tuple(row) for row in batch], spool, pickle.HIGHEST_PROTOCOL)
+            count += len(batch)
+            if progress is not None:
+                progress(count)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return _read_spool(spool)
+
+
+def _read_spool(spool):
+    with spool:
+        while True:
+            try:
+                batch = pickle.load(spool)
+            except EOFError:
+                return
+            for values in batch:
+                yield TransactionRow(*values)
+
+
+def bulk_insert_transactions(session, table, user_file_id, rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Insert ``rows`` (an iterable of TransactionRow) for ``user_file_id``.
+
+    ``session`` may be a SQLAlchemy Session or Connection; ``table`` is the
+    Core table of the Transaction model. Rows are sent in executemany batches
+    of ``batch_size`` and nothing is committed here, so the caller keeps
+    control of the surrounding transaction. ``progress``, if given, is called
+    with the running row count after every batch. Rows whose fingerprint is
+    already in the table are skipped and counted in ``stats.duplicates``;
+    either way the row is linked to ``user_file_id`` in transaction_source.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    stats = IngestStats()
+    statement = insert(table).on_conflict_do_nothing()
+    # Set here rather than by the model default, so reflected tables get it too
+    created_on = datetime.utcnow()
+    started = time.perf_counter()
+    for batch in chunked(rows, batch_size):
+        result = session.execute(statement, [
+            {
+                "transaction_date": row.transaction_date,
+                "amount_cents": row.amount_cents,
+                "currency": row.currency,
+                "remarks_1": row.remarks_1,
+                "remarks_2": row.remarks_2,
+                "category": row.category,
+                "fingerprint": row.fingerprint,
+                "user_file_id": user_file_id,
+                "created_on": created_on,
+            }
+            for row in batch
+        ])
+        links = [{"user_file_id": user_file_id, "fingerprint": row.fingerprint}
+                 for row in batch if row.fingerprint is not None]
+        if links:
+            session.execute(_LINK_SOURCE, links)
+        stats.rows += len(batch)
+        stats.duplicates += len(batch) - result.rowcount
+        stats.batches += 1
+        if progress is not None:
+            progress(stats.rows)
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def detach_file_transactions(session, user_file_id):
+    """
+    Prepare the transactions of ``user_file_id`` for deletion.
+
+    Rows that another statement also contained (and that were skipped as
+    duplicates when it was imported) are moved to that statement, and the
+    file's transaction_source links are dropped. The rows still owned by the
+    file afterwards are the ones to delete. Returns the number of rows moved.
+    """
+    moved = session.execute(_MOVE_SHARED, {"user_file_id": user_file_id}).rowcount
+    session.execute(text("DELETE FROM transaction_source WHERE user_file_id = :user_file_id"),
+                    {"user_file_id": user_file_id})
+    return moved
@@ -0,0 +1,61 @@
+"""Background processing of uploaded statements.
+
+Upload jobs are persisted by the app (the ``UploadJob`` table) so they
+survive a restart; this module only owns the worker threads and the live
+row counts of the jobs that are currently running.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Jobs in these states were interrupted by a restart and must be run again
+UNFINISHED_JOB_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class JobRunner:
+    """
+    Runs ``handler(job_id, progress)`` for submitted jobs on a thread pool.
+
+    ``progress`` is a callable the handler invokes with the number of rows
+    parsed so far; the latest value is available from ``progress_of`` while
+    the job is running.
+    """
+
+    def __init__(self, handler, max_workers=1):
+        self._handler = handler
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        self._progress = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id):
+        with self._lock:
+            self._progress[job_id] = 0
+        return self._executor.submit(self._run, job_id)
+
+    def progress_of(self, job_id):
+        """Rows parsed so far by a running job, or None if it is not running here."""
+        with self._lock:
+            return self._progress.get(job_id)
+
+    def _set_progress(self, job_id, rows):
+        with self._lock:
+            self._progress[job_id] = rows
+
+    def _run(self, job_id):
+        try:
+            self._handler(job_id, lambda rows: self._set_progress(job_id, rows))
+        except Exception:
+            logger.exception(f"Upload job {job_id} crashed")
+        finally:
+            with self._lock:
+                self._progress.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
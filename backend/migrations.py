@@ -0,0 +1,212 @@
+"""Versioned schema migrations for the expense tracker SQLite database.
+
+``db.create_all()`` only creates missing tables, so changes to existing
+tables are applied here. The schema version is kept in SQLite's
+``PRAGMA user_version``; every step must also be a no-op on a database that
+``create_all`` has just created with the current models.
+"""
+import logging
+import os
+from collections import Counter
+
+from ingestion import chunked, transaction_fingerprint
+from rollups import rebuild_monthly_rollup
+from storage import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Before the format registry, uploads were parsed by bank_file_format_id rather
+# than by name: id 2 went to the Standard Chartered parser and id 3 to the DBS
+# credit card PDF parser, whatever the BankFileFormat names said
+BASELINE_DBS_PDF_FORMAT_ID = 3
+
+
+def _foreign_keys(connection, table):
+    """Return {column: (referred table, referred column)} for ``table``."""
+    rows = connection.exec_driver_sql(f'PRAGMA foreign_key_list("{table}")').fetchall()
+    return {row[3]: (row[2], row[4]) for row in rows}
+
+
+def _columns(connection, table):
+    return {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+
+
+def _rebuild_transaction_table(connection, create_sql, columns, select):
+    """Replace the transaction table with ``create_sql``, copying rows with ``select``."""
+    connection.exec_driver_sql(create_sql)
+    connection.exec_driver_sql(f'INSERT INTO transaction_new ({columns}) SELECT {select} FROM "transaction"')
+    connection.exec_driver_sql('DROP TABLE "transaction"')
+    connection.exec_driver_sql('ALTER TABLE transaction_new RENAME TO "transaction"')
+
+
+def _fix_transaction_user_file_fk(connection):
+    # transaction.user_file_id used to reference user_file.user_id; SQLite
+    # cannot alter a constraint, so the table is rebuilt with the right one.
+    if _foreign_keys(connection, 'transaction').get('user_file_id') == ('user_file', 'id'):
+        return
+    columns = 'id, transaction_date, amount, remarks_1, remarks_2, user_file_id, created_on'
+    _rebuild_transaction_table(connection, '''
+        CREATE TABLE transaction_new (
+            id INTEGER NOT NULL PRIMARY KEY,
+            transaction_date DATETIME NOT NULL,
+            amount FLOAT NOT NULL,
+            remarks_1 VARCHAR(200),
+            remarks_2 VARCHAR(200),
+            user_file_id INTEGER NOT NULL REFERENCES user_file (id),
+            created_on DATETIME
+        )''', columns, columns)
+
+
+def _add_lookup_indexes(connection):
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_file_id_transaction_date '
+        'ON "transaction" (user_file_id, transaction_date)')
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_transaction_date ON "transaction" (transaction_date)')
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_user_file_user_id_created_on ON user_file (user_id, created_on)')
+
+
+def _store_amounts_in_cents(connection):
+    if 'amount_cents' in _columns(connection, 'transaction'):
+        return
+    _rebuild_transaction_table(connection, '''
+        CREATE TABLE transaction_new (
+            id INTEGER NOT NULL PRIMARY KEY,
+            transaction_date DATETIME NOT NULL,
+            amount_cents BIGINT NOT NULL,
+            currency VARCHAR(3) NOT NULL,
+            remarks_1 VARCHAR(200),
+            remarks_2 VARCHAR(200),
+            user_file_id INTEGER NOT NULL REFERENCES user_file (id),
+            created_on DATETIME
+        )''',
+        'id, transaction_date, amount_cents, currency, remarks_1, remarks_2, user_file_id, created_on',
+        "id, transaction_date, CAST(ROUND(amount * 100) AS INTEGER), 'SGD', remarks_1, remarks_2, "
+        "user_file_id, created_on")
+    # Dropping the old table dropped its indexes as well
+    _add_lookup_indexes(connection)
+
+
+def _add_amount_sort_index(connection):
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_amount_cents ON "transaction" (amount_cents)')
+
+
+def _add_category_and_report_indexes(connection):
+    if 'category' not in _columns(connection, 'transaction'):
+        connection.exec_driver_sql('ALTER TABLE "transaction" ADD COLUMN category VARCHAR(50)')
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_transaction_date_amount_cents '
+        'ON "transaction" (transaction_date, amount_cents)')
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_category_amount_cents ON "transaction" (category, amount_cents)')
+
+
+def _fill_monthly_rollup(connection):
+    # The table itself is created by create_all; seed it from existing transactions
+    rebuild_monthly_rollup(connection)
+
+
+def _add_user_file_content_hash(connection):
+    if 'content_sha256' not in _columns(connection, 'user_file'):
+        connection.exec_driver_sql('ALTER TABLE user_file ADD COLUMN content_sha256 VARCHAR(64)')
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_user_file_user_id_content_sha256 ON user_file (user_id, content_sha256)')
+    # Files uploaded before this version stay where they are; hash the ones still on disk
+    rows = connection.exec_driver_sql(
+        'SELECT id, file_url FROM user_file WHERE content_sha256 IS NULL').fetchall()
+    updates = [{"id": user_file_id, "sha256": file_sha256(file_url)}
+               for user_file_id, file_url in rows if os.path.exists(file_url)]
+    if updates:
+        connection.exec_driver_sql('UPDATE user_file SET content_sha256 = :sha256 WHERE id = :id', updates)
+
+
+def _add_transaction_fingerprints(connection):
+    if 'fingerprint' not in _columns(connection, 'transaction'):
+        connection.exec_driver_sql('ALTER TABLE "transaction" ADD COLUMN fingerprint VARCHAR(64)')
+    rows = connection.exec_driver_sql(
+        'SELECT t.id, t.user_file_id, uf.user_id, t.transaction_date, t.amount_cents, t.currency, '
+        't.remarks_1, t.remarks_2 FROM "transaction" t JOIN user_file uf ON uf.id = t.user_file_id '
+        'WHERE t.fingerprint IS NULL ORDER BY t.user_file_id, t.id')
+    # Same numbering as ingestion.fingerprint_rows; rows already duplicated across
+    # files keep a NULL fingerprint rather than breaking the unique index
+    seen = set()
+    occurrences = Counter()
+    updates = []
+    for transaction_id, user_file_id, user_id, *key in rows:
+        occurrences[user_file_id, *key] += 1
+        fingerprint = transaction_fingerprint(user_id, *key, occurrences[user_file_id, *key])
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            updates.append({"id": transaction_id, "fingerprint": fingerprint})
+    for batch in chunked(updates, 1000):
+        connection.exec_driver_sql('UPDATE "transaction" SET fingerprint = :fingerprint WHERE id = :id', batch)
+    connection.exec_driver_sql(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_transaction_fingerprint ON "transaction" (fingerprint)')
+
+
+def _add_transaction_created_on_index(connection):
+    # The sheet_export_state table is created by create_all; incremental
+    # exports look up rows inserted since their last run by created_on
+    connection.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_created_on ON "transaction" (created_on)')
+
+
+def _link_transaction_sources(connection):
+    # The table is created by create_all. Duplicates skipped before this
+    # version were not recorded, so existing rows only link to their own file.
+    connection.exec_driver_sql(
+        'INSERT OR IGNORE INTO transaction_source (transaction_id, user_file_id) '
+        'SELECT id, user_file_id FROM "transaction" WHERE fingerprint IS NOT NULL')
+
+
+def _unfingerprint_yearless_rows(connection):
+    # Card statement rows were dated 1900 (SC) or in the upload's year (DBS PDF),
+    # so their fingerprints could match the same charge in another year
+    connection.exec_driver_sql(
+        'UPDATE "transaction" SET fingerprint = NULL WHERE fingerprint IS NOT NULL AND ('
+        "strftime('%Y', transaction_date) = '1900' OR user_file_id IN ("
+        'SELECT id FROM user_file WHERE bank_file_format_id = ?))', (BASELINE_DBS_PDF_FORMAT_ID,))
+
+
+def _negate_dbs_card_purchases(connection):
+    # DBS credit card PDFs were stored with purchases positive and CR lines negative,
+    # the opposite of every other format, so the rollup's debit/credit split was inverted
+    connection.exec_driver_sql(
+        'UPDATE "transaction" SET amount_cents = -amount_cents WHERE user_file_id IN ('
+        'SELECT id FROM user_file WHERE bank_file_format_id = ?)', (BASELINE_DBS_PDF_FORMAT_ID,))
+    rebuild_monthly_rollup(connection)
+
+
+# (version, description, step) in the order they must be applied
+MIGRATIONS = [
+    (1, "Point transaction.user_file_id at user_file.id", _fix_transaction_user_file_fk),
+    (2, "Index transaction and user_file lookups", _add_lookup_indexes),
+    (3, "Store transaction amounts as integer cents with a currency", _store_amounts_in_cents),
+    (4, "Index transaction amounts for keyset pagination", _add_amount_sort_index),
+    (5, "Add transaction.category and covering indexes for summary reports", _add_category_and_report_indexes),
+    (6, "Fill monthly_rollup from existing transactions", _fill_monthly_rollup),
+    (7, "Add user_file.content_sha256 for duplicate upload detection", _add_user_file_content_hash),
+    (8, "Add unique transaction fingerprints for row-level dedup", _add_transaction_fingerprints),
+    (9, "Index transaction.created_on for incremental sheet exports", _add_transaction_created_on_index),
+    (10, "Record the files each transaction was found in", _link_transaction_sources),
+    (11, "Drop fingerprints of card rows whose year was guessed", _unfingerprint_yearless_rows),
+    (12, "Store DBS credit card purchases as negative amounts", _negate_dbs_card_purchases),
+]
+
+
+def schema_version(connection):
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate(engine):
+    """Apply every migration newer than the database's schema version."""
+    with engine.begin() as connection:
+        version = schema_version(connection)
+        for step_version, description, step in MIGRATIONS:
+            if step_version <= version:
+                continue
+            logger.info(f"Applying migration {step_version}: {description}")
+            step(connection)
+            connection.exec_driver_sql(f'PRAGMA user_version = {step_version}')
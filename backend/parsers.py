@@ -0,0 +1,532 @@
+"""Streaming bank statement parsers.
+
+These parsers do not depend on Flask or the database: they read a statement
+from disk and yield ``TransactionRow`` tuples, recording bad rows in a
+``ParseReport`` instead of aborting the whole file.
+
+Every supported statement format is registered in ``BANK_FORMATS`` with a
+cheap sniffing rule, so ``detect_bank_format`` can pick the parser from the
+first few KB of a file instead of trying each parser in turn.
+"""
+import csv
+import logging
+import multiprocessing
+import re
+import zipfile
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import pdfplumber
+
+from columnar import is_transaction_export, iter_parquet_records
+from ingestion import TransactionRow, chunked, to_cents, DEFAULT_CURRENCY, UNKNOWN_YEAR
+from storage import sniff_format
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_MAX_ERRORS = 50
+# Below this many pages per worker a PDF is parsed serially
+MIN_PAGES_PER_PDF_WORKER = 2
+# PDF workers are started from a clean fork server (or spawned where there is
+# none) rather than forked from the app, whose other threads may hold locks
+PDF_POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# A statement row that could not be parsed (line number, or page number for PDFs)
+RowError = namedtuple('RowError', ['line_number', 'message'])
+
+
+class ErrorBudgetExceeded(Exception):
+    """Raised when a file has more bad rows than the allowed error budget."""
+
+    def __init__(self, report):
+        super().__init__(f"Too many invalid rows ({len(report.errors)}), "
+                         f"first at line {report.errors[0].line_number}: {report.errors[0].message}")
+        self.report = report
+
+
+class ParseReport:
+    """Counts parsed rows and collects per-row errors for one statement."""
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.errors = []
+
+    def add_error(self, line_number, message):
+        self.errors.append(RowError(line_number, message))
+        if len(self.errors) > self.max_errors:
+            raise ErrorBudgetExceeded(self)
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "errors": [{"line": e.line_number, "message": e.message} for e in self.errors],
+        }
+
+
+def parse_date(date_str):
+    """Convert a date string to a datetime object."""
+    return datetime.strptime(date_str, '%d %b %Y')
+
+
+# Card statements print transaction dates without a year ("16 Nov"). The year
+# comes from the first full date in the statement header (its statement or
+# due date); rows keep UNKNOWN_YEAR when there is none.
+FULL_DATE_PATTERN = re.compile(r'\b(\d{1,2})[ -]([A-Za-z]{3})[a-z]*[ -,]+(\d{4})\b')
+# Rows of a sheet searched for the statement date before its transactions start
+STATEMENT_HEADER_ROWS = 50
+
+
+def find_statement_date(values):
+    """The first full date among ``values`` (strings such as "16 Dec 2024", or datetime cells), or None."""
+    for value in values:
+        if isinstance(value, datetime) and value.year != UNKNOWN_YEAR:
+            return value
+        if isinstance(value, str):
+            for day, month, year in FULL_DATE_PATTERN.findall(value):
+                try:
+                    return datetime.strptime(f"{day} {month} {year}", '%d %b %Y')
+                except ValueError:
+                    continue
+    return None
+
+
+def with_statement_year(transaction_date, statement_date):
+    """
+    Give a year-less transaction date the year it has on a statement dated ``statement_date``.
+
+    Dates later in the year than the statement date belong to the year
+    before, as on a January statement listing December purchases.
+    """
+    if statement_date is None:
+        return transaction_date
+    later = (transaction_date.month, transaction_date.day) > (statement_date.month, statement_date.day)
+    return transaction_date.replace(year=statement_date.year - later)
+
+
+def iter_dbs_csv_rows(file_path, report=None):
+    """
+    Yield a TransactionRow for every transaction line of a DBS savings CSV.
+
+    The file is read one line at a time with csv.reader, so memory stays flat
+    regardless of file size. Rows with fewer than 8 columns (the statement
+    preamble) and the header row are skipped; rows that fail to parse are
+    recorded on ``report`` with their line number.
+    """
+    if report is None:
+        report = ParseReport()
+
+    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        header_seen = False
+        for row in reader:
+            if len(row) < 8 or not any(cell.strip() for cell in row):
+                continue
+            if not header_seen:
+                # The first full-width row holds the column names
+                header_seen = True
+                continue
+            try:
+                debit = to_cents(row[2])
+                credit = to_cents(row[3])
+                transaction_date = parse_date(row[0].strip())
+            except ValueError as e:
+                report.add_error(reader.line_num, str(e))
+                continue
+            report.rows += 1
+            yield TransactionRow(transaction_date, credit - debit, row[4].strip())
+
+
+# A transaction line starts with a date (e.g., "DD MMM") and ends with a dollar amount
+# The pattern is: Date (DD MMM) + Description + Amount ($) + optional 'CR'
+DBS_PDF_TRANSACTION_PATTERN = re.compile(r'(\d{2} [A-Z]{3})\s+([A-Z\s\d.-/]+?)\s+([\d,]+\.\d{2})\s*(CR)?')
+
+
+def parse_dbs_pdf_date(date_str, statement_date=None):
+    """Convert a "15 JAN" date string to a datetime in the statement's year (see with_statement_year)."""
+    return with_statement_year(datetime.strptime(date_str, "%d %b"), statement_date)
+
+
+def dbs_pdf_statement_date(pdf_file):
+    """The statement date from the header of the first page, above the first transaction line."""
+    if not pdf_file.pages:
+        return None
+    header = []
+    for line in (pdf_file.pages[0].extract_text() or '').split('\n'):
+        if DBS_PDF_TRANSACTION_PATTERN.search(line.strip()):
+            break
+        header.append(line)
+    return find_statement_date(header)
+
+
+def extract_dbs_pdf_lines(file_path, page_numbers):
+    """
+    Return (page, date, description, amount) tuples for the given pages of a DBS credit card PDF.
+
+    Runs in a worker process: it opens the PDF itself and only returns
+    compact tuples, so nothing heavier than strings and ints is pickled.
+    """
+    lines = []
+    with pdfplumber.open(file_path) as pdf_file:
+        for page_number in page_numbers:
+            text = pdf_file.pages[page_number].extract_text() or ''
+            for line in text.split('\n'):
+                match = DBS_PDF_TRANSACTION_PATTERN.search(line.strip())
+                if match:
+                    amount = to_cents(match.group(3))
+                    # Like every other format, debits (purchases) are negative and 'CR' lines positive
+                    if not match.group(4):
+                        amount = amount * -1
+                    lines.append((page_number + 1, match.group(1), match.group(2).strip(), amount))
+    return lines
+
+
+def _split_pages(page_count, parts):
+    """Split range(page_count) into ``parts`` contiguous, in-order page lists."""
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for part in range(parts):
+        end = start + size + (1 if part < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return [pages for pages in ranges if pages]
+
+
+def iter_dbs_pdf_rows(file_path, report=None, workers=1):
+    """
+    Yield a TransactionRow for every transaction line of a DBS credit card PDF.
+
+    With ``workers`` > 1 the pages are split into contiguous ranges and
+    extracted in a process pool; results are merged back in page order.
+    """
+    if report is None:
+        report = ParseReport()
+
+    with pdfplumber.open(file_path) as pdf_file:
+        page_count = len(pdf_file.pages)
+        statement_date = dbs_pdf_statement_date(pdf_file)
+
+    workers = min(workers or 1, page_count // MIN_PAGES_PER_PDF_WORKER)
+    if workers <= 1:
+        page_lines = [extract_dbs_pdf_lines(file_path, range(page_count))]
+    else:
+        page_ranges = _split_pages(page_count, workers)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=PDF_POOL_CONTEXT) as executor:
+            page_lines = executor.map(extract_dbs_pdf_lines, [file_path] * len(page_ranges), page_ranges)
+
+    for lines in page_lines:
+        for page_number, date, description, amount in lines:
+            try:
+                transaction_date = parse_dbs_pdf_date(date, statement_date)
+            except ValueError as e:
+                report.add_error(page_number, str(e))
+                continue
+            report.rows += 1
+            yield TransactionRow(transaction_date, amount, description)
+
+#  parse standard charted bank xlxs file
+
+# Column indexes for Table 1 and Table 2
+column_indexs = {
+    "Table 1": {
+        "transaction_date": 0,
+        "description_1": 3,
+        "description_2": 10,
+        "amount": 14,
+    },
+    "Table 2": {
+        "transaction_date": 0,
+        "description_1": 2,
+        "description_2": 3,
+        "amount": 4,
+    }
+}
+
+
+# Function to process amount and handle 'CR'
+def process_amount_cents(value):
+    """
+    Convert an SC amount (text or a number cell) to integer cents.
+
+    'CR' amounts are credits (positive), the rest debits (negative); the
+    digits are rounded half up by to_cents. Raises ValueError for anything
+    that is not an amount.
+    """
+    text = str(value)
+    cents = abs(to_cents(text.replace('CR', '')))
+    return cents if 'CR' in text else -cents
+
+
+def process_amounts_cents(values):
+    """
+    Vectorized process_amount_cents over a Series; returns (cents, valid) Series.
+
+    Plain amounts with up to two decimals are converted column-wise; anything
+    else goes through process_amount_cents, so both follow the same rule.
+    Amounts it rejects are 0 in ``cents`` and False in ``valid``.
+    """
+    text = values.astype(str)
+    is_credit = text.str.contains('CR', regex=False)
+    parts = (text.str.replace(',', '', regex=False).str.replace('CR', '', regex=False).str.strip()
+             .str.extract(r'^[-+]?(\d+)(?:\.(\d{1,2}))?$'))
+    simple = parts[0].notna()
+    whole = parts[0].where(simple, '0').astype('int64')
+    fraction = parts[1].fillna('').str.ljust(2, '0').where(simple, '0').astype('int64')
+    cents = (whole * 100 + fraction).where(is_credit, -(whole * 100 + fraction))
+    valid = simple.copy()
+    for index in text.index[~simple]:
+        try:
+            cents[index] = process_amount_cents(text[index])
+            valid[index] = True
+        except ValueError:
+            pass
+    return cents, valid
+
+
+def sc_sheet_rows(df, columns, report=None, statement_date=None):
+    """
+    Yield a TransactionRow for every transaction line of one SC sheet.
+
+    ``columns`` is the sheet's entry in ``column_indexs``. Dates ("16 Nov") and
+    amounts are converted column-wise; rows whose date column does not parse
+    (headers, totals, blank lines) are dropped. Rows with a date but an
+    invalid amount are reported under their ``df`` index, which callers set
+    to the sheet row numbers. Dates get the year of ``statement_date`` (see
+    with_statement_year).
+    """
+    if report is None:
+        report = ParseReport()
+
+    dates = pd.to_datetime(df.iloc[:, columns['transaction_date']].astype(str).str.strip(),
+                           format='%d %b', errors='coerce')
+    valid = dates.notna()
+    if not valid.any():
+        return
+
+    raw_amounts = df.iloc[:, columns['amount']][valid]
+    amounts, valid_amounts = process_amounts_cents(raw_amounts)
+    for row_number in raw_amounts.index[~valid_amounts]:
+        report.add_error(row_number, f"invalid amount: {raw_amounts[row_number]!r}")
+    valid[valid_amounts.index[~valid_amounts]] = False
+    amounts = amounts[valid_amounts]
+
+    descriptions = df.iloc[:, columns['description_1']][valid]
+    descriptions = descriptions.astype(object).where(descriptions.notna(), None)
+
+    report.rows += int(valid.sum())
+    for transaction_date, amount, description in zip(dates[valid].dt.to_pydatetime(),
+                                                     amounts.tolist(), descriptions.tolist()):
+        yield TransactionRow(with_statement_year(transaction_date, statement_date), amount, description)
+
+
+def iter_sc_xlsx_rows(file_path, report=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a TransactionRow for every transaction line of a Standard Chartered XLSX.
+
+    The workbook is opened in openpyxl read-only mode and streamed row by row;
+    only the sheets named in ``column_indexs`` are visited and only their
+    date, description and amount cells are kept. Rows are converted
+    ``chunk_size`` at a time, so peak memory does not grow with the workbook.
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        statement_date = sc_xlsx_statement_date(workbook)
+        for sheet_name in workbook.sheetnames:
+            if sheet_name not in column_indexs:
+                logger.info(f"skipping {sheet_name}")
+                continue
+            logger.info(f"Processing sheet: {sheet_name}")
+            columns = column_indexs[sheet_name]
+            wanted = [columns['transaction_date'], columns['description_1'], columns['amount']]
+            rows = workbook[sheet_name].iter_rows(max_col=max(wanted) + 1, values_only=True)
+            first_row = 1
+            for chunk in chunked(rows, chunk_size):
+                frame = pd.DataFrame(
+                    [[row[i] if i < len(row) else None for i in wanted] for row in chunk],
+                    columns=['transaction_date', 'description_1', 'amount'],
+                    index=range(first_row, first_row + len(chunk)),  # Sheet row numbers, for errors
+                )
+                first_row += len(chunk)
+                yield from sc_sheet_rows(frame, _SC_FRAME_COLUMNS, report, statement_date)
+    finally:
+        workbook.close()
+
+
+def sc_xlsx_statement_date(workbook):
+    """The first full date in the top rows of the workbook's sheets, above any transaction line."""
+    for sheet_name in workbook.sheetnames:
+        date_column = column_indexs.get(sheet_name, {}).get('transaction_date')
+        for row in islice(workbook[sheet_name].iter_rows(values_only=True), STATEMENT_HEADER_ROWS):
+            if (date_column is not None and date_column < len(row) and isinstance(row[date_column], str)
+                    and SC_DATE_PATTERN.match(row[date_column].strip())):
+                break
+            statement_date = find_statement_date(row)
+            if statement_date:
+                return statement_date
+    return None
+
+
+# Positions of the projected columns in the frames built by iter_sc_xlsx_rows
+_SC_FRAME_COLUMNS = {"transaction_date": 0, "description_1": 1, "amount": 2}
+
+
+# The Standard Chartered CSV export has the layout of the xlsx "Table 1" sheet
+SC_CSV_COLUMNS = column_indexs["Table 1"]
+SC_DATE_PATTERN = re.compile(r'^\d{1,2} [A-Z][a-z]{2}$')
+
+
+def _is_sc_csv_row(row):
+    return len(row) > SC_CSV_COLUMNS['amount'] and bool(SC_DATE_PATTERN.match(row[0].strip()))
+
+
+def iter_sc_csv_rows(file_path, report=None):
+    """
+    Yield a TransactionRow for every transaction line of a Standard Chartered CSV.
+
+    Lines whose first column is not a "16 Nov" style date (the statement
+    preamble, headers and totals) are skipped. Dates get the year of the
+    first full date in the preamble (see with_statement_year).
+    """
+    if report is None:
+        report = ParseReport()
+
+    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        statement_date = None
+        in_preamble = True
+        for row in reader:
+            if not _is_sc_csv_row(row):
+                if in_preamble and statement_date is None:
+                    statement_date = find_statement_date(row)
+                continue
+            in_preamble = False
+            try:
+                transaction_date = with_statement_year(
+                    datetime.strptime(row[SC_CSV_COLUMNS['transaction_date']].strip(), '%d %b'), statement_date)
+                amount = row[SC_CSV_COLUMNS['amount']].strip()
+                amount_cents = process_amount_cents(amount) if amount else 0
+            except ValueError as e:
+                report.add_error(reader.line_num, str(e))
+                continue
+            report.rows += 1
+            yield TransactionRow(transaction_date, amount_cents, row[SC_CSV_COLUMNS['description_1']].strip() or None)
+
+
+# Bank statement format registry
+
+# Bytes read from the start of a file to detect its format
+SNIFF_BYTES = 8 * 1024
+
+# ``kind`` is the storage.sniff_format type of the file, ``matches(file_path, head)``
+# decides whether a file of that kind is this format, and
+# ``parse(file_path, report, workers)`` returns its TransactionRow iterator.
+BankFormat = namedtuple('BankFormat', ['name', 'kind', 'matches', 'parse'])
+
+# BankFormats by name, in registration order; the names are the BankFileFormat names
+BANK_FORMATS = {}
+
+
+def register_bank_format(name, kind, matches):
+    """Decorator registering a parse function as the parser of the bank format ``name``."""
+    def decorator(parse):
+        BANK_FORMATS[name] = BankFormat(name, kind, matches, parse)
+        return parse
+    return decorator
+
+
+def detect_bank_format(file_path):
+    """Return the BankFormat of a statement judging by its first SNIFF_BYTES, or None."""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+    kind = sniff_format(head)
+    for bank_format in BANK_FORMATS.values():
+        if bank_format.kind == kind and bank_format.matches(file_path, head):
+            return bank_format
+    return None
+
+
+DBS_CSV_HEADER_COLUMNS = ('Transaction Date', 'Debit Amount', 'Credit Amount')
+
+
+def _has_dbs_csv_header(file_path, head):
+    text = head.decode('utf-8', errors='ignore')
+    return all(column in text for column in DBS_CSV_HEADER_COLUMNS)
+
+
+def _has_sc_csv_rows(file_path, head):
+    # Drop the last line, the head may cut it short
+    lines = head.decode('utf-8', errors='ignore').splitlines()[:-1]
+    return any(_is_sc_csv_row(row) for row in csv.reader(lines))
+
+
+def _is_pdf(file_path, head):
+    # The DBS credit card statement is the only PDF format so far
+    return True
+
+
+def _xlsx_sheet_names(file_path):
+    """Sheet names from the workbook part of an xlsx, without loading any sheet."""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            workbook = archive.read('xl/workbook.xml').decode('utf-8', errors='ignore')
+    except (zipfile.BadZipFile, KeyError):
+        return []
+    return re.findall(r'<(?:\w+:)?sheet\b[^>]*\bname="([^"]*)"', workbook)
+
+
+def _has_sc_sheets(file_path, head):
+    return any(name in column_indexs for name in _xlsx_sheet_names(file_path))
+
+
+@register_bank_format('DBS Savings Account (CSV)', 'text', _has_dbs_csv_header)
+def parse_dbs_csv(file_path, report=None, workers=1):
+    return iter_dbs_csv_rows(file_path, report)
+
+
+@register_bank_format('DBS Credit Card (PDF)', 'pdf', _is_pdf)
+def parse_dbs_pdf(file_path, report=None, workers=1):
+    return iter_dbs_pdf_rows(file_path, report, workers=workers)
+
+
+@register_bank_format('Standard Chartered Credit Card (XSLX)', 'xlsx', _has_sc_sheets)
+def parse_sc_xlsx(file_path, report=None, workers=1):
+    return iter_sc_xlsx_rows(file_path, report)
+
+
+@register_bank_format('Standard Chartered Credit Card (CSV)', 'text', _has_sc_csv_rows)
+def parse_sc_csv(file_path, report=None, workers=1):
+    return iter_sc_csv_rows(file_path, report)
+
+
+def _is_transaction_export(file_path, head):
+    return is_transaction_export(file_path)
+
+
+@register_bank_format('Transactions (Parquet)', 'parquet', _is_transaction_export)
+def parse_parquet(file_path, report=None, workers=1):
+    """
+    Yield the rows of a columnar.py export, one record batch at a time.
+
+    Categories are kept; fingerprints are not, since they are recomputed for
+    the user importing the file.
+    """
+    if report is None:
+        report = ParseReport()
+
+    line_number = 0
+    for records in iter_parquet_records(file_path):
+        for record in records:
+            line_number += 1
+            if record['transaction_date'] is None or record['amount_cents'] is None:
+                report.add_error(line_number, "missing transaction_date or amount_cents")
+                continue
+            report.rows += 1
+            yield TransactionRow(record['transaction_date'], record['amount_cents'], record['remarks_1'],
+                                 record.get('remarks_2'), record.get('currency') or DEFAULT_CURRENCY,
+                                 record.get('category'))
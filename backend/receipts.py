@@ -0,0 +1,143 @@
+"""Amazon Textract receipt analysis with a content-hash keyed cache.
+
+Receipts are identified by the SHA-256 of their bytes, so a receipt that
+was already analysed (by anyone, within the cache TTL) is answered from
+memory instead of another paid Textract call. ``ReceiptAnalyzer`` also runs
+batches of receipts on a bounded thread pool.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from dateutil import parser as dateparser
+
+from caching import LRUCache
+
+DEFAULT_CACHE_SIZE = 1000
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_WORKERS = 4
+
+
+class ReceiptAnalyzer:
+    """
+    Calls ``client.analyze_expense`` for receipts stored on disk, caching the ExpenseDocuments by content hash.
+
+    ``client`` is a boto3 Textract client, or any object with the same
+    ``analyze_expense(Document={"Bytes": ...})`` method.
+    """
+
+    def __init__(self, client, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                 max_workers=DEFAULT_WORKERS):
+        self.client = client
+        self.cache = LRUCache(cache_size, ttl=cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='receipt')
+
+    def analyze(self, sha256, path):
+        """Return the ExpenseDocuments of the receipt at ``path`` whose digest is ``sha256``."""
+        docs = self.cache.get(sha256)
+        if docs is None:
+            with open(path, 'rb') as receipt:
+                file_bytes = receipt.read()
+            resp = self.client.analyze_expense(Document={"Bytes": file_bytes})
+            docs = resp.get("ExpenseDocuments", [])
+            self.cache.put(sha256, docs)
+        return docs
+
+    def analyze_many(self, receipts):
+        """
+        Analyse (sha256, path) pairs concurrently.
+
+        Returns one entry per pair, in order: its ExpenseDocuments, or the
+        exception its analysis raised. Identical receipts are analysed once.
+        """
+        futures = {}
+        for sha256, path in receipts:
+            if sha256 not in futures:
+                futures[sha256] = self._executor.submit(self.analyze, sha256, path)
+        results = []
+        for sha256, _ in receipts:
+            try:
+                results.append(futures[sha256].result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def summarize_expense_document(doc):
+    """Pick vendor, receipt id, date, total and currency out of one Textract ExpenseDocument."""
+    summary = doc.get("SummaryFields", [])
+
+    # Helper function to find a field's value by its type
+    def _get(type_name: str):
+        for sf in summary:
+            if (sf.get("Type") or {}).get("Text") == type_name:
+                return (sf.get("ValueDetection") or {}).get("Text")
+        return None
+
+    # 1. Define more comprehensive key lists (ordered by priority)
+    TOTAL_KEYS = ["TOTAL", "GRAND_TOTAL", "AMOUNT_DUE", "TOTAL_DUE", "AMOUNT"]
+    DATE_KEYS = ["INVOICE_RECEIPT_DATE", "PURCHASE_DATE", "TRANSACTION_DATE", "DATE", "DUE_DATE"]
+    RECEIPT_ID_KEYS = ["INVOICE_RECEIPT_ID", "RECEIPT_NO", "INVOICE_ID", "REFERENCE_NUMBER"]
+    VENDOR_KEYS = ["VENDOR_NAME", "MERCHANT_NAME", "STORE_NAME", "VENDOR"]
+    CURRENCY_KEYS = ["CURRENCY", "CURRENCY_CODE"]
+
+    # Helper to find the first value from a list of possible keys
+    def find_first_value(keys_list):
+        for key in keys_list:
+            value = _get(key)
+            if value:
+                return value
+        return None
+
+    # 2. Find the raw text for each field
+    total_text = find_first_value(TOTAL_KEYS)
+    date_text = find_first_value(DATE_KEYS)
+    receipt_id_text = find_first_value(RECEIPT_ID_KEYS)
+    vendor_text = find_first_value(VENDOR_KEYS)
+    currency_text = find_first_value(CURRENCY_KEYS)
+
+    # 3. Parse and clean the extracted text
+    total_amount = None
+    if total_text:
+        # Find the first decimal number in the string to handle cases like "CASH $15.50"
+        match = re.search(r'(\d{1,3}(?:,\d{3})*(\.\d{2})?|\d+(\.\d{2})?)', total_text)
+        if match:
+            try:
+                amount_str = match.group(1).replace(",", "")
+                total_amount = float(Decimal(amount_str))
+            except (InvalidOperation, ValueError):
+                total_amount = None
+
+    receipt_date = None
+    if date_text:
+        try:
+            # 'PREFER_DATES_FROM': 'past' helps resolve dates like "Aug 20" correctly
+            parsed_dt = dateparser.parse(date_text, settings={'PREFER_DATES_FROM': 'past'})
+            if parsed_dt:
+                receipt_date = parsed_dt.date().isoformat()
+        except Exception:
+            receipt_date = date_text  # Fallback to raw text
+
+    currency = currency_text.strip() if currency_text else None
+    if not currency and total_text:
+        if '$' in total_text: currency = 'USD'
+        elif '€' in total_text: currency = 'EUR'
+        elif '£' in total_text: currency = 'GBP'
+        else:
+            match = re.search(r'\b([A-Z]{3})\b', total_text)
+            if match:
+                currency = match.group(1)
+
+    receipt_id = receipt_id_text.strip() if receipt_id_text else None
+    vendor_name = vendor_text.strip() if vendor_text else None
+
+    return {
+        "vendor_name": vendor_name,
+        "receipt_id": receipt_id,
+        "date": receipt_date,
+        "amount": total_amount,
+        "currency": currency
+    }
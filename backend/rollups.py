@@ -0,0 +1,108 @@
+"""Materialized monthly spend rollup.
+
+``monthly_rollup`` holds one row per (user, year-month, category) with
+the count and cent totals of the matching transactions. Uploads add their
+file's totals and deletions subtract them, so reports read O(months) rows
+instead of scanning every transaction. ``check_monthly_rollup`` and
+``rebuild_monthly_rollup`` recompute it from scratch.
+
+Run ``python rollups.py`` to check the app database, or add ``--rebuild``.
+"""
+import argparse
+
+from sqlalchemy import text
+
+
+# Rollup category of transactions without one
+UNCATEGORIZED = 'Uncategorized'
+
+_AGGREGATES = """
+    COUNT(*),
+    SUM(CASE WHEN t.amount_cents < 0 THEN -t.amount_cents ELSE 0 END),
+    SUM(CASE WHEN t.amount_cents > 0 THEN t.amount_cents ELSE 0 END),
+    SUM(t.amount_cents)
+"""
+
+_ROLLUP_COLUMNS = "user_id, year_month, category, transaction_count, debited_cents, credited_cents, net_cents"
+
+_APPLY_FILE = text(f"""
+    INSERT INTO monthly_rollup ({_ROLLUP_COLUMNS})
+    SELECT :user_id, strftime('%Y-%m', t.transaction_date), COALESCE(t.category, :uncategorized),
+           :sign * COUNT(*),
+           :sign * SUM(CASE WHEN t.amount_cents < 0 THEN -t.amount_cents ELSE 0 END),
+           :sign * SUM(CASE WHEN t.amount_cents > 0 THEN t.amount_cents ELSE 0 END),
+           :sign * SUM(t.amount_cents)
+    FROM "transaction" t
+    WHERE t.user_file_id = :user_file_id
+    GROUP BY 2, 3
+    ON CONFLICT (user_id, year_month, category) DO UPDATE SET
+        transaction_count = transaction_count + excluded.transaction_count,
+        debited_cents = debited_cents + excluded.debited_cents,
+        credited_cents = credited_cents + excluded.credited_cents,
+        net_cents = net_cents + excluded.net_cents
+""")
+
+_FULL_AGGREGATE = f"""
+    SELECT uf.user_id, strftime('%Y-%m', t.transaction_date), COALESCE(t.category, :uncategorized), {_AGGREGATES}
+    FROM "transaction" t JOIN user_file uf ON uf.id = t.user_file_id
+    GROUP BY 1, 2, 3
+"""
+
+
+def add_file_to_rollup(session, user_id, user_file_id):
+    """Add the transactions of ``user_file_id`` to the rollup (call before committing an upload)."""
+    session.execute(_APPLY_FILE, {"user_id": user_id, "user_file_id": user_file_id,
+                                  "uncategorized": UNCATEGORIZED, "sign": 1})
+
+
+def remove_file_from_rollup(session, user_id, user_file_id):
+    """Subtract the transactions of ``user_file_id`` from the rollup (call before deleting them)."""
+    session.execute(_APPLY_FILE, {"user_id": user_id, "user_file_id": user_file_id,
+                                  "uncategorized": UNCATEGORIZED, "sign": -1})
+    session.execute(text("DELETE FROM monthly_rollup WHERE transaction_count = 0"))
+
+
+def rebuild_monthly_rollup(session):
+    """Recompute the whole rollup from the transaction table."""
+    session.execute(text("DELETE FROM monthly_rollup"))
+    session.execute(text(f"INSERT INTO monthly_rollup ({_ROLLUP_COLUMNS}) {_FULL_AGGREGATE}"),
+                    {"uncategorized": UNCATEGORIZED})
+
+
+def check_monthly_rollup(session):
+    """
+    Compare the stored rollup with a fresh aggregate of the transactions.
+
+    Returns a list of (key, expected, stored) tuples for every row that
+    differs; an empty list means the rollup is consistent.
+    """
+    expected = {tuple(row[:3]): tuple(row[3:])
+                for row in session.execute(text(_FULL_AGGREGATE), {"uncategorized": UNCATEGORIZED})}
+    stored = {tuple(row[:3]): tuple(row[3:])
+              for row in session.execute(text(f"SELECT {_ROLLUP_COLUMNS} FROM monthly_rollup"))}
+    return [(key, expected.get(key), stored.get(key))
+            for key in sorted(expected.keys() | stored.keys())
+            if expected.get(key) != stored.get(key)]
+
+
+def main():
+    from db_engine import create_sqlite_engine
+
+    parser = argparse.ArgumentParser(description="Check or rebuild the monthly_rollup table.")
+    parser.add_argument('--rebuild', action='store_true', help="recompute the rollup from scratch")
+    args = parser.parse_args()
+
+    engine = create_sqlite_engine()
+    with engine.begin() as connection:
+        if args.rebuild:
+            rebuild_monthly_rollup(connection)
+            print("monthly_rollup rebuilt")
+            return
+        mismatches = check_monthly_rollup(connection)
+    for key, expected, stored in mismatches:
+        print(f"{key}: expected {expected}, stored {stored}")
+    print(f"{len(mismatches)} inconsistent rollup rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Incremental export of a user's transactions to a Google Sheets worksheet.
+
+Each run appends only the transactions stored since the previous one, so
+its cost is proportional to the new rows rather than the whole history,
+and notes or formulas people have added to the worksheet are left alone.
+Progress is kept per (user, worksheet) in the ``sheet_export_state`` table
+as a high-water mark: the largest ``transaction.id`` and ``created_on``
+exported so far. ``created_on`` catches rows that reuse the id of a deleted
+transaction, which SQLite does when the newest rows are removed.
+
+Run it once, from cron, or let it poll::
+
+    python sheet_export.py --user me@example.com --sheet family_expense_2025_sheet \\
+        --worksheet Transactions --interval 300
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, select
+
+from db_engine import create_sqlite_engine
+from migrations import MIGRATIONS, schema_version
+from sheets import SheetSync, open_worksheet, CREDENTIALS_FILE
+
+logger = logging.getLogger(__name__)
+
+HEADER = ['Transaction', 'Date', 'Amount', 'Currency', 'Remarks', 'Details', 'Category']
+# Rows sent per append request; the high-water mark is saved after each one
+EXPORT_BATCH_SIZE = 5000
+
+
+class DeltaExporter:
+    """Appends one user's new transactions to a worksheet, remembering how far it got."""
+
+    def __init__(self, engine, user_id, worksheet, target, batch_size=EXPORT_BATCH_SIZE, sync=None):
+        self.engine = engine
+        self.user_id = user_id
+        self.target = target
+        self.batch_size = batch_size
+        self.sync = sync or SheetSync(worksheet)
+        metadata = MetaData()
+        with engine.connect() as connection:
+            if schema_version(connection) < MIGRATIONS[-1][0]:
+                raise SystemExit("The database is not up to date; start the app once to create and migrate it")
+            self.tables = {name: Table(name, metadata, autoload_with=connection)
+                           for name in ('transaction', 'user_file', 'sheet_export_state')}
+
+    def _load_state(self):
+        """(state id, last exported id, last exported created_on), starting the worksheet on the first run."""
+        state = self.tables['sheet_export_state']
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                select(state.c.id, state.c.last_transaction_id, state.c.last_created_on)
+                .where(state.c.user_id == self.user_id, state.c.target == self.target)).first()
+            if row is not None:
+                return row
+            state_id = connection.execute(state.insert().values(
+                user_id=self.user_id, target=self.target, last_transaction_id=0, rows_exported=0,
+            )).inserted_primary_key[0]
+            # If this fails the state row is rolled back too, and the next run starts over
+            self.sync.append([HEADER])
+            return state_id, 0, None
+
+    def _new_rows(self, connection, last_id, last_created_on):
+        transaction, user_file = self.tables['transaction'], self.tables['user_file']
+        newer = transaction.c.id > last_id
+        if last_created_on is not None:
+            newer = newer | (transaction.c.created_on > last_created_on)
+        return connection.execute(
+            select(transaction.c.id, transaction.c.transaction_date, transaction.c.amount_cents,
+                   transaction.c.currency, transaction.c.remarks_1, transaction.c.remarks_2,
+                   transaction.c.category, transaction.c.created_on)
+            .join(user_file, user_file.c.id == transaction.c.user_file_id)
+            .where(user_file.c.user_id == self.user_id, newer)
+            .order_by(transaction.c.id)).yield_per(self.batch_size).partitions()
+
+    def export(self):
+        """Append the transactions stored since the last run; returns how many were appended."""
+        state = self.tables['sheet_export_state']
+        exported = 0
+        state_id, last_id, last_created_on = self._load_state()
+        with self.engine.connect() as connection:
+            for batch in self._new_rows(connection, last_id, last_created_on):
+                self.sync.append([
+                    [row.id, row.transaction_date.strftime('%Y-%m-%d'), row.amount_cents / 100, row.currency,
+                     row.remarks_1 or '', row.remarks_2 or '', row.category or '']
+                    for row in batch
+                ])
+                # Saved only once the rows are in the sheet, so a failed append is retried next run
+                last_id = max(last_id, max(row.id for row in batch))
+                created_on = [row.created_on for row in batch if row.created_on is not None]
+                if created_on:
+                    last_created_on = max(created_on + ([last_created_on] if last_created_on else []))
+                exported += len(batch)
+                with self.engine.begin() as write:
+                    write.execute(state.update().where(state.c.id == state_id).values(
+                        last_transaction_id=last_id, last_created_on=last_created_on,
+                        rows_exported=state.c.rows_exported + len(batch), updated_on=datetime.utcnow()))
+        return exported
+
+    def run_forever(self, interval):
+        """Export every ``interval`` seconds; errors are logged and retried on the next tick."""
+        while True:
+            started = time.perf_counter()
+            try:
+                exported = self.export()
+                logger.info(f"Exported {exported} new transactions to {self.target} "
+                            f"in {time.perf_counter() - started:.2f}s")
+            except Exception:
+                logger.exception(f"Export to {self.target} failed")
+            time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append a user's new transactions to a Google Sheets worksheet.")
+    parser.add_argument('--user', required=True, help="email of the user whose transactions are exported")
+    parser.add_argument('--sheet', required=True, help="Google spreadsheet to export to")
+    parser.add_argument('--worksheet', help="worksheet of --sheet to export to (default: the first one)")
+    parser.add_argument('--credentials', default=CREDENTIALS_FILE, help="service account JSON")
+    parser.add_argument('--interval', type=float, help="keep running, exporting every this many seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    engine = create_sqlite_engine()
+    with engine.connect() as connection:
+        user = Table('user', MetaData(), autoload_with=connection)
+        user_id = connection.execute(select(user.c.id).where(user.c.email == args.user)).scalar()
+    if user_id is None:
+        raise SystemExit(f"No user with email {args.user}")
+    worksheet = open_worksheet(args.sheet, args.worksheet, args.credentials)
+    exporter = DeltaExporter(engine, user_id, worksheet, f"{args.sheet}/{worksheet.title}")
+    if args.interval:
+        exporter.run_forever(args.interval)
+    else:
+        print(f"Exported {exporter.export()} new transactions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Google Sheets access for the import and export scripts.
+
+``open_worksheet`` authenticates with a service account only when it is
+called, so importing a script no longer needs credentials. ``SheetSync``
+writes a table to a worksheet with one read and at most one batch update,
+retrying with exponential backoff when Google's quota is exhausted.
+``FakeWorksheet`` implements the subset of the gspread Worksheet API these
+use, in memory, so they can run without network access.
+"""
+import logging
+import random
+import re
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+# HTTP statuses worth retrying: quota exhausted, or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503}
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0  # Seconds before the first retry, doubled on every further one
+CREDENTIALS_FILE = '/Users/arulvasukisrinivasan/PycharmProjects/expenses-tracker-450506-d060c70cd70b.json'
+SHEET_NAME = 'family_expense_2025_sheet'
+
+
+def open_worksheet(sheet_name=SHEET_NAME, worksheet_title=None, credentials_file=CREDENTIALS_FILE):
+    """Open a worksheet of a Google spreadsheet (the first one by default), creating it if it is missing."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    credentials = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    spreadsheet = gspread.authorize(credentials).open(sheet_name)
+    if worksheet_title is None:
+        return spreadsheet.sheet1
+    try:
+        return spreadsheet.worksheet(worksheet_title)
+    except gspread.exceptions.WorksheetNotFound:
+        return spreadsheet.add_worksheet(title=worksheet_title, rows="100", cols="20")
+
+
+def column_letter(index):
+    """1 -> 'A', 27 -> 'AA'."""
+    letters = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _cell_index(cell):
+    """'B3' -> (3, 2), both 1-based."""
+    match = re.fullmatch(r'([A-Z]+)(\d+)', cell)
+    if not match:
+        raise ValueError(f"invalid cell reference: {cell!r}")
+    column = 0
+    for char in match.group(1):
+        column = column * 26 + ord(char) - ord('A') + 1
+    return int(match.group(2)), column
+
+
+def _same_cell(current, value):
+    """Whether a cell as read back from Sheets (formatted text) already holds ``value``."""
+    value = '' if value is None else value
+    if current == str(value):
+        return True
+    try:
+        return float(current) == float(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_retryable(error):
+    # gspread's APIError keeps the requests response; don't import gspread just to check
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status in RETRY_STATUSES
+
+
+class SheetSync:
+    """
+    Makes a worksheet hold a given table, sending only the rows that differ.
+
+    ``sync`` reads the sheet once, groups changed rows into contiguous
+    ranges and writes them all with a single ``batch_update``; rows below
+    the new table are blanked. API calls that fail with a quota or server
+    error are retried up to ``retries`` times with exponential backoff.
+    """
+
+    def __init__(self, worksheet, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, sleep=time.sleep):
+        self.worksheet = worksheet
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+
+    def _call(self, method, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.retries or not _is_retryable(e):
+                    raise
+                delay = self.backoff * 2 ** attempt * (1 + random.random() / 2)
+                logger.warning(f"Sheets API {method.__name__} failed ({e}), retrying in {delay:.1f}s")
+                self.sleep(delay)
+
+    def diff(self, current, rows):
+        """The {'range', 'values'} updates that turn ``current`` (sheet values) into ``rows``."""
+        width = max([len(row) for row in rows] + [len(row) for row in current] + [1])
+        target = [list(row) + [''] * (width - len(row)) for row in rows]
+        # Blank out rows left over from a longer previous table
+        target += [[''] * width for _ in range(len(current) - len(rows))]
+
+        updates = []
+        start = None
+        for index, row in enumerate(target + [None]):
+            existing = current[index] if index < len(current) else []
+            changed = row is not None and not all(
+                _same_cell(existing[column] if column < len(existing) else '', value)
+                for column, value in enumerate(row))
+            if changed and start is None:
+                start = index
+            elif not changed and start is not None:
+                updates.append({
+                    "range": f"A{start + 1}:{column_letter(width)}{index}",
+                    "values": target[start:index],
+                })
+                start = None
+        return updates
+
+    def sync(self, rows):
+        """Write ``rows`` (a list of value lists, header included) from A1; returns the number of ranges sent."""
+        current = self._call(self.worksheet.get_all_values)
+        updates = self.diff(current, rows)
+        if updates:
+            self._call(self.worksheet.batch_update, updates)
+        return len(updates)
+
+    def append(self, rows):
+        """Append ``rows`` below the worksheet's table in one request, leaving existing cells alone."""
+        if rows:
+            self._call(self.worksheet.append_rows, rows, value_input_option='USER_ENTERED')
+        return len(rows)
+
+
+class FakeQuotaError(Exception):
+    """What FakeWorksheet raises in place of gspread's APIError for a 429 response."""
+
+    def __init__(self):
+        super().__init__("Quota exceeded for quota metric 'Requests per minute'")
+        self.response = namedtuple('Response', ['status_code'])(429)
+
+
+class FakeWorksheet:
+    """
+    An in-memory stand-in for a gspread Worksheet; ``calls`` counts the API requests made.
+
+    The first ``quota_failures`` requests fail with FakeQuotaError, to
+    exercise retrying.
+    """
+
+    def __init__(self, title='Sheet1', rows=None, quota_failures=0):
+        self.title = title
+        self.rows = [list(row) for row in rows or []]
+        self.calls = 0
+        self.quota_failures = quota_failures
+
+    def _request(self):
+        self.calls += 1
+        if self.quota_failures:
+            self.quota_failures -= 1
+            raise FakeQuotaError()
+
+    def get_all_values(self):
+        self._request()
+        width = max((len(row) for row in self.rows), default=0)
+        return [[str(value) for value in row] + [''] * (width - len(row)) for row in self.rows]
+
+    def clear(self):
+        self._request()
+        self.rows = []
+
+    def append_row(self, values):
+        self._request()
+        self.rows.append(list(values))
+
+    def append_rows(self, values, value_input_option='RAW'):
+        self._request()
+        # Like Sheets, append after the last row that has any value
+        while self.rows and not any(value != '' for value in self.rows[-1]):
+            self.rows.pop()
+        self.rows.extend(list(row) for row in values)
+
+    def update(self, range_name, values):
+        self._request()
+        self._write(range_name.split(':')[0], values)
+
+    def batch_update(self, data):
+        self._request()
+        for update in data:
+            self._write(update['range'].split(':')[0], update['values'])
+
+    def _write(self, start_cell, values):
+        first_row, first_column = _cell_index(start_cell)
+        for row_offset, row_values in enumerate(values):
+            row_index = first_row - 1 + row_offset
+            while len(self.rows) <= row_index:
+                self.rows.append([])
+            row = self.rows[row_index]
+            for column_offset, value in enumerate(row_values):
+                column_index = first_column - 1 + column_offset
+                while len(row) <= column_index:
+                    row.append('')
+                row[column_index] = value
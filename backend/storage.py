@@ -0,0 +1,136 @@
+"""Content-addressed storage of uploaded statements.
+
+Uploads are hashed with SHA-256 while they are copied to disk and stored
+under their digest, so uploading the same statement twice keeps a single
+copy and the caller can recognise the repeat by its hash.
+
+Data is streamed to a temporary file in fixed-size blocks, never held in
+memory as a whole. The first block is sniffed for the file type and the
+size limit is checked as blocks arrive, so a rejected upload stops being
+read as soon as possible.
+"""
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+# Bytes read from an upload stream at a time
+CHUNK_SIZE = 64 * 1024
+
+# ``kind`` is the sniffed file type, see sniff_format
+StoredFile = namedtuple('StoredFile', ['path', 'sha256', 'size', 'kind'])
+
+# (kind, leading bytes), checked in order
+MAGIC_NUMBERS = [
+    ('pdf', b'%PDF-'),
+    ('xlsx', b'PK\x03\x04'),  # Office Open XML workbooks are zip archives
+    ('jpeg', b'\xff\xd8\xff'),
+    ('png', b'\x89PNG\r\n\x1a\n'),
+    ('tiff', b'II*\x00'),
+    ('tiff', b'MM\x00*'),
+    ('parquet', b'PAR1'),
+]
+
+
+class UploadRejected(ValueError):
+    """Raised when an upload is refused; the partial copy has been removed."""
+
+
+class UploadTooLarge(UploadRejected):
+    def __init__(self, max_size):
+        super().__init__(f"File is larger than the {max_size} byte limit")
+        self.max_size = max_size
+
+
+class UnsupportedUpload(UploadRejected):
+    def __init__(self, kind, allowed_kinds):
+        super().__init__(f"Unsupported file type {kind or 'unknown'}, "
+                         f"expected one of {', '.join(sorted(allowed_kinds))}")
+        self.kind = kind
+
+
+def sniff_format(head):
+    """Guess the file type from its first bytes: a MAGIC_NUMBERS kind, 'text', or None."""
+    for kind, magic in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    if head and b'\x00' not in head:
+        try:
+            # The block may end in the middle of a multi-byte character
+            head.decode('utf-8')
+            return 'text'
+        except UnicodeDecodeError as e:
+            if e.start >= len(head) - 3:
+                return 'text'
+    return None
+
+
+def spool_upload(stream, directory, max_size=None, allowed_kinds=None):
+    """
+    Copy ``stream`` into a temporary file in ``directory``, hashing and sniffing it on the way.
+
+    Returns a StoredFile for the temporary file; the caller moves or deletes
+    it. Raises UploadTooLarge or UnsupportedUpload (after removing the
+    partial copy) when the data exceeds ``max_size`` bytes or its kind is
+    not in ``allowed_kinds``.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    kind = None
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(descriptor, 'wb') as temp_file:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                if size == 0:
+                    kind = sniff_format(chunk)
+                    if allowed_kinds is not None and kind not in allowed_kinds:
+                        raise UnsupportedUpload(kind, allowed_kinds)
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                temp_file.write(chunk)
+        if size == 0 and allowed_kinds is not None:
+            raise UnsupportedUpload(None, allowed_kinds)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return StoredFile(temp_path, digest.hexdigest(), size, kind)
+
+
+def content_path(upload_folder, sha256, filename):
+    """Where a file with digest ``sha256`` lives: ``<folder>/<first two hex digits>/<digest><ext>``."""
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(upload_folder, sha256[:2], f"{sha256}{extension}")
+
+
+def store_upload(stream, upload_folder, filename, max_size=None, allowed_kinds=None):
+    """
+    Copy ``stream`` into the content-addressed store, hashing it on the way.
+
+    The data is spooled to a temporary file in ``upload_folder`` (see
+    spool_upload) and atomically renamed into place once its digest is
+    known; if that content is already stored the temporary copy is discarded.
+    """
+    spooled = spool_upload(stream, upload_folder, max_size, allowed_kinds)
+    path = content_path(upload_folder, spooled.sha256, filename)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(spooled.path)
+        else:
+            os.replace(spooled.path, path)
+    except BaseException:
+        if os.path.exists(spooled.path):
+            os.remove(spooled.path)
+        raise
+    return spooled._replace(path=path)
+
+
+def file_sha256(path):
+    """SHA-256 of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,138 @@
+"""Shared fixtures: the Flask app on a throwaway database, users and statements.
+
+    cd backend && python -m pytest tests
+"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# db_engine reads the database path once, when it is first imported, so it is
+# set before any test module can import it; the app then creates and migrates it
+WORK_DIR = tempfile.mkdtemp(prefix='expense-tracker-tests-')
+os.environ['EXPENSE_TRACKER_DB'] = os.path.join(WORK_DIR, 'expense_tracker.db')
+
+from ingestion import TransactionRow, bulk_insert_transactions, fingerprint_rows  # noqa: E402
+from rollups import add_file_to_rollup  # noqa: E402
+
+Login = namedtuple('Login', ['id', 'email', 'headers'])
+
+_user_numbers = itertools.count(1)
+_file_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The ``app`` module, imported with the working directory in a scratch folder."""
+    # app.py logs to backend/app.log and stores uploads under uploads/, relative to the working directory
+    os.makedirs(os.path.join(WORK_DIR, 'backend'), exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(WORK_DIR)
+    try:
+        import app
+        yield app
+        app.upload_jobs.shutdown()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def user(app_module, client):
+    """A newly registered user, with the headers of a logged-in session."""
+    email = f"user{next(_user_numbers)}@example.com"
+    assert client.post('/register', json={"email": email, "password": "password1"}).status_code == 200
+    token = client.post('/login', json={"email": email, "password": "password1"}).json['access_token']
+    with app_module.app.app_context():
+        user_id = app_module.User.query.filter_by(email=email).one().id
+    return Login(user_id, email, {"Authorization": f"Bearer {token}"})
+
+
+def statement_rows(count, month=1, label='shop'):
+    """``count`` distinct card purchases dated in ``month`` of 2025."""
+    return [TransactionRow(datetime(2025, month, 1 + i % 28), -(100 + i), f"{label} {i}", 'SINGAPORE SG')
+            for i in range(count)]
+
+
+def write_pdf(path, lines, lines_per_page=50):
+    """Write a PDF showing ``lines`` of Helvetica text, top to bottom, ``lines_per_page`` to a page."""
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]]
+    # Objects 1 and 2 are the catalog and page tree, 3 the font, then a page and its content per page
+    page_numbers = [4 + 2 * index for index in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % number for number in page_numbers),
+                                                     len(pages)),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for number, page_lines in zip(page_numbers, pages):
+        shown = ' '.join("({}) Tj 0 -14 Td".format(line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)'))
+                         for line in page_lines)
+        content = f"BT /F1 10 Tf 40 800 Td {shown} ET".encode()
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (number + 1))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(pdf)
+
+
+@pytest.fixture
+def add_statement(app_module):
+    """Store a statement for a user the way an upload does, rollup included; returns the UserFile id."""
+    def add(user_id, rows):
+        number = next(_file_numbers)
+        with app_module.app.app_context():
+            user_file = app_module.UserFile(user_id=user_id, bank_file_format_id=1, file_url=f"uploads/{number}.csv",
+                                            content_sha256=f"{number:064x}")
+            app_module.db.session.add(user_file)
+            app_module.db.session.flush()
+            bulk_insert_transactions(app_module.db.session, app_module.Transaction.__table__, user_file.id,
+                                     fingerprint_rows(rows, user_id))
+            add_file_to_rollup(app_module.db.session, user_id, user_file.id)
+            app_module.db.session.commit()
+            return user_file.id
+    return add
+
+
+@pytest.fixture
+def query_counter(app_module):
+    """``with query_counter() as statements:`` records each SQL statement run on the app's engine."""
+    @contextmanager
+    def count():
+        statements = []
+
+        def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        with app_module.app.app_context():
+            engine = app_module.db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return count
@@ -0,0 +1,90 @@
+"""Bank format detection from the head of a statement."""
+import openpyxl
+import pytest
+
+from conftest import write_pdf
+from parsers import BANK_FORMATS, SNIFF_BYTES, detect_bank_format
+
+DBS_CSV = ('Account Details For:,POSB\n'
+           'Transaction Date,Reference,Debit Amount,Credit Amount,Transaction Ref1,Transaction Ref2,'
+           'Transaction Ref3,\n'
+           '01 Jan 2025,POS,12.50,,NTUC,x,y,\n')
+SC_CSV_ROW = '16 Nov,,GRAB *RIDE,,,,,,,,SINGAPORE,,,,12.30\n'
+
+
+def _detected(path):
+    bank_format = detect_bank_format(str(path))
+    return bank_format.name if bank_format else None
+
+
+def _workbook(path, *sheet_names):
+    workbook = openpyxl.Workbook()
+    workbook.active.title = sheet_names[0]
+    for name in sheet_names[1:]:
+        workbook.create_sheet(name)
+    workbook.save(path)
+
+
+def test_every_registered_format_is_tested():
+    assert list(BANK_FORMATS) == ['DBS Savings Account (CSV)', 'DBS Credit Card (PDF)',
+                                  'Standard Chartered Credit Card (XSLX)', 'Standard Chartered Credit Card (CSV)',
+                                  'Transactions (Parquet)']
+
+
+def test_dbs_csv_is_detected_by_its_header(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text(DBS_CSV)
+    assert _detected(path) == 'DBS Savings Account (CSV)'
+
+
+def test_dbs_pdf_is_detected_by_its_magic_bytes(tmp_path):
+    path = tmp_path / 'statement.pdf'
+    write_pdf(str(path), ['03 JAN   COLD STORAGE   45.00'])
+    assert _detected(path) == 'DBS Credit Card (PDF)'
+
+
+def test_sc_xlsx_is_detected_by_its_sheet_names(tmp_path):
+    path = tmp_path / 'statement.xlsx'
+    _workbook(path, 'Summary', 'Table 2')
+    assert _detected(path) == 'Standard Chartered Credit Card (XSLX)'
+
+
+def test_sc_csv_is_detected_by_its_transaction_rows(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text('Statement Date: 18 Nov 2025\n' + SC_CSV_ROW * 3)
+    assert _detected(path) == 'Standard Chartered Credit Card (CSV)'
+
+
+def test_transaction_export_is_detected_by_its_columns(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet  # noqa: F401
+    path = tmp_path / 'transactions.parquet'
+    pa.parquet.write_table(pa.table({'transaction_date': [None], 'amount_cents': [1], 'remarks_1': ['x']}), path)
+    assert _detected(path) == 'Transactions (Parquet)'
+
+
+@pytest.mark.parametrize('name, content', [
+    ('notes.txt', b'just some notes\nnothing like a statement\n'),
+    ('statement.csv', b'x' * SNIFF_BYTES + DBS_CSV.encode()),  # The header is past the sniffed head
+    ('photo.png', b'\x89PNG\r\n\x1a\n' + b'\x00' * 64),
+    ('random.bin', bytes(range(256)) * 4),
+    ('empty.csv', b''),
+])
+def test_unrecognised_files_are_rejected(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    assert _detected(path) is None
+
+
+def test_workbook_without_statement_sheets_is_rejected(tmp_path):
+    path = tmp_path / 'budget.xlsx'
+    _workbook(path, 'Budget')
+    assert _detected(path) is None
+
+
+def test_parquet_without_transaction_columns_is_rejected(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet  # noqa: F401
+    path = tmp_path / 'other.parquet'
+    pa.parquet.write_table(pa.table({'name': ['x']}), path)
+    assert _detected(path) is None
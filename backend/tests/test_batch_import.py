@@ -0,0 +1,120 @@
+"""The headless batch importer: input expansion and each of its targets."""
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from batch_import import DatabaseTarget, FileTarget, SheetTarget, expand_inputs, run_import
+from categorization import Categorizer, DEFAULT_CATEGORY_RULES
+from sheets import FakeWorksheet
+
+HEADER = ('Account Details For:,POSB\n'
+          'Transaction Date,Reference,Debit Amount,Credit Amount,Transaction Ref1,Transaction Ref2,'
+          'Transaction Ref3,\n')
+
+
+@pytest.fixture
+def statements(tmp_path):
+    """Two DBS savings statements and a file that is not a statement, in input order."""
+    paths = []
+    for name, lines in (('jan.csv', ['01 Jan 2025,POS,12.50,,FOOD COURT,x,y,', '02 Jan 2025,ICT,,100.00,SALARY,x,y,']),
+                        ('feb.csv', ['03 Feb 2025,POS,4.20,,BUS RIDE,x,y,'])):
+        path = tmp_path / name
+        path.write_text(HEADER + ''.join(f"{line}\n" for line in lines))
+        paths.append(str(path))
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('not a statement\n')
+    return paths + [str(notes)]
+
+
+def _import(paths, targets):
+    out = io.StringIO()
+    imported = run_import(paths, targets, workers=1, out=out)
+    return imported, out.getvalue()
+
+
+def test_expand_inputs_walks_directories_and_globs(tmp_path):
+    for name in ('a.csv', 'b.pdf', '.hidden.csv', 'nested/c.csv', 'nested/deeper/d.xlsx'):
+        path = tmp_path / 'statements' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+    root = str(tmp_path / 'statements')
+
+    assert expand_inputs([root]) == [os.path.join(root, name) for name in
+                                     ('a.csv', 'b.pdf', 'nested/c.csv', 'nested/deeper/d.xlsx')]
+    assert expand_inputs([os.path.join(root, '**', '*.csv')]) == [
+        os.path.join(root, 'a.csv'), os.path.join(root, 'nested/c.csv')]
+    # Named twice, directly and through a pattern, but listed once
+    assert expand_inputs([os.path.join(root, 'b.pdf'), os.path.join(root, '*.pdf')]) == [os.path.join(root, 'b.pdf')]
+    assert expand_inputs([os.path.join(root, 'missing.csv'), os.path.join(root, '*.txt'), root + '/nested']) == [
+        os.path.join(root, 'nested/c.csv'), os.path.join(root, 'nested/deeper/d.xlsx')]
+
+
+def test_csv_output(tmp_path, statements):
+    output = str(tmp_path / 'all.csv')
+    imported, log = _import(statements, [FileTarget(output, Categorizer(DEFAULT_CATEGORY_RULES))])
+    assert imported == 2
+    assert f"{statements[2]}: skipped, unrecognised format" in log
+    assert log.splitlines()[-1].startswith('2 of 3 statements imported')
+    with open(output, newline='', encoding='utf-8') as f:
+        records = list(csv.DictReader(f))
+    assert [(r['file'], r['transaction_date'], r['amount'], r['remarks_1'], r['category']) for r in records] == [
+        ('jan.csv', '2025-01-01', '-12.5', 'FOOD COURT', 'Food'),
+        ('jan.csv', '2025-01-02', '100.0', 'SALARY', ''),
+        ('feb.csv', '2025-02-03', '-4.2', 'BUS RIDE', ''),
+    ]
+
+
+def test_json_lines_output(tmp_path, statements):
+    output = str(tmp_path / 'all.jsonl')
+    _import(statements[:1], [FileTarget(output, Categorizer(DEFAULT_CATEGORY_RULES))])
+    with open(output, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert records == [
+        {"file": "jan.csv", "transaction_date": "2025-01-01", "amount": -12.5, "currency": "SGD",
+         "remarks_1": "FOOD COURT", "remarks_2": None, "category": "Food"},
+        {"file": "jan.csv", "transaction_date": "2025-01-02", "amount": 100.0, "currency": "SGD",
+         "remarks_1": "SALARY", "remarks_2": None, "category": None},
+    ]
+
+
+def test_sheet_output_is_synced_once_on_close(statements):
+    worksheet = FakeWorksheet(rows=[['stale'] * 5] * 6)
+    _import(statements, [SheetTarget(worksheet, Categorizer(DEFAULT_CATEGORY_RULES))])
+    assert worksheet.calls == 2  # One read and one batch_update, after every statement is parsed
+    assert worksheet.rows[:4] == [
+        SheetTarget.HEADER,
+        ['2025-01-01', -12.5, 'FOOD COURT', 'Food', 'jan.csv'],
+        ['2025-01-02', 100.0, 'SALARY', '', 'jan.csv'],
+        ['2025-02-03', -4.2, 'BUS RIDE', '', 'feb.csv'],
+    ]
+    assert worksheet.rows[4:] == [[''] * 5] * 2
+
+
+def test_database_target_skips_files_already_imported(app_module, user, tmp_path, statements):
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    upload_folder = str(tmp_path / 'uploads')
+    os.makedirs(upload_folder)
+
+    imported, log = _import(statements[:2], [DatabaseTarget(engine, user.email, upload_folder)])
+    assert imported == 2
+    assert log.count('stored as file') == 2
+
+    # The same files again, one under a new name: matched by their content hash, not their path
+    renamed = str(tmp_path / 'jan-copy.csv')
+    os.rename(statements[0], renamed)
+    imported, log = _import([renamed, statements[1]], [DatabaseTarget(engine, user.email, upload_folder)])
+    assert imported == 2
+    assert log.count('already imported as file') == 2 and 'stored as file' not in log
+
+    with app_module.app.app_context():
+        files = app_module.UserFile.query.filter_by(user_id=user.id).all()
+        assert len(files) == 2
+        transactions = app_module.Transaction.query.filter(
+            app_module.Transaction.user_file_id.in_([f.id for f in files])).all()
+    assert sorted((t.remarks_1, t.amount_cents, t.category) for t in transactions) == [
+        ('BUS RIDE', -420, None), ('FOOD COURT', -1250, 'Food'), ('SALARY', 10000, None)]
+    assert len(os.listdir(upload_folder)) == 2
@@ -0,0 +1,74 @@
+"""The compiled keyword categorizer."""
+import random
+
+import pytest
+
+from categorization import Categorizer, CategoryRule, DEFAULT_CATEGORY_RULES
+from ingestion import TransactionRow
+
+
+def leftmost_longest(rules, *texts):
+    """Reference classifier: scan every rule, keep the leftmost match, then the longest, then the first rule."""
+    remark = '\n'.join(' '.join(text.split()).casefold() for text in texts if text)
+    best = None
+    for order, rule in enumerate(rules):
+        keyword = ' '.join(rule.keyword.split()).casefold()
+        position = remark.find(keyword) if keyword else -1
+        if position >= 0:
+            key = (position, -len(keyword), order)
+            if best is None or key < best[0]:
+                best = (key, rule.category)
+    return best[1] if best else None
+
+
+def test_default_rules_match_category_names_case_insensitively():
+    categorizer = Categorizer(DEFAULT_CATEGORY_RULES)
+    assert categorizer.classify('NTUC FAIRPRICE GROCERY') == 'Grocery'
+    assert categorizer.classify('Starbucks') is None
+
+
+def test_leftmost_keyword_wins_then_the_longest():
+    categorizer = Categorizer([CategoryRule('grab', 'Travel'), CategoryRule('grabfood', 'Food'),
+                               CategoryRule('food', 'Misc')])
+    assert categorizer.classify('GRABFOOD SINGAPORE') == 'Food'
+    assert categorizer.classify('GRAB RIDE') == 'Travel'
+    assert categorizer.classify('FOOD AT GRAB') == 'Misc'
+
+
+def test_first_rule_wins_for_a_repeated_keyword():
+    categorizer = Categorizer([CategoryRule('Shell', 'Travel'), CategoryRule('shell', 'Misc')])
+    assert categorizer.classify('SHELL  STATION') == 'Travel'
+
+
+def test_keywords_do_not_match_across_remarks():
+    categorizer = Categorizer([CategoryRule('taxi fare', 'Travel')])
+    assert categorizer.classify('TAXI', 'FARE') is None
+    assert categorizer.classify('CDG', 'TAXI   FARE') == 'Travel'
+
+
+def test_rows_keep_an_existing_category():
+    categorizer = Categorizer([CategoryRule('ntuc', 'Grocery')])
+    rows = [TransactionRow(None, -100, 'NTUC'), TransactionRow(None, -100, 'NTUC', category='Food')]
+    assert [row.category for row in categorizer.categorize_rows(rows)] == ['Grocery', 'Food']
+
+
+def test_repeated_remarks_are_answered_from_the_cache():
+    categorizer = Categorizer([CategoryRule('ntuc', 'Grocery')])
+    for _ in range(3):
+        assert categorizer.classify('NTUC  Fairprice') == 'Grocery'
+    assert categorizer.classify('ntuc fairprice') == 'Grocery'
+    assert categorizer.cache.stats()["hits"] == 3
+    assert categorizer.cache.stats()["misses"] == 1
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_compiled_rules_agree_with_a_scan_of_every_rule(seed):
+    generator = random.Random(seed)
+    alphabet = 'abcde '
+    rules = [CategoryRule(''.join(generator.choice(alphabet) for _ in range(generator.randint(1, 5))),
+                          f"category {number}")
+             for number in range(200)]
+    categorizer = Categorizer(rules)
+    for _ in range(500):
+        remarks = [''.join(generator.choice(alphabet) for _ in range(generator.randint(0, 20))) for _ in range(2)]
+        assert categorizer.classify(*remarks) == leftmost_longest(rules, *remarks), remarks
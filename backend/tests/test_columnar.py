@@ -0,0 +1,40 @@
+"""Parquet export of the transaction table."""
+from datetime import datetime
+
+import pytest
+
+from columnar import export_transactions, is_transaction_export, iter_parquet_records
+from ingestion import TransactionRow
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def quarter(user, add_statement):
+    """One transaction on each of the last day of February, March and April, and the first of April."""
+    add_statement(user.id, [TransactionRow(datetime(2025, month, day), -100 * month, f"day {month}-{day}")
+                            for month, day in ((2, 28), (3, 31), (4, 1), (4, 30))])
+    return user
+
+
+def _export(app_module, destination, user_id, **dates):
+    with app_module.app.app_context(), app_module.db.engine.connect() as connection:
+        return export_transactions(connection, destination, user_id, **dates)
+
+
+def test_date_filters_include_the_end_day(app_module, quarter, tmp_path):
+    path = str(tmp_path / 'march.parquet')
+    assert _export(app_module, path, quarter.id,
+                   start_date=datetime(2025, 3, 1), end_date=datetime(2025, 3, 31)) == 1
+    [[row]] = list(iter_parquet_records(path))
+    assert (row["transaction_date"], row["amount_cents"], row["user_id"]) == (datetime(2025, 3, 31), -300, quarter.id)
+    assert is_transaction_export(path)
+
+
+def test_dataset_is_partitioned_by_month(app_module, quarter, tmp_path):
+    directory = tmp_path / 'export'
+    assert _export(app_module, str(directory), quarter.id) == 4
+    assert sorted(p.name for p in directory.iterdir()) == ['year_month=2025-02', 'year_month=2025-03',
+                                                            'year_month=2025-04']
+    rows = [row for batch in iter_parquet_records(str(directory)) for row in batch]
+    assert sorted(row["remarks_1"] for row in rows) == ['day 2-28', 'day 3-31', 'day 4-1', 'day 4-30']
@@ -0,0 +1,55 @@
+"""The streaming DBS savings CSV parser and its per-row error budget."""
+from datetime import datetime
+
+import pytest
+
+from parsers import ErrorBudgetExceeded, ParseReport, RowError, iter_dbs_csv_rows
+
+PREAMBLE = ('Account Details For:,POSB\n'
+            ',\n'
+            '\n'
+            'Transaction Date,Reference,Debit Amount,Credit Amount,Transaction Ref1,Transaction Ref2,'
+            'Transaction Ref3,\n')
+
+
+def _statement(tmp_path, *lines):
+    path = tmp_path / 'dbs.csv'
+    path.write_text(PREAMBLE + ''.join(f"{line}\n" for line in lines), encoding='utf-8')
+    return str(path)
+
+
+def test_bad_rows_are_reported_with_their_line_numbers(tmp_path):
+    path = _statement(tmp_path,
+                      '01 Jan 2025,POS,12.50,,NTUC,x,y,',  # Line 5
+                      'bad date,POS,1.00,,A,x,y,',
+                      '02 Jan 2025,ICT,,"1,000.00",SALARY,x,y,',
+                      '03 Jan 2025,POS,twelve,,B,x,y,')  # Line 8
+    report = ParseReport()
+    rows = list(iter_dbs_csv_rows(path, report))
+    assert [(row.transaction_date, row.amount_cents, row.remarks_1) for row in rows] == [
+        (datetime(2025, 1, 1), -1250, 'NTUC'), (datetime(2025, 1, 2), 100000, 'SALARY')]
+    assert report.rows == 2
+    assert report.errors == [RowError(6, "time data 'bad date' does not match format '%d %b %Y'"),
+                             RowError(8, "invalid amount: 'twelve'")]
+
+
+def test_errors_up_to_the_budget_are_tolerated(tmp_path):
+    path = _statement(tmp_path, 'x,POS,1.00,,A,x,y,', 'y,POS,1.00,,B,x,y,', '04 Jan 2025,POS,2.00,,C,x,y,')
+    report = ParseReport(max_errors=2)
+    assert len(list(iter_dbs_csv_rows(path, report))) == 1
+    assert [error.line_number for error in report.errors] == [5, 6]
+
+
+def test_parsing_stops_once_the_budget_is_exceeded(tmp_path):
+    path = _statement(tmp_path, '04 Jan 2025,POS,2.00,,C,x,y,',
+                      *(f"bad {i},POS,1.00,,A,x,y," for i in range(3)),
+                      '05 Jan 2025,POS,2.00,,D,x,y,')
+    report = ParseReport(max_errors=2)
+    rows = iter_dbs_csv_rows(path, report)
+    assert next(rows).remarks_1 == 'C'
+    with pytest.raises(ErrorBudgetExceeded) as raised:
+        next(rows)
+    assert raised.value.report is report
+    assert [error.line_number for error in report.errors] == [6, 7, 8]
+    assert str(raised.value) == ("Too many invalid rows (3), first at line 6: "
+                                 "time data 'bad 0' does not match format '%d %b %Y'")
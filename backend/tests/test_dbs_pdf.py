@@ -0,0 +1,33 @@
+"""DBS credit card PDF amounts follow the app-wide sign: purchases negative, CR lines positive."""
+from conftest import write_pdf
+from parsers import ParseReport, iter_dbs_pdf_rows
+
+
+def test_purchases_are_debits_and_cr_lines_credits(tmp_path):
+    path = str(tmp_path / 'dbs.pdf')
+    write_pdf(path, ['Statement Date 31 Jan 2025',
+                     '03 JAN   COLD STORAGE   1,045.60',
+                     '10 JAN   PAYMENT DBS INTERNET   500.00 CR',
+                     '12 JAN   REFUND AMAZON   12.00CR'])
+    report = ParseReport()
+    rows = list(iter_dbs_pdf_rows(path, report))
+    assert [(row.remarks_1, row.amount_cents) for row in rows] == [
+        ('COLD STORAGE', -104560), ('PAYMENT DBS INTERNET', 50000), ('REFUND AMAZON', 1200)]
+    assert report.rows == 3
+
+
+def test_pooled_pages_match_the_serial_parse(tmp_path):
+    path = str(tmp_path / 'dbs.pdf')
+    lines = ['Statement Date 31 Dec 2025']
+    for i in range(12 * 20):
+        day = '31 FEB' if i == 150 else f"{1 + i % 28:02d} {('NOV', 'DEC')[i % 2]}"
+        lines.append(f"{day}   MERCHANT {i} SINGAPORE   {i + 1}.{i % 100:02d}{' CR' if i % 9 == 0 else ''}")
+    write_pdf(path, lines, lines_per_page=20)
+
+    serial_report, pooled_report = ParseReport(), ParseReport()
+    serial = list(iter_dbs_pdf_rows(path, serial_report, workers=1))
+    pooled = list(iter_dbs_pdf_rows(path, pooled_report, workers=3))
+    assert len(serial) == 12 * 20 - 1
+    assert pooled == serial
+    assert pooled_report.rows == serial_report.rows
+    assert pooled_report.errors == serial_report.errors == [(8, "day is out of range for month")]
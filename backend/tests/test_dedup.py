@@ -0,0 +1,56 @@
+"""Cross-statement dedup: shared rows survive a delete, and year-less dates are never deduplicated."""
+from datetime import datetime
+
+import pytest
+
+from conftest import statement_rows, write_pdf
+from ingestion import UNKNOWN_YEAR, TransactionRow, fingerprint_rows
+from parsers import iter_dbs_pdf_rows, with_statement_year
+from rollups import check_monthly_rollup
+
+
+def _transaction_count(client, user, file_id):
+    return client.get(f'/user-files/{file_id}', headers=user.headers).json["no_of_transactions"]
+
+
+@pytest.mark.parametrize('deleted', [0, 1])
+def test_deleting_a_statement_keeps_the_rows_another_statement_contains(app_module, client, user, add_statement,
+                                                                      deleted):
+    rows = statement_rows(150, label=f"overlap {deleted}")
+    files = [add_statement(user.id, rows[:100]), add_statement(user.id, rows[50:])]
+    assert [_transaction_count(client, user, file_id) for file_id in files] == [100, 50]
+
+    assert client.delete(f'/user-files/{files[deleted]}', headers=user.headers).status_code == 200
+    assert _transaction_count(client, user, files[1 - deleted]) == 100
+    with app_module.app.app_context():
+        assert check_monthly_rollup(app_module.db.session) == []
+
+
+def test_rows_without_a_year_get_no_fingerprint():
+    rows = [TransactionRow(datetime(UNKNOWN_YEAR, 12, 28), -1230, 'GRAB'),
+            TransactionRow(datetime(2024, 12, 28), -1230, 'GRAB')]
+    first, second = fingerprint_rows(rows, user_id=1)
+    assert first.fingerprint is None
+    assert second.fingerprint is not None
+
+
+@pytest.mark.parametrize('day, month, year', [(5, 1, 2025), (28, 12, 2024), (6, 1, 2024)])
+def test_dates_take_the_statement_year(day, month, year):
+    statement_date = datetime(2025, 1, 5)
+    assert with_statement_year(datetime(UNKNOWN_YEAR, month, day), statement_date) == datetime(year, month, day)
+
+
+def test_dbs_card_rows_are_dated_from_the_statement_header(tmp_path):
+    path = str(tmp_path / 'dbs.pdf')
+    write_pdf(path, ['DBS Card Services', 'Statement Date 05 Jan 2025',
+                     '28 DEC   GRAB RIDE SINGAPORE   12.30', '03 JAN   COLD STORAGE   45.00'])
+    assert [row.transaction_date for row in iter_dbs_pdf_rows(path)] == [datetime(2024, 12, 28),
+                                                                          datetime(2025, 1, 3)]
+
+
+def test_dbs_card_rows_without_a_statement_date_keep_an_unknown_year(tmp_path):
+    path = str(tmp_path / 'dbs.pdf')
+    write_pdf(path, ['28 DEC   GRAB RIDE SINGAPORE   12.30'])
+    [row] = fingerprint_rows(iter_dbs_pdf_rows(path), user_id=1)
+    assert row.transaction_date == datetime(UNKNOWN_YEAR, 12, 28)
+    assert row.fingerprint is None
@@ -0,0 +1,214 @@
+"""The FastAPI app's async read routes, on the database the Flask app writes."""
+import base64
+import importlib
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+from conftest import BACKEND_DIR
+from ingestion import TransactionRow
+
+pytest.importorskip('fastapi')
+pytest.importorskip('aiosqlite')
+
+API_KEY = {"X-API-Key": "your_secret_api_key"}
+
+
+@pytest.fixture(scope='module')
+def fast_client(app_module):
+    """A TestClient of fast_app, which is imported as backend.fast_app for its package-relative imports."""
+    from fastapi.testclient import TestClient
+
+    sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+    fast_app = importlib.import_module('backend.fast_app')
+    with TestClient(fast_app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def two_files(user, add_statement):
+    """Two statements of a new user: (file id, its rows) for each."""
+    files = []
+    for month in (5, 6):
+        rows = [TransactionRow(datetime(2026, month, day), amount, f"fast {user.id} {month}-{day}")
+                for day, amount in ((3, -1250), (9, 10000), (21, -99))]
+        files.append((add_statement(user.id, rows), rows))
+    return files
+
+
+def test_routes_require_the_api_key(fast_client):
+    for url in ('/user-files', '/user-files/1', '/transactions'):
+        assert fast_client.get(url).status_code == 403
+
+
+def test_user_file_includes_its_transactions(fast_client, user, two_files):
+    file_id, rows = two_files[0]
+    response = fast_client.get(f'/user-files/{file_id}', headers=API_KEY)
+    assert response.status_code == 200
+    user_file = response.json()
+    assert (user_file["id"], user_file["user_id"]) == (file_id, user.id)
+    assert [(t["remarks_1"], t["amount_cents"], t["amount"]) for t in user_file["transactions"]] == [
+        (row.remarks_1, row.amount_cents, row.amount_cents / 100) for row in rows]
+
+
+def test_missing_user_file_is_404(fast_client):
+    response = fast_client.get('/user-files/999999', headers=API_KEY)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "User file not found"}
+
+
+def test_user_files_are_paged_by_id(fast_client, two_files):
+    all_ids = [f["id"] for f in fast_client.get('/user-files?limit=100000', headers=API_KEY).json()]
+    assert all_ids == sorted(all_ids)
+    skip = all_ids.index(two_files[0][0])
+    page = fast_client.get(f'/user-files?skip={skip}&limit=2', headers=API_KEY).json()
+    assert [f["id"] for f in page] == [file_id for file_id, _ in two_files]
+    assert [len(f["transactions"]) for f in page] == [3, 3]
+
+
+def test_transactions_are_filtered_by_date(fast_client, two_files):
+    response = fast_client.get('/transactions?start_date=2026-06-01T00:00:00&end_date=2026-06-30T23:59:59&limit=500',
+                               headers=API_KEY)
+    assert response.status_code == 200
+    transactions = response.json()["transactions"]
+    assert {t["remarks_1"] for t in transactions} >= {row.remarks_1 for row in two_files[1][1]}
+    assert all(t["transaction_date"].startswith('2026-06') for t in transactions)
+
+
+@pytest.fixture
+def year_2031(app_module, user, add_statement):
+    """Every transaction dated 2031, after adding some with repeated dates and amounts; no other test uses 2031."""
+    days_and_amounts = [(3, -500), (1, -500), (3, 700), (2, -500), (3, -500), (1, 250),
+                        (2, 700), (5, -10), (3, 700), (4, -500), (1, -10)]
+    add_statement(user.id, [TransactionRow(datetime(2031, 1, day), amount, f"keyset {number}")
+                            for number, (day, amount) in enumerate(days_and_amounts)])
+    Transaction = app_module.Transaction
+    with app_module.app.app_context():
+        return [(t.id, t.transaction_date, t.amount_cents)
+                for t in Transaction.query.filter(Transaction.transaction_date.between(datetime(2031, 1, 1),
+                                                                                         datetime(2031, 12, 31)))]
+
+
+def _pages(fast_client, sort_by, limit=3):
+    """Follow next_cursor from the first page to the last; returns the pages of transaction ids."""
+    params = {"start_date": "2031-01-01T00:00:00", "end_date": "2031-12-31T00:00:00", "limit": limit}
+    if sort_by:
+        params["sort_by"] = sort_by
+    pages = []
+    while True:
+        response = fast_client.get('/transactions', params=params, headers=API_KEY)
+        assert response.status_code == 200, response.json()
+        page = response.json()
+        pages.append([t["id"] for t in page["transactions"]])
+        if page["next_cursor"] is None:
+            return pages
+        params["cursor"] = page["next_cursor"]
+
+
+@pytest.mark.parametrize('sort_by, key, descending', [
+    (None, lambda t: t[0], False),
+    ('date_asc', lambda t: (t[1], t[0]), False),
+    ('date_desc', lambda t: (t[1], t[0]), True),
+    ('amount_asc', lambda t: (t[2], t[0]), False),
+    ('amount_desc', lambda t: (t[2], t[0]), True),
+])
+def test_cursors_page_through_every_row_in_order(fast_client, year_2031, sort_by, key, descending):
+    pages = _pages(fast_client, sort_by)
+    assert all(len(page) == 3 for page in pages[:-1]) and 1 <= len(pages[-1]) <= 3
+    expected = [t[0] for t in sorted(year_2031, key=key, reverse=descending)]
+    assert [transaction_id for page in pages for transaction_id in page] == expected
+
+
+def test_last_full_page_has_no_next_cursor(fast_client, year_2031):
+    assert [len(page) for page in _pages(fast_client, 'amount_desc', limit=len(year_2031))] == [len(year_2031)]
+
+
+def _first_cursor(fast_client, sort_by):
+    params = {"start_date": "2031-01-01T00:00:00", "limit": 2, "sort_by": sort_by}
+    return fast_client.get('/transactions', params=params, headers=API_KEY).json()["next_cursor"]
+
+
+def test_cursor_of_another_sort_is_rejected(fast_client, year_2031):
+    cursor = _first_cursor(fast_client, 'date_asc')
+    for sort_by in ('amount_asc', 'date_desc', None):
+        params = {"cursor": cursor, **({"sort_by": sort_by} if sort_by else {})}
+        response = fast_client.get('/transactions', params=params, headers=API_KEY)
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Cursor was issued for a different sort_by"}
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    base64.urlsafe_b64encode(b'not json').decode(),
+    base64.urlsafe_b64encode(b'{"sort_by": "date_asc"}').decode(),
+    base64.urlsafe_b64encode(b'["date_asc", 1]').decode(),
+    base64.urlsafe_b64encode(b'7').decode(),
+    base64.urlsafe_b64encode(b'["date_asc", "yesterday", 1]').decode(),
+])
+def test_malformed_cursor_is_rejected(fast_client, cursor):
+    response = fast_client.get('/transactions', params={"cursor": cursor, "sort_by": "date_asc"}, headers=API_KEY)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_unknown_sort_is_rejected(fast_client):
+    response = fast_client.get('/transactions?sort_by=remarks', headers=API_KEY)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown sort_by: remarks"}
+
+
+SUMMARY_KEYS = {
+    "day": lambda row, file_id: row.transaction_date.strftime('%Y-%m-%d'),
+    "week": lambda row, file_id: row.transaction_date.strftime('%Y-W%W'),
+    "month": lambda row, file_id: row.transaction_date.strftime('%Y-%m'),
+    "file": lambda row, file_id: str(file_id),
+    "category": lambda row, file_id: row.category or 'Uncategorized',
+}
+
+
+@pytest.fixture
+def summary_files(user, add_statement):
+    """Two statements of a new user: (file id, its rows) for each."""
+    statements = [
+        [TransactionRow(datetime(2030, 3, 2), -1000, 'summary lunch', category='Food'),
+         TransactionRow(datetime(2030, 3, 2), 500, 'summary refund'),
+         TransactionRow(datetime(2030, 3, 4), -250, 'summary coffee', category='Food')],
+        [TransactionRow(datetime(2030, 4, 15), -4000, 'summary rent', category='Rent'),
+         TransactionRow(datetime(2030, 4, 15), 10000, 'summary salary'),
+         TransactionRow(datetime(2030, 4, 30), -1, 'summary fee', category='Food')],
+    ]
+    return [(add_statement(user.id, rows), rows) for rows in statements]
+
+
+@pytest.mark.parametrize('group_by', list(SUMMARY_KEYS))
+def test_summary_groups_match_totals_in_cents(fast_client, user, summary_files, group_by):
+    groups = {}
+    for file_id, rows in summary_files:
+        for row in rows:
+            groups.setdefault(SUMMARY_KEYS[group_by](row, file_id), []).append(row.amount_cents)
+    expected = [{"key": key, "count": len(amounts),
+                 "debited_cents": -sum(a for a in amounts if a < 0), "credited_cents": sum(a for a in amounts if a > 0),
+                 "net_cents": sum(amounts), "min_cents": min(amounts), "max_cents": max(amounts),
+                 "average_cents": sum(amounts) / len(amounts)}
+                for key, amounts in sorted(groups.items())]
+
+    response = fast_client.get('/reports/summary', params={"group_by": group_by, "user_id": user.id},
+                               headers=API_KEY)
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+def test_summary_is_limited_to_the_date_range(fast_client, user, summary_files):
+    params = {"group_by": "month", "user_id": user.id, "start_date": "2030-03-03T00:00:00",
+              "end_date": "2030-04-15T00:00:00"}
+    response = fast_client.get('/reports/summary', params=params, headers=API_KEY)
+    assert [(group["key"], group["count"], group["net_cents"]) for group in response.json()] == [
+        ('2030-03', 1, -250), ('2030-04', 2, 6000)]
+
+
+def test_unknown_summary_group_is_rejected(fast_client):
+    response = fast_client.get('/reports/summary?group_by=year', headers=API_KEY)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown group_by: year"}
@@ -0,0 +1,85 @@
+"""Exact amount conversion and batched inserts of parsed rows."""
+from datetime import datetime
+
+import pytest
+
+from conftest import statement_rows
+from ingestion import UNKNOWN_YEAR, TransactionRow, bulk_insert_transactions, fingerprint_rows, to_cents
+from rollups import add_file_to_rollup
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('12.50', 1250),
+    ('1,234.56', 123456),
+    ('1,000,000', 100000000),
+    (' 0.29 ', 29),  # A float round-trip gives 28.999999999999996
+    ('-45.10', -4510),
+    ('0.005', 1),  # Half a cent rounds up, away from zero
+    ('-0.005', -1),
+    ('12.344', 1234),
+    ('', 0),
+    ('   ', 0),
+])
+def test_amounts_convert_to_exact_cents(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize('value', ['twelve', '1.2.3', '12.50CR', '$5'])
+def test_invalid_amounts_are_rejected(value):
+    with pytest.raises(ValueError, match='invalid amount'):
+        to_cents(value)
+
+
+@pytest.fixture
+def insert(app_module, user):
+    """``insert(rows, **kwargs)`` stores rows for a new file of the user, rollup included; returns (file id, stats)."""
+    def insert_rows(rows, **kwargs):
+        with app_module.app.app_context():
+            user_file = app_module.UserFile(user_id=user.id, bank_file_format_id=1, file_url='uploads/ingest.csv')
+            app_module.db.session.add(user_file)
+            app_module.db.session.flush()
+            stats = bulk_insert_transactions(app_module.db.session, app_module.Transaction.__table__, user_file.id,
+                                             fingerprint_rows(rows, user.id), **kwargs)
+            add_file_to_rollup(app_module.db.session, user.id, user_file.id)
+            app_module.db.session.commit()
+            return user_file.id, stats
+    return insert_rows
+
+
+@pytest.mark.parametrize('count, batch_size, batches', [
+    (0, 10, 0), (1, 10, 1), (10, 10, 1), (11, 10, 2), (25, 10, 3), (5, 1, 5),
+])
+def test_rows_are_inserted_in_batches(app_module, insert, query_counter, count, batch_size, batches):
+    progress = []
+    with query_counter() as statements:
+        file_id, stats = insert(statement_rows(count, label=f"batch {count} {batch_size}"),
+                                batch_size=batch_size, progress=progress.append)
+    inserts = [statement for statement, _ in statements if statement.startswith('INSERT INTO "transaction"')]
+    assert (stats.rows, stats.batches, stats.duplicates) == (count, batches, 0)
+    assert len(inserts) == batches
+    assert progress == [min(count, batch_size * number) for number in range(1, batches + 1)]
+    with app_module.app.app_context():
+        assert app_module.Transaction.query.filter_by(user_file_id=file_id).count() == count
+
+
+@pytest.mark.parametrize('batch_size', [0, -1])
+def test_batch_size_must_be_positive(insert, batch_size):
+    with pytest.raises(ValueError, match='batch_size'):
+        insert(statement_rows(3), batch_size=batch_size)
+
+
+def test_rows_already_stored_are_counted_as_duplicates(app_module, insert):
+    rows = statement_rows(30, label='overlapping')
+    insert(rows[:20], batch_size=7)
+    file_id, stats = insert(rows[10:], batch_size=7)
+    assert (stats.rows, stats.batches, stats.duplicates) == (20, 3, 10)
+    with app_module.app.app_context():
+        assert app_module.Transaction.query.filter_by(user_file_id=file_id).count() == 10
+        assert app_module.TransactionSource.query.filter_by(user_file_id=file_id).count() == 20
+
+
+def test_rows_without_a_fingerprint_are_never_duplicates(insert):
+    rows = [TransactionRow(datetime(UNKNOWN_YEAR, 11, 16), -1230, 'GRAB year-less')] * 2
+    insert(rows)
+    _, stats = insert(rows)
+    assert (stats.rows, stats.duplicates) == (2, 0)
@@ -0,0 +1,116 @@
+"""Migrations bring a database written by the baseline schema up to date."""
+import sqlite3
+
+import pytest
+
+from db_engine import create_sqlite_engine
+from migrations import MIGRATIONS, migrate, schema_version
+from rollups import check_monthly_rollup
+
+# The tables as the baseline models created them, before any migration
+BASELINE_SCHEMA = '''
+    CREATE TABLE user (
+        id INTEGER NOT NULL PRIMARY KEY,
+        email VARCHAR(100) NOT NULL UNIQUE,
+        password VARCHAR(200) NOT NULL
+    );
+    CREATE TABLE bank_file_format (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL UNIQUE
+    );
+    CREATE TABLE user_file (
+        id INTEGER NOT NULL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES user (id),
+        bank_file_format_id INTEGER NOT NULL REFERENCES bank_file_format (id),
+        file_url VARCHAR(200) NOT NULL,
+        created_on DATETIME
+    );
+    CREATE TABLE "transaction" (
+        id INTEGER NOT NULL PRIMARY KEY,
+        transaction_date DATETIME NOT NULL,
+        amount FLOAT NOT NULL,
+        remarks_1 VARCHAR(200),
+        remarks_2 VARCHAR(200),
+        user_file_id INTEGER NOT NULL REFERENCES user_file (user_id),
+        created_on DATETIME
+    );
+    INSERT INTO bank_file_format (id, name) VALUES
+        (1, 'DBS Savings Account (CSV)'), (2, 'DBS Credit Card (PDF)'), (3, 'Standard Chartered Credit Card (XSLX)');
+    INSERT INTO user (id, email, password) VALUES (1, 'user@example.com', 'x');
+'''
+
+# The baseline dispatched on the id, not the name: 1 to the DBS CSV parser,
+# 2 to the Standard Chartered parser and 3 to the DBS credit card PDF parser
+DBS_CSV, SC, DBS_PDF = 1, 2, 3
+
+# (bank_file_format_id, transaction_date, amount, remarks_1) as the baseline parsers stored them
+BASELINE_ROWS = [
+    (DBS_CSV, '2025-03-01 00:00:00.000000', -12.5, 'NTUC'),
+    (DBS_CSV, '2025-03-02 00:00:00.000000', 0.29, 'INTEREST'),  # 28.999999999999996 cents as a float
+    (DBS_CSV, '2025-03-03 00:00:00.000000', -1234.09, 'RENT'),  # -123408.99999999999 cents
+    (SC, '1900-03-04 00:00:00.000000', -45.1, 'COLD STORAGE'),
+    (DBS_PDF, '2025-03-05 00:00:00.000000', 88.0, 'GRAB RIDE'),
+    (DBS_PDF, '2025-03-06 00:00:00.000000', -20.0, 'PAYMENT CR'),
+]
+
+
+@pytest.fixture
+def baseline_engine(app_module, tmp_path):
+    """An engine on a baseline-schema database, after the app's create_all and migrate."""
+    path = str(tmp_path / 'baseline.db')
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    for user_file_id, format_id in enumerate((DBS_CSV, SC, DBS_PDF), 1):
+        connection.execute('INSERT INTO user_file (id, user_id, bank_file_format_id, file_url) VALUES (?, 1, ?, ?)',
+                           (user_file_id, format_id, f"uploads/{user_file_id}"))
+    connection.executemany(
+        'INSERT INTO "transaction" (transaction_date, amount, remarks_1, user_file_id) '
+        'SELECT ?, ?, ?, id FROM user_file WHERE bank_file_format_id = ?',
+        [(date, amount, remarks, format_id) for format_id, date, amount, remarks in BASELINE_ROWS])
+    connection.commit()
+    connection.close()
+
+    engine = create_sqlite_engine(f"sqlite:///{path}")
+    app_module.db.metadata.create_all(engine)
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+def _transactions(engine):
+    """{remarks_1: (amount_cents, fingerprint is set)} of every transaction."""
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql('SELECT remarks_1, amount_cents, fingerprint FROM "transaction"')
+        return {remarks: (amount_cents, fingerprint is not None) for remarks, amount_cents, fingerprint in rows}
+
+
+def test_baseline_database_reaches_the_latest_version(baseline_engine):
+    with baseline_engine.connect() as connection:
+        assert schema_version(connection) == MIGRATIONS[-1][0]
+
+
+def test_only_rows_of_the_baseline_card_parsers_lose_their_fingerprints(baseline_engine):
+    fingerprinted = {remarks: has_fingerprint for remarks, (_, has_fingerprint) in
+                     _transactions(baseline_engine).items()}
+    assert fingerprinted == {'NTUC': True, 'INTEREST': True, 'RENT': True, 'COLD STORAGE': False,
+                             'GRAB RIDE': False, 'PAYMENT CR': False}
+
+
+def test_only_dbs_card_purchases_become_debits(baseline_engine):
+    amounts = {remarks: amount_cents for remarks, (amount_cents, _) in _transactions(baseline_engine).items()}
+    assert amounts == {'NTUC': -1250, 'INTEREST': 29, 'RENT': -123409, 'COLD STORAGE': -4510,
+                       'GRAB RIDE': -8800, 'PAYMENT CR': 2000}
+    with baseline_engine.connect() as connection:
+        assert check_monthly_rollup(connection) == []
+        rollup = connection.exec_driver_sql(
+            'SELECT year_month, debited_cents, credited_cents FROM monthly_rollup ORDER BY year_month').fetchall()
+    assert rollup == [('1900-03', 4510, 0), ('2025-03', 1250 + 123409 + 8800, 29 + 2000)]
+
+
+def test_float_amounts_become_rounded_cents_in_sgd(baseline_engine):
+    with baseline_engine.connect() as connection:
+        assert 'amount' not in {row[1] for row in connection.exec_driver_sql('PRAGMA table_info("transaction")')}
+        rows = connection.exec_driver_sql(
+            'SELECT remarks_1, amount_cents, typeof(amount_cents), currency FROM "transaction" '
+            "WHERE remarks_1 IN ('INTEREST', 'RENT')").fetchall()
+    assert sorted(rows) == [('INTEREST', 29, 'integer', 'SGD'), ('RENT', -123409, 'integer', 'SGD')]
@@ -0,0 +1,86 @@
+"""The hot transaction and file queries are answered from their composite indexes, not table scans."""
+import re
+from datetime import datetime
+
+import pytest
+
+from conftest import statement_rows
+
+PER_FILE = 'SEARCH transaction USING INDEX ix_transaction_user_file_id_transaction_date (user_file_id=?)'
+PER_FILE_DATE_RANGE = ('SEARCH transaction USING INDEX ix_transaction_user_file_id_transaction_date '
+                       '(user_file_id=? AND transaction_date>? AND transaction_date<?)')
+PER_USER = 'SEARCH user_file USING INDEX ix_user_file_user_id_created_on (user_id=?)'
+PER_USER_JOINED = 'SEARCH user_file USING COVERING INDEX ix_user_file_user_id_created_on (user_id=?)'
+# Either index led by transaction_date answers a table-wide date range; the planner may pick either
+DATE_RANGE = re.compile(r'SEARCH transaction USING INDEX ix_transaction_transaction_date(_amount_cents)? '
+                        r'\(transaction_date>\? AND transaction_date<\?\)')
+
+MARCH = (datetime(2025, 3, 1), datetime(2025, 3, 31))
+
+
+def _plans(app_module, statements, table):
+    """EXPLAIN QUERY PLAN lines of each captured statement that reads ``table``."""
+    with app_module.app.app_context(), app_module.db.engine.connect() as connection:
+        return [[row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                for statement, parameters in statements
+                if f"FROM {table}" in statement or f"JOIN {table}" in statement]
+
+
+@pytest.fixture
+def statements(user, add_statement):
+    """Two statements of the user: (March file id, April file id)."""
+    return (add_statement(user.id, statement_rows(50, month=3, label='march')),
+            add_statement(user.id, statement_rows(50, month=4, label='april')))
+
+
+def test_file_listing_searches_files_by_user(app_module, client, user, statements, query_counter):
+    with query_counter() as captured:
+        assert client.get('/user-files', headers=user.headers).status_code == 200
+    files, transactions = _plans(app_module, captured, 'user_file')
+    assert files == [PER_USER]
+    assert PER_USER_JOINED in transactions
+    assert PER_FILE in transactions
+
+
+def test_file_summary_searches_files_by_user(app_module, client, user, statements, query_counter):
+    with query_counter() as captured:
+        assert client.get('/user-files?summary=1', headers=user.headers).status_code == 200
+    [summary] = _plans(app_module, captured, 'user_file')
+    assert summary[0] == PER_USER
+    assert summary[1].startswith('SEARCH transaction USING COVERING INDEX ix_transaction_user_file_id_transaction_date')
+
+
+@pytest.mark.parametrize('url', ['/user-files/{id}', '/user-files/{id}/transactions?cursor=3'])
+def test_file_transactions_search_by_file(app_module, client, user, statements, query_counter, url):
+    with query_counter() as captured:
+        assert client.get(url.format(id=statements[0]), headers=user.headers).status_code == 200
+    [transactions] = _plans(app_module, captured, '"transaction"')
+    assert transactions[0] == PER_FILE
+
+
+def test_date_range_of_a_file_searches_the_file_and_dates(app_module, statements, query_counter):
+    Transaction = app_module.Transaction
+    with app_module.app.app_context(), query_counter() as captured:
+        rows = Transaction.query.filter(Transaction.user_file_id == statements[0],
+                                        Transaction.transaction_date.between(*MARCH)).all()
+    assert len(rows) == 50
+    assert _plans(app_module, captured, '"transaction"') == [[PER_FILE_DATE_RANGE]]
+
+
+def test_date_range_of_a_user_searches_files_then_dates(app_module, user, statements, query_counter):
+    Transaction, UserFile = app_module.Transaction, app_module.UserFile
+    with app_module.app.app_context(), query_counter() as captured:
+        rows = (app_module.db.session.query(Transaction)
+                .join(UserFile, Transaction.user_file_id == UserFile.id)
+                .filter(UserFile.user_id == user.id, Transaction.transaction_date.between(*MARCH))
+                .all())
+    assert len(rows) == 50
+    assert _plans(app_module, captured, '"transaction"') == [[PER_USER_JOINED, PER_FILE_DATE_RANGE]]
+
+
+def test_date_range_of_all_transactions_searches_dates(app_module, statements, query_counter):
+    Transaction = app_module.Transaction
+    with app_module.app.app_context(), query_counter() as captured:
+        Transaction.query.filter(Transaction.transaction_date.between(*MARCH)).all()
+    [[plan]] = _plans(app_module, captured, '"transaction"')
+    assert DATE_RANGE.fullmatch(plan), plan
@@ -0,0 +1,133 @@
+"""Textract receipt analysis with a local stub client: caching, batching and the receipt routes."""
+import hashlib
+import io
+import threading
+import time
+
+import pytest
+
+from caching import LRUCache
+from receipts import ReceiptAnalyzer
+
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+class StubTextract:
+    """Answers analyze_expense like Textract, with the receipt's size as its total; ``fail`` bytes raise."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def analyze_expense(self, Document):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(self.delay)
+            data = Document["Bytes"]
+            if data.endswith(b'fail'):
+                raise RuntimeError("ThrottlingException")
+            return {"ExpenseDocuments": [{"SummaryFields": [
+                {"Type": {"Text": "TOTAL"}, "ValueDetection": {"Text": f"${len(data)}.50"}},
+                {"Type": {"Text": "VENDOR_NAME"}, "ValueDetection": {"Text": " NTUC FairPrice "}},
+                {"Type": {"Text": "INVOICE_RECEIPT_DATE"}, "ValueDetection": {"Text": "2025-11-16"}},
+            ]}]}
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def _receipt(tmp_path, data):
+    path = tmp_path / hashlib.sha256(data).hexdigest()
+    path.write_bytes(data)
+    return hashlib.sha256(data).hexdigest(), str(path)
+
+
+def test_identical_receipts_are_analysed_once(tmp_path):
+    client = StubTextract()
+    analyzer = ReceiptAnalyzer(client)
+    receipt = _receipt(tmp_path, PNG + b'one')
+    first = analyzer.analyze(*receipt)
+    assert analyzer.analyze(*receipt) == first
+    assert client.calls == 1
+    assert analyzer.cache.stats()["hits"] == 1
+
+
+def test_analyses_expire_after_the_ttl(tmp_path):
+    client = StubTextract()
+    analyzer = ReceiptAnalyzer(client)
+    now = [0.0]
+    analyzer.cache = LRUCache(10, ttl=60, clock=lambda: now[0])
+    receipt = _receipt(tmp_path, PNG + b'one')
+    analyzer.analyze(*receipt)
+    now[0] = 59
+    analyzer.analyze(*receipt)
+    assert client.calls == 1
+    now[0] = 120
+    analyzer.analyze(*receipt)
+    assert client.calls == 2
+    assert analyzer.cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_analyses_are_evicted(tmp_path):
+    client = StubTextract()
+    analyzer = ReceiptAnalyzer(client, cache_size=2)
+    one, two, three = (_receipt(tmp_path, PNG + name) for name in (b'one', b'two', b'three'))
+    for receipt in (one, two, one, three, one, two):
+        analyzer.analyze(*receipt)
+    assert client.calls == 4  # two was evicted by three, and analysed again
+    assert analyzer.cache.stats()["evictions"] == 2
+
+
+def test_batches_run_concurrently_and_keep_their_order(tmp_path):
+    client = StubTextract(delay=0.05)
+    analyzer = ReceiptAnalyzer(client, max_workers=4)
+    receipts = [_receipt(tmp_path, PNG + b'x' * size) for size in range(8)]
+    receipts.append(receipts[0])  # Analysed once for both entries
+    receipts.append(_receipt(tmp_path, PNG + b'fail'))
+    try:
+        results = analyzer.analyze_many(receipts)
+    finally:
+        analyzer.shutdown()
+    assert client.calls == 9
+    assert client.most_running == 4
+    totals = [docs[0]["SummaryFields"][0]["ValueDetection"]["Text"] for docs in results[:9]]
+    assert totals == [f"${8 + size}.50" for size in range(8)] + ["$8.50"]
+    assert isinstance(results[9], RuntimeError)
+
+
+@pytest.fixture
+def textract(app_module, monkeypatch):
+    client = StubTextract()
+    monkeypatch.setattr(app_module.receipt_analyzer, 'client', client)
+    monkeypatch.setattr(app_module.receipt_analyzer, 'cache', LRUCache(100))
+    return client
+
+
+def test_parse_receipt_summarises_and_caches(client, user, textract):
+    for _ in range(2):
+        response = client.post('/parse-receipt', headers=user.headers,
+                               data={'receipt': (io.BytesIO(PNG + b'receipt'), 'receipt.png')})
+        assert response.status_code == 200
+        assert response.json == {"vendor_name": "NTUC FairPrice", "receipt_id": None, "date": "2025-11-16",
+                                 "amount": 15.5, "currency": "USD"}
+    assert textract.calls == 1
+
+
+def test_parse_receipts_reports_each_file(client, user, textract):
+    receipts = [(io.BytesIO(PNG + b'a'), 'a.png'), (io.BytesIO(PNG + b'a'), 'copy.png'),
+                (io.BytesIO(b'plain text'), 'notes.txt'), (io.BytesIO(PNG + b'fail'), 'throttled.png')]
+    response = client.post('/parse-receipts', headers=user.headers, data={'receipts': receipts})
+    assert response.status_code == 200
+    a, copy, notes, throttled = response.json["receipts"]
+    assert (a["filename"], a["amount"]) == ('a.png', 9.5)
+    assert copy == {**a, "filename": 'copy.png'}
+    assert notes == {"filename": 'notes.txt',
+                     "message": "Unsupported file type text, expected one of jpeg, pdf, png, tiff"}
+    assert throttled == {"filename": 'throttled.png', "message": "Error calling Textract: ThrottlingException"}
+    assert textract.calls == 2
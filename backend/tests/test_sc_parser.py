@@ -0,0 +1,70 @@
+"""The column-wise Standard Chartered XLSX parser."""
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from parsers import ParseReport, iter_sc_xlsx_rows, process_amount_cents, process_amounts_cents
+
+# Table 1 keeps dates in column 0, descriptions in column 3 and amounts in column 14
+WIDTH = 15
+
+
+def _table_1_row(date, description, amount):
+    row = [None] * WIDTH
+    row[0], row[3], row[14] = date, description, amount
+    return row
+
+
+@pytest.fixture
+def statement(tmp_path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Table 1'
+    sheet.append(['Statement Date: 18 Nov 2025'])  # Row 1
+    sheet.append(_table_1_row('Transaction Date', 'Description', 'Amount'))
+    sheet.append(_table_1_row('16 Nov', 'GRAB *RIDE', '12.30'))
+    sheet.append(_table_1_row('17 Nov', 'SALARY', '1,000.00CR'))
+    sheet.append(_table_1_row('20 Dec', 'HOTEL BOOKING', 250.5))  # A number cell, from last December
+    sheet.append(_table_1_row('18 Nov', 'BROKEN', 'twelve'))  # Row 6
+    sheet.append(_table_1_row(None, 'TOTAL', '1,262.80'))
+    path = tmp_path / 'sc.xlsx'
+    workbook.save(path)
+    return str(path)
+
+
+EXPECTED = [
+    (datetime(2025, 11, 16), -1230, 'GRAB *RIDE'),
+    (datetime(2025, 11, 17), 100000, 'SALARY'),
+    (datetime(2024, 12, 20), -25050, 'HOTEL BOOKING'),
+]
+
+
+def test_xlsx_rows_are_dated_from_the_statement_and_signed(statement):
+    report = ParseReport()
+    rows = list(iter_sc_xlsx_rows(statement, report))
+    assert [(row.transaction_date, row.amount_cents, row.remarks_1) for row in rows] == EXPECTED
+    assert report.rows == 3
+    assert report.errors == [(6, "invalid amount: 'twelve'")]
+
+
+def test_xlsx_rows_do_not_depend_on_the_chunk_size(statement):
+    assert list(iter_sc_xlsx_rows(statement, chunk_size=2)) == list(iter_sc_xlsx_rows(statement))
+
+
+@pytest.mark.parametrize('value', [
+    '12.30', '1,234.56', '12.30CR', ' 7 ', '0.5', 250.5, 3, '12.345', '1e3', '-4.00', '12.30 CR',
+])
+def test_column_and_scalar_amount_rules_agree(value):
+    cents, valid = process_amounts_cents(pd.Series([value]))
+    assert bool(valid[0])
+    assert int(cents[0]) == process_amount_cents(value)
+
+
+@pytest.mark.parametrize('value', ['twelve', 'nan', '1.2.3'])
+def test_invalid_amounts_are_rejected_by_both_rules(value):
+    _, valid = process_amounts_cents(pd.Series([value]))
+    assert not valid[0]
+    with pytest.raises(ValueError):
+        process_amount_cents(value)
@@ -0,0 +1,89 @@
+"""DeltaExporter's high-water mark, against the in-memory FakeWorksheet."""
+from datetime import datetime
+
+import pytest
+
+from ingestion import TransactionRow
+from sheet_export import HEADER, DeltaExporter
+from sheets import FakeWorksheet
+
+
+class FailingWorksheet(FakeWorksheet):
+    """Fails the ``fail_on``-th append request (1-based) with an error that is not retried."""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.appends = 0
+        self.fail_on = fail_on
+
+    def append_rows(self, values, value_input_option='RAW'):
+        self.appends += 1
+        if self.appends == self.fail_on:
+            raise ConnectionError("connection reset")
+        super().append_rows(values, value_input_option)
+
+
+def _rows(user_id, days):
+    return [TransactionRow(datetime(2029, 2, day), -100 * day, f"export {user_id} {day}") for day in days]
+
+
+def _exporter(app_module, user, worksheet, **kwargs):
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    return DeltaExporter(engine, user.id, worksheet, 'expenses/Transactions', **kwargs)
+
+
+def _state(app_module, user):
+    with app_module.app.app_context():
+        state = app_module.SheetExportState.query.filter_by(user_id=user.id).one()
+        return state.last_transaction_id, state.rows_exported
+
+
+def _transaction_ids(app_module, user_file_id):
+    with app_module.app.app_context():
+        return [t.id for t in app_module.Transaction.query.filter_by(user_file_id=user_file_id)
+                .order_by(app_module.Transaction.id)]
+
+
+def test_only_new_rows_are_appended_after_a_single_header(app_module, user, add_statement):
+    worksheet = FakeWorksheet()
+    exporter = _exporter(app_module, user, worksheet)
+    first = _transaction_ids(app_module, add_statement(user.id, _rows(user.id, [1, 2, 3])))
+    assert exporter.export() == 3
+    assert worksheet.rows[0] == HEADER
+    assert [row[0] for row in worksheet.rows[1:]] == first
+    assert worksheet.rows[1][1:5] == ['2029-02-01', -1.0, 'SGD', f"export {user.id} 1"]
+
+    calls = worksheet.calls
+    assert exporter.export() == 0
+    assert worksheet.calls == calls
+
+    second = _transaction_ids(app_module, add_statement(user.id, _rows(user.id, [4, 5])))
+    assert exporter.export() == 2
+    assert worksheet.calls == calls + 1
+    assert worksheet.rows.count(HEADER) == 1
+    assert [row[0] for row in worksheet.rows[1:]] == first + second
+    assert _state(app_module, user) == (second[-1], 5)
+
+
+def test_header_is_written_once_per_worksheet(app_module, user):
+    worksheet = FakeWorksheet()
+    for _ in range(2):
+        assert _exporter(app_module, user, worksheet).export() == 0
+    assert worksheet.rows == [HEADER]
+    assert _state(app_module, user) == (0, 0)
+
+
+def test_state_is_saved_after_each_batch(app_module, user, add_statement):
+    ids = _transaction_ids(app_module, add_statement(user.id, _rows(user.id, [1, 2, 3, 4, 5])))
+    # Append 1 is the header, then batches of two: the third batch fails
+    worksheet = FailingWorksheet(fail_on=4)
+    with pytest.raises(ConnectionError):
+        _exporter(app_module, user, worksheet, batch_size=2).export()
+    assert _state(app_module, user) == (ids[3], 4)
+    assert [row[0] for row in worksheet.rows[1:]] == ids[:4]
+
+    # The next run resumes after the last saved batch, without repeating the header
+    assert _exporter(app_module, user, worksheet, batch_size=2).export() == 1
+    assert [row[0] for row in worksheet.rows[1:]] == ids
+    assert _state(app_module, user) == (ids[4], 5)
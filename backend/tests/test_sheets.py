@@ -0,0 +1,128 @@
+"""SheetSync's diffing and retries, against the in-memory FakeWorksheet."""
+from collections import namedtuple
+
+import pytest
+
+from sheets import FakeQuotaError, FakeWorksheet, SheetSync, column_letter
+
+HEADER = ['Date', 'Amount', 'Remarks']
+ROWS = [HEADER, ['2025-01-01', -12.5, 'NTUC'], ['2025-01-02', 1000, 'SALARY'], ['2025-01-03', -3, 'BUS']]
+
+
+class FlakyWorksheet(FakeWorksheet):
+    """Fails its first read with an HTTP ``status``, or with an error without a response if it is None."""
+
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.failed = False
+
+    def get_all_values(self):
+        if not self.failed:
+            self.failed = True
+            error = IOError(f"HTTP {self.status}")
+            error.response = namedtuple('Response', ['status_code'])(self.status) if self.status else None
+            raise error
+        return super().get_all_values()
+
+
+def _sync(worksheet, **kwargs):
+    delays = []
+    return SheetSync(worksheet, sleep=delays.append, **kwargs), delays
+
+
+@pytest.mark.parametrize('index, letter', [(1, 'A'), (3, 'C'), (26, 'Z'), (27, 'AA'), (52, 'AZ'), (703, 'AAA')])
+def test_column_letter(index, letter):
+    assert column_letter(index) == letter
+
+
+def test_diff_of_an_empty_sheet_writes_everything():
+    sync, _ = _sync(FakeWorksheet())
+    assert sync.diff([], ROWS) == [{"range": "A1:C4", "values": ROWS}]
+
+
+def test_diff_sends_only_changed_rows_in_contiguous_ranges():
+    current = [[str(value) for value in row] for row in ROWS] + [['2025-01-04', '7', 'REFUND']]
+    rows = [HEADER, ['2025-01-01', -12.5, 'NTUC'], ['2025-01-02', 999, 'SALARY'], ['2025-01-03', -3, 'TRAIN'],
+            ['2025-01-04', 7, 'REFUND'], ['2025-01-05', 1, 'NEW']]
+    sync, _ = _sync(FakeWorksheet())
+    assert sync.diff(current, rows) == [
+        {"range": "A3:C4", "values": rows[2:4]},
+        {"range": "A6:C6", "values": rows[5:6]},
+    ]
+
+
+def test_diff_compares_numbers_as_sheets_formats_them():
+    current = [['2025-01-01', '-12.50', ''], ['2025-01-02', '1000', 'SALARY']]
+    rows = [['2025-01-01', -12.5, None], ['2025-01-02', 1000.0, 'SALARY']]
+    sync, _ = _sync(FakeWorksheet())
+    assert sync.diff(current, rows) == []
+
+
+def test_sync_sends_a_single_batch_update():
+    worksheet = FakeWorksheet(rows=ROWS)
+    rows = [HEADER, ['2025-01-01', -15, 'NTUC'], ['2025-01-02', 1000, 'SALARY'], ['2025-01-03', -3, 'TRAIN']]
+    sync, _ = _sync(worksheet)
+    assert sync.sync(rows) == 2  # Rows 2 and 4, in one request
+    assert worksheet.calls == 2  # One read and one batch_update
+    assert worksheet.rows == rows
+
+
+def test_sync_of_an_unchanged_table_only_reads():
+    worksheet = FakeWorksheet(rows=ROWS)
+    sync, _ = _sync(worksheet)
+    assert sync.sync(ROWS) == 0
+    assert worksheet.calls == 1
+
+
+def test_sync_blanks_rows_left_over_from_a_longer_table():
+    worksheet = FakeWorksheet(rows=ROWS + [['2025-01-04', 7, 'REFUND', 'extra']])
+    sync, _ = _sync(worksheet)
+    assert sync.sync(ROWS[:2]) == 1
+    assert worksheet.calls == 2
+    # Unchanged rows are left as they are; the leftover ones are blanked to the full width
+    assert worksheet.rows == ROWS[:2] + [[''] * 4] * 3
+
+
+def test_append_after_blanked_rows_starts_below_the_table():
+    worksheet = FakeWorksheet(rows=ROWS)
+    sync, _ = _sync(worksheet)
+    sync.sync(ROWS[:2])
+    assert sync.append([['2025-01-05', 1, 'NEW']]) == 1
+    assert sync.append([]) == 0
+    assert worksheet.rows == ROWS[:2] + [['2025-01-05', 1, 'NEW']]
+    assert worksheet.calls == 3
+
+
+def test_quota_errors_are_retried_with_exponential_backoff():
+    worksheet = FakeWorksheet(quota_failures=3)
+    sync, delays = _sync(worksheet, backoff=2.0)
+    assert sync.sync(ROWS) == 1
+    assert worksheet.rows == ROWS
+    assert worksheet.calls == 5  # Three failed reads, then a read and a write
+    # Each delay is the backoff doubled per attempt, plus up to 50% jitter
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert 2.0 * 2 ** attempt <= delay <= 1.5 * 2.0 * 2 ** attempt
+
+
+def test_retries_give_up_after_the_limit():
+    worksheet = FakeWorksheet(quota_failures=3)
+    sync, delays = _sync(worksheet, retries=2)
+    with pytest.raises(FakeQuotaError):
+        sync.sync(ROWS)
+    assert worksheet.calls == 3
+    assert len(delays) == 2
+    assert worksheet.rows == []
+
+
+@pytest.mark.parametrize('status, retried', [(500, True), (503, True), (400, False), (403, False), (None, False)])
+def test_only_quota_and_server_errors_are_retried(status, retried):
+    sync, delays = _sync(FlakyWorksheet(status))
+    if retried:
+        assert sync.sync(ROWS) == 1
+        assert len(delays) == 1
+    else:
+        with pytest.raises(IOError):
+            sync.sync(ROWS)
+        assert delays == []
@@ -0,0 +1,102 @@
+"""Streaming, content-addressed upload storage and the upload routes' size limits."""
+import hashlib
+import io
+import os
+
+import pytest
+
+from storage import CHUNK_SIZE, UnsupportedUpload, UploadTooLarge, sniff_format, spool_upload, store_upload
+
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+class CountingStream(io.BytesIO):
+    """A request body that remembers how many times it was read."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return super().read(*args)
+
+
+@pytest.mark.parametrize('head, kind', [
+    (b'%PDF-1.7\n', 'pdf'),
+    (b'PK\x03\x04rest', 'xlsx'),
+    (PNG + b'data', 'png'),
+    (b'PAR1\x15\x00', 'parquet'),
+    (b'Date,Amount\n01 Jan 2025,1.00\n', 'text'),
+    ('café'.encode()[:-1], 'text'),  # A block cut in the middle of a character
+    (b'\x00\x01\x02', None),
+    (b'', None),
+])
+def test_sniff_format(head, kind):
+    assert sniff_format(head) == kind
+
+
+def test_store_upload_is_content_addressed(tmp_path):
+    data = b'Date,Amount\n' * 20000
+    stored = store_upload(io.BytesIO(data), str(tmp_path), 'March.CSV')
+    digest = hashlib.sha256(data).hexdigest()
+    assert stored.sha256 == digest
+    assert stored.size == len(data)
+    assert stored.kind == 'text'
+    assert stored.path == os.path.join(str(tmp_path), digest[:2], f"{digest}.csv")
+    with open(stored.path, 'rb') as f:
+        assert f.read() == data
+
+    again = store_upload(io.BytesIO(data), str(tmp_path), 'march-copy.csv')
+    assert again.path == stored.path
+    assert sorted(os.listdir(tmp_path)) == [digest[:2]]  # No temporary copies left behind
+    assert os.listdir(tmp_path / digest[:2]) == [f"{digest}.csv"]
+
+
+def test_too_large_upload_stops_reading_and_is_removed(tmp_path):
+    stream = CountingStream(b'x' * (100 * CHUNK_SIZE))
+    with pytest.raises(UploadTooLarge):
+        spool_upload(stream, str(tmp_path), max_size=2 * CHUNK_SIZE)
+    assert stream.reads == 3
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsupported_upload_is_rejected_from_its_first_block(tmp_path):
+    stream = CountingStream(b'\x00binary' * CHUNK_SIZE)
+    with pytest.raises(UnsupportedUpload):
+        spool_upload(stream, str(tmp_path), allowed_kinds={'pdf', 'text'})
+    assert stream.reads == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_empty_upload_is_rejected(tmp_path):
+    with pytest.raises(UnsupportedUpload):
+        spool_upload(io.BytesIO(b''), str(tmp_path), allowed_kinds={'text'})
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('url, limit, field', [
+    ('/upload-user-file', 'MAX_UPLOAD_BYTES', 'file'),
+    ('/parse-receipt', 'MAX_RECEIPT_BYTES', 'receipt'),
+])
+def test_upload_over_the_route_limit_is_refused_before_reading(app_module, client, user, monkeypatch,
+                                                               url, limit, field):
+    monkeypatch.setitem(app_module.app.config, limit, 64 * 1024)
+    body = CountingStream(b'x' * (4 * 1024 * 1024))
+    response = client.post(url, headers={**user.headers, 'Content-Type': 'multipart/form-data; boundary=b',
+                                         'Content-Length': str(len(body.getvalue()))}, input_stream=body)
+    assert response.status_code == 413
+    assert response.json == {"message": "File is too large"}
+    assert body.reads == 0
+
+
+def test_upload_under_the_route_limit_reaches_format_detection(app_module, client, user):
+    data = {'file': (io.BytesIO(b'not a bank statement\n' * 100), 'notes.csv')}
+    response = client.post('/upload-user-file', headers=user.headers, data=data)
+    assert response.status_code == 400
+    assert response.json == {"message": "Unrecognised bank statement format"}
+
+
+def test_json_routes_keep_the_small_body_limit(client):
+    response = client.post('/register', data=b'x' * (2 * 1024 * 1024), content_type='application/json')
+    assert response.status_code == 413
@@ -0,0 +1,106 @@
+"""Background processing of uploaded statements."""
+import io
+import os
+import sqlite3
+import threading
+import time
+
+from conftest import statement_rows
+from rollups import check_monthly_rollup
+
+DBS_CSV = (b'Account Details For:,POSB\n'
+           b',\n'
+           b'\n'
+           b'Transaction Date,Reference,Debit Amount,Credit Amount,Transaction Ref1,Transaction Ref2,'
+           b'Transaction Ref3,\n'
+           b'01 Jan 2025,POS,12.50,,NTUC,x,y,\n'
+           b'bad date,POS,1,,A,x,y,\n'
+           b'02 Jan 2025,ICT,,100,SALARY,x,y,\n')
+
+
+def _upload(client, user, data=DBS_CSV):
+    response = client.post('/upload-user-file', headers=user.headers,
+                           data={'file': (io.BytesIO(data), 'statement.csv')})
+    assert response.status_code == 202, response.json
+    return response.json
+
+
+def _wait_for_job(client, user, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'/jobs/{job_id}', headers=user.headers).json
+        if job["status"] not in ('queued', 'running') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_upload_job_reports_rows_and_errors(client, user):
+    upload = _upload(client, user)
+    job = _wait_for_job(client, user, upload["job_id"])
+    assert (job["status"], job["rows_parsed"], job["file_id"]) == ('done', 2, upload["file_id"])
+    assert job["errors"] == [{"line": 6, "message": "time data 'bad date' does not match format '%d %b %Y'"}]
+    transactions = client.get(f'/user-files/{upload["file_id"]}', headers=user.headers).json["transactions"]
+    assert [(t["remarks_1"], t["amount_cents"]) for t in transactions] == [('NTUC', -1250), ('SALARY', 10000)]
+
+
+def test_same_statement_again_points_at_the_first_upload(client, user):
+    first = _upload(client, user)
+    _wait_for_job(client, user, first["job_id"])
+    again = client.post('/upload-user-file', headers=user.headers,
+                        data={'file': (io.BytesIO(DBS_CSV), 'copy.csv')})
+    assert again.status_code == 200
+    assert again.json == {"message": "File already uploaded", "file_id": first["file_id"],
+                          "job_id": first["job_id"], "duplicate": True}
+
+
+def test_parsing_does_not_hold_the_write_lock(app_module, client, user, monkeypatch):
+    parsing, release = threading.Event(), threading.Event()
+
+    def slow_parse(bank_file_format_id, file_path, report):
+        yield from statement_rows(10, label='before')
+        parsing.set()
+        release.wait(10)
+        yield from statement_rows(10, label='after')
+
+    monkeypatch.setattr(app_module, 'parse_user_file', slow_parse)
+    # Small batches, so rows inserted while parsing would already have taken the lock
+    monkeypatch.setitem(app_module.app.config, 'INGEST_BATCH_SIZE', 5)
+    upload = _upload(client, user)
+    try:
+        assert parsing.wait(10)
+        writer = sqlite3.connect(os.environ['EXPENSE_TRACKER_DB'], timeout=0.5)
+        try:
+            writer.execute('BEGIN IMMEDIATE')  # Raises "database is locked" if the job holds the write lock
+            writer.rollback()
+        finally:
+            writer.close()
+        assert client.get(f'/user-files/{upload["file_id"]}', headers=user.headers).json["no_of_transactions"] == 0
+    finally:
+        release.set()
+    job = _wait_for_job(client, user, upload["job_id"])
+    assert (job["status"], job["rows_parsed"]) == ('done', 20)
+
+
+def test_file_cannot_be_deleted_while_its_job_runs(app_module, client, user, monkeypatch):
+    parsing, release = threading.Event(), threading.Event()
+
+    def slow_parse(bank_file_format_id, file_path, report):
+        yield from statement_rows(10, label='deleted while parsing')
+        parsing.set()
+        release.wait(10)
+
+    monkeypatch.setattr(app_module, 'parse_user_file', slow_parse)
+    upload = _upload(client, user)
+    try:
+        assert parsing.wait(10)
+        response = client.delete(f'/user-files/{upload["file_id"]}', headers=user.headers)
+        assert response.status_code == 409
+        assert response.json == {"message": "File is still being processed", "job_id": upload["job_id"]}
+    finally:
+        release.set()
+    assert _wait_for_job(client, user, upload["job_id"])["status"] == 'done'
+
+    assert client.delete(f'/user-files/{upload["file_id"]}', headers=user.headers).status_code == 200
+    with app_module.app.app_context():
+        assert app_module.Transaction.query.filter_by(user_file_id=upload["file_id"]).count() == 0
+        assert check_monthly_rollup(app_module.db.session) == []
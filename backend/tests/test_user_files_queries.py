@@ -0,0 +1,38 @@
+"""The file listings run a fixed number of queries, however many files a user has."""
+from conftest import statement_rows
+
+
+def _get(client, query_counter, url, headers):
+    with query_counter() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return response.json, len(statements)
+
+
+def test_user_files_query_count_does_not_grow_with_files(client, user, add_statement, query_counter):
+    for number in range(2):
+        add_statement(user.id, statement_rows(5, label=f"shop {number}"))
+    client.get('/user-files', headers=user.headers)  # Fills the bank format name cache
+    files, few = _get(client, query_counter, '/user-files', user.headers)
+    assert len(files) == 2
+
+    for number in range(2, 20):
+        add_statement(user.id, statement_rows(5, label=f"shop {number}"))
+    files, many = _get(client, query_counter, '/user-files', user.headers)
+    assert len(files) == 20
+    assert all(f["no_of_transactions"] == 5 for f in files)
+    assert many == few
+
+
+def test_user_files_summary_query_count_does_not_grow_with_files(client, user, add_statement, query_counter):
+    for number in range(2):
+        add_statement(user.id, statement_rows(5, label=f"shop {number}"))
+    client.get('/user-files?summary=1', headers=user.headers)
+    page, few = _get(client, query_counter, '/user-files?summary=1', user.headers)
+    assert len(page["files"]) == 2
+
+    for number in range(2, 20):
+        add_statement(user.id, statement_rows(5, label=f"shop {number}"))
+    page, many = _get(client, query_counter, '/user-files?summary=1', user.headers)
+    assert [f["no_of_transactions"] for f in page["files"]] == [5] * 20
+    assert many == few
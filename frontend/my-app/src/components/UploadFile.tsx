@@ -7,6 +7,23 @@ interface FileFormat {
   name: string;
 }
 
+interface RowError {
+  line: number | null;
+  message: string;
+}
+
+// An upload is parsed in the background; GET /jobs/<id> reports how far it got
+interface UploadJob {
+  id: number;
+  file_id: number | null;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  rows_parsed: number;
+  errors: RowError[];
+  message: string | null;
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
 export const UploadFile: React.FC = () => {
     const [selectedFile, setSelectedFile] = useState<File | null>(null);
     const [fileFormats, setFileFormats] = useState<FileFormat[]>([]);
@@ -16,7 +33,9 @@ export const UploadFile: React.FC = () => {
     const [successMessage, setSuccessMessage] = useState<string | null>(null); // State for success message
     const [imagePreviewUrl, setImagePreviewUrl] = useState<string | null>(null);
     const [isDragging, setIsDragging] = useState<boolean>(false);
+    const [job, setJob] = useState<UploadJob | null>(null);
     const fileInputRef = useRef<HTMLInputElement>(null);
+    const pollTimerRef = useRef<number | null>(null);
 
     const navigate = useNavigate();
 
@@ -28,6 +47,15 @@ export const UploadFile: React.FC = () => {
         };
     }, [imagePreviewUrl]);
 
+    // Stop polling when the page is left
+    useEffect(() => {
+        return () => {
+            if (pollTimerRef.current !== null) {
+                window.clearTimeout(pollTimerRef.current);
+            }
+        };
+    }, []);
+
     useEffect(() => {
         const fetchFileFormats = async () => {
             try {
@@ -79,6 +107,34 @@ export const UploadFile: React.FC = () => {
         }
     };
 
+    const pollJob = async (jobId: number) => {
+        pollTimerRef.current = null;
+        let current: UploadJob;
+        try {
+            current = await apiRequest('GET', `/jobs/${jobId}`);
+        } catch (err: any) {
+            console.error('Error fetching upload job:', err);
+            setError('The file was uploaded, but its processing status could not be loaded. Check your files list.');
+            setIsLoading(false);
+            return;
+        }
+        setJob(current);
+
+        if (current.status === 'queued' || current.status === 'running') {
+            pollTimerRef.current = window.setTimeout(() => pollJob(jobId), JOB_POLL_INTERVAL_MS);
+            return;
+        }
+        setIsLoading(false);
+        if (current.status === 'failed') {
+            setError(`Processing failed: ${current.message || 'unknown error'}`);
+        } else if (current.errors.length === 0) {
+            navigate(`/file/${current.file_id}`);
+        } else {
+            // Some rows were skipped: show which before moving on
+            setSuccessMessage(current.message || 'File uploaded and processed');
+        }
+    };
+
     const handleUpload = async (fileToUpload: File | null = null) => {
         const file = fileToUpload || selectedFile;
 
@@ -86,34 +142,33 @@ export const UploadFile: React.FC = () => {
             setError('Please select a file first.');
             return;
         }
-        if (!selectedFormat) {
-            setError('Please select a file format.');
-            return;
-        }
-
         setIsLoading(true);
         setError(null);
         setSuccessMessage(null); // Clear previous success message
+        setJob(null);
+        if (pollTimerRef.current !== null) {
+            window.clearTimeout(pollTimerRef.current);
+            pollTimerRef.current = null;
+        }
 
         const formData = new FormData();
         formData.append('file', file);
-        formData.append('bank_file_format_id', selectedFormat);
+        // Without a selection the backend detects the format from the file
+        if (selectedFormat) {
+            formData.append('bank_file_format_id', selectedFormat);
+        }
 
         try {
+            // 202 { file_id, job_id } for a new statement; 200 { file_id, job_id, duplicate } for one uploaded before
             const response = await apiRequest('POST', '/upload-user-file', formData, true);
-            // Assuming the backend returns { message: "...", file_id: "..." }
-            if (response && response.file_id) {
-                setSuccessMessage('File uploaded successfully!');
-                // Redirect to UserFileDetails after a short delay to show the success message
-                setTimeout(() => {
-                    navigate(`/file/${response.file_id}`);
-                }, 2000); // 2 second delay
+            if (response && response.job_id) {
+                // Stay on this page until the statement is parsed, so failures are shown here
+                pollJob(response.job_id);
+            } else if (response && response.file_id) {
+                navigate(`/file/${response.file_id}`);
             } else {
-                // Handle cases where file_id is not returned, though backend should provide it
-                setError('Upload successful, but could not retrieve file details. Redirecting to file list.');
-                setTimeout(() => {
-                    navigate('/files');
-                }, 2000);
+                setError('Upload successful, but could not retrieve file details.');
+                setIsLoading(false);
             }
         } catch (err: any) {
             console.error('Error uploading file:', err);
@@ -123,12 +178,8 @@ export const UploadFile: React.FC = () => {
                 setError('An unexpected error occurred during upload.');
             }
             setIsLoading(false); // Ensure loading is turned off on error
-        } finally {
-            // If no error occurred and redirect is handled by setTimeout, we don't need to set isLoading to false here
-            // However, if an error occurs, we need to ensure isLoading is false.
-            // The error handling above already sets setIsLoading(false)
-            // If the upload is successful and redirects, isLoading will be false by the time the component unmounts or re-renders.
         }
+        // On success isLoading stays on while pollJob follows the processing job
     };
 
     const openFileInput = () => {
@@ -166,7 +217,7 @@ export const UploadFile: React.FC = () => {
                         value={selectedFormat}
                         className="w-full px-4 py-3 border border-gray-300 rounded-lg shadow-sm focus:ring-blue-500 focus:border-blue-500 transition duration-150 ease-in-out text-base placeholder-gray-400"
                     >
-                        <option value="">Select File Format</option>
+                        <option value="">Detect automatically</option>
                         {fileFormats.map(format => (
                             <option key={format.id} value={format.id}>{format.name}</option>
                         ))}
@@ -198,8 +249,13 @@ export const UploadFile: React.FC = () => {
 
                 {/* Loading and Error Display */}
                 {isLoading && (
-                    <div className="flex justify-center items-center h-full mb-4">
+                    <div className="flex flex-col justify-center items-center h-full mb-4">
                         <div className="animate-spin rounded-full h-16 w-16 border-t-2 border-b-2 border-blue-500"></div>
+                        <p className="text-sm text-gray-600 mt-2">
+                            {!job && 'Uploading...'}
+                            {job?.status === 'queued' && 'Waiting to be processed...'}
+                            {job?.status === 'running' && `Processing... ${job.rows_parsed} rows read`}
+                        </p>
                     </div>
                 )}
 
@@ -216,6 +272,30 @@ export const UploadFile: React.FC = () => {
                     </div>
                 )}
 
+                {/* Rows the parser skipped or that made the upload fail */}
+                {job && job.errors.length > 0 && !isLoading && (
+                    <div className="p-3 bg-yellow-50 border border-yellow-400 text-yellow-800 rounded-md mb-4">
+                        <p className="font-medium mb-1">
+                            {job.errors.length} {job.errors.length === 1 ? 'row' : 'rows'} could not be read:
+                        </p>
+                        <ul className="text-sm list-disc list-inside max-h-48 overflow-y-auto">
+                            {job.errors.map((rowError, index) => (
+                                <li key={index}>
+                                    {rowError.line !== null ? `Line ${rowError.line}: ` : ''}{rowError.message}
+                                </li>
+                            ))}
+                        </ul>
+                        {job.status === 'done' && (
+                            <button
+                                onClick={() => navigate(`/file/${job.file_id}`)}
+                                className="mt-2 px-3 py-1 bg-blue-500 text-white font-medium rounded-md hover:bg-blue-600"
+                            >
+                                View transactions
+                            </button>
+                        )}
+                    </div>
+                )}
+
                 {/* File Preview Section */}
                 {selectedFile && !isLoading && (
                     <div className="mt-4 flex flex-col items-center">
@@ -16,8 +16,15 @@ export const UserFiles: React.FC = () => {
             setIsLoading(true);
             setError(null);
             try {
-                const data = await apiRequest('GET', '/user-files');
-                setUserFiles(data);
+                // The list only needs counts, so page through the summary listing
+                const files: any[] = [];
+                let cursor: number | null = 0;
+                while (cursor !== null) {
+                    const page: any = await apiRequest('GET', `/user-files?summary=1&cursor=${cursor}`);
+                    files.push(...page.files);
+                    cursor = page.next_cursor;
+                }
+                setUserFiles(files);
             } catch (err: any) {
                 console.error('Error fetching file uploads:', err);
                 if (err.response && err.response.data && err.response.data.message) {